@@ -0,0 +1,131 @@
+"""
+Decode/encode throughput of each installed JSON codec on payloads shaped
+like a Strava activity's streams, a Heroku app list and a Workable member
+directory.
+
+    python -m benchmarks.json_codec [scale]
+"""
+import random
+import sys
+import timeit
+import uuid
+
+from common.codec import available_codecs, get_codec
+
+
+def strava_streams(rng: random.Random, points: int) -> dict:
+    lat, lng, altitude, distance = 51.5, -0.12, 30.0, 0.0
+    latlng, altitudes, distances, velocity, heartrate, cadence, watts, grade = [], [], [], [], [], [], [], []
+    for _ in range(points):
+        speed = max(0.0, rng.gauss(3.2, 0.4))
+        lat += rng.gauss(0, 0.00005)
+        lng += rng.gauss(0, 0.00005)
+        altitude += rng.gauss(0, 0.2)
+        distance += speed
+        latlng.append([round(lat, 6), round(lng, 6)])
+        altitudes.append(round(altitude, 1))
+        distances.append(round(distance, 1))
+        velocity.append(round(speed, 3))
+        heartrate.append(rng.randint(120, 175))
+        cadence.append(rng.randint(80, 92))
+        watts.append(rng.randint(150, 320))
+        grade.append(round(rng.gauss(0, 2), 1))
+
+    def stream(data: list) -> dict:
+        return {"data": data, "series_type": "distance", "original_size": points, "resolution": "high"}
+
+    return {
+        "time": stream(list(range(points))),
+        "latlng": stream(latlng),
+        "distance": stream(distances),
+        "altitude": stream(altitudes),
+        "velocity_smooth": stream(velocity),
+        "heartrate": stream(heartrate),
+        "cadence": stream(cadence),
+        "watts": stream(watts),
+        "grade_smooth": stream(grade),
+        "moving": stream([speed > 0.5 for speed in velocity]),
+    }
+
+
+def heroku_apps(rng: random.Random, count: int) -> list:
+    apps = []
+    for index in range(count):
+        name = f"app-{index}-{rng.randrange(16 ** 6):06x}"
+        apps.append({
+            "acm": rng.random() < 0.5,
+            "archived_at": None,
+            "buildpack_provided_description": rng.choice(["Python", "Node.js", "Ruby", None]),
+            "build_stack": {"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": "heroku-22"},
+            "created_at": f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00Z",
+            "git_url": f"https://git.heroku.com/{name}.git",
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "internal_routing": None,
+            "maintenance": False,
+            "name": name,
+            "owner": {"email": f"owner{index % 7}@example.com", "id": str(uuid.UUID(int=rng.getrandbits(128)))},
+            "organization": None,
+            "team": None,
+            "region": {"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": rng.choice(["us", "eu"])},
+            "released_at": "2024-03-01T12:00:00Z",
+            "repo_size": None,
+            "slug_size": rng.randint(10 ** 6, 5 * 10 ** 8),
+            "space": None,
+            "stack": {"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": "heroku-22"},
+            "updated_at": "2024-03-01T12:00:00Z",
+            "web_url": f"https://{name}.herokuapp.com/",
+        })
+    return apps
+
+
+def workable_members(rng: random.Random, count: int) -> dict:
+    members = []
+    for index in range(count):
+        first, last = rng.choice(["Ana", "Bo", "Chloé", "Dmitri", "Eun-ji"]), rng.choice(["Silva", "Ng", "Müller", "Okafor"])
+        members.append({
+            "id": f"{rng.randrange(16 ** 8):08x}",
+            "name": f"{first} {last}",
+            "headline": rng.choice(["Recruiter", "Hiring Manager", "Engineering Lead", "Talent Partner"]),
+            "email": f"{first.lower()}.{last.lower()}{index}@example.com",
+            "role": rng.choice(["admin", "simple", "reviewer"]),
+            "active": rng.random() < 0.9,
+            "collaboration_rules": {"jobs": [f"{rng.randrange(16 ** 6):06X}" for _ in range(rng.randint(0, 4))]},
+        })
+    return {"members": members, "paging": {"next": "https://acme.workable.com/spi/v3/members?limit=100&since_id=ffffffff"}}
+
+
+def payloads(scale: int = 1) -> dict:
+    rng = random.Random(1)
+    return {
+        "strava streams": strava_streams(rng, 10000 * scale),
+        "heroku app list": heroku_apps(rng, 1000 * scale),
+        "workable members": workable_members(rng, 1000 * scale),
+    }
+
+
+def best_of(run, repeat: int = 5) -> float:
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def main(scale: int = 1) -> None:
+    codecs = [get_codec(name) for name in available_codecs()]
+    for label, payload in payloads(scale).items():
+        body = get_codec("json").dumps(payload)
+        print(f"{label} ({len(body) / 1e6:.2f} MB)")
+        timings = {}
+        for codec in codecs:
+            decode = best_of(lambda: codec.loads(body))
+            encode = best_of(lambda: codec.dumps(payload))
+            timings[codec.name] = decode, encode
+            print(
+                f"  {codec.name:>7}: decode {len(body) / decode / 1e6:7.1f} MB/s"
+                f"  encode {len(body) / encode / 1e6:7.1f} MB/s"
+            )
+        fastest = codecs[0].name
+        if fastest != "json":
+            decode, encode = (stdlib / fast for stdlib, fast in zip(timings["json"], timings[fastest]))
+            print(f"  {fastest} vs json: decode x{decode:.1f}  encode x{encode:.1f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,39 @@
+"""
+Batch polyline decoding against the per-character reference decoder.
+
+    python -m benchmarks.polyline_decode [polylines] [points]
+"""
+import random
+import sys
+import timeit
+
+from strava.polyline import decode_many, decode_python, encode
+
+
+def sample_polylines(count: int, points: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    polylines = []
+    for _ in range(count):
+        lat, lng = rng.uniform(-60, 60), rng.uniform(-180, 180)
+        route = []
+        for _ in range(points):
+            lat += rng.gauss(0, 0.0005)
+            lng += rng.gauss(0, 0.0005)
+            route.append((lat, lng))
+        polylines.append(encode(route))
+    return polylines
+
+
+def main(count: int = 500, points: int = 400) -> None:
+    polylines = sample_polylines(count, points)
+    size = sum(map(len, polylines))
+    for name, run in (
+        ('reference', lambda: [decode_python(polyline) for polyline in polylines]),
+        ('decode_many', lambda: decode_many(polylines)),
+    ):
+        best = min(timeit.repeat(run, number=1, repeat=5))
+        print(f'{name:>12}: {best * 1000:8.1f} ms  {size / best / 1e6:6.1f} MB/s  ({count} x {points} points)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
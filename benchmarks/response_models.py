@@ -0,0 +1,72 @@
+"""
+Per-call cost of building every Strava, Heroku and Workable response model,
+validated (strict mode) against the default trusted construction.
+
+    python -m benchmarks.response_models [calls]
+"""
+import sys
+import timeit
+
+from common import ActionResponse, set_strict_responses
+from heroku3 import heroku_tools
+from strava import strava_tools
+from workable import workable_tools
+
+# A provider object of typical size: an activity with a few laps and efforts.
+ITEM = {
+    "id": 1234567890,
+    "name": "Morning Run",
+    "distance": 10234.5,
+    "moving_time": 3120,
+    "map": {"id": "a1234567890", "summary_polyline": "u{~vFvyys@fS]" * 20},
+    "athlete": {"id": 42, "resource_state": 1},
+    "laps": [{"id": lap, "lap_index": lap, "distance": 1000.0, "elapsed_time": 300} for lap in range(10)],
+    "segment_efforts": [{"id": effort, "name": f"Segment {effort}", "elapsed_time": 95} for effort in range(20)],
+}
+
+
+def models() -> list:
+    found = []
+    for module in (strava_tools, heroku_tools, workable_tools):
+        for name, value in sorted(vars(module).items()):
+            if isinstance(value, type) and issubclass(value, ActionResponse) and value.__module__ == module.__name__:
+                found.append(value)
+    return found
+
+
+def sample(model) -> dict:
+    values = {}
+    for name, field in model.__fields__.items():
+        if field.outer_type_ is bool:
+            values[name] = True
+        elif field.outer_type_ is dict:
+            values[name] = ITEM
+        else:
+            values[name] = [ITEM] * 50
+    return values
+
+
+def per_call(model, values: dict, calls: int) -> float:
+    return min(timeit.repeat(lambda: model(**values), number=calls, repeat=5)) / calls
+
+
+def main(calls: int = 20000) -> None:
+    totals = {"strict": 0.0, "trusted": 0.0}
+    for model in models():
+        values = sample(model)
+        timings = {}
+        for mode, strict in (("strict", True), ("trusted", False)):
+            set_strict_responses(strict)
+            timings[mode] = per_call(model, values, calls)
+            totals[mode] += timings[mode]
+        print(f"{model.__name__:>40}: strict {timings['strict'] * 1e6:6.2f} us  trusted {timings['trusted'] * 1e6:6.2f} us")
+    set_strict_responses(False)
+    count = len(models())
+    print(
+        f"{'mean of ' + str(count) + ' models':>40}: strict {totals['strict'] / count * 1e6:6.2f} us"
+        f"  trusted {totals['trusted'] / count * 1e6:6.2f} us  (x{totals['strict'] / totals['trusted']:.1f})"
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
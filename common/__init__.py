@@ -0,0 +1,45 @@
+from common.async_transport import AsyncHttpTransport, default_async_transport
+from common.base import ActionRequest, ActionResponse, HttpAction, HttpTool, TokenManager, set_strict_responses
+from common.batch import BatchResult
+from common.cache import ResponseCache
+from common.codec import JsonCodec, available_codecs, default_codec, set_default_codec
+from common.hedging import Hedger
+from common.http import HttpRequest, UpstreamError
+from common.jsonstream import ResponseTooLarge, StreamedList
+from common.projection import Projection
+from common.ratelimit import RateLimiter
+from common.resilience import CircuitOpenError, DeadlineExceeded, Resilience, RetryPolicy, deadline
+from common.singleflight import SingleFlight
+from common.transport import HttpTransport, default_transport
+
+__all__ = [
+    "ActionRequest",
+    "ActionResponse",
+    "AsyncHttpTransport",
+    "BatchResult",
+    "CircuitOpenError",
+    "DeadlineExceeded",
+    "Hedger",
+    "HttpAction",
+    "HttpRequest",
+    "HttpTool",
+    "HttpTransport",
+    "JsonCodec",
+    "Projection",
+    "RateLimiter",
+    "Resilience",
+    "ResponseCache",
+    "ResponseTooLarge",
+    "RetryPolicy",
+    "SingleFlight",
+    "StreamedList",
+    "TokenManager",
+    "UpstreamError",
+    "available_codecs",
+    "deadline",
+    "default_codec",
+    "default_async_transport",
+    "default_transport",
+    "set_default_codec",
+    "set_strict_responses",
+]
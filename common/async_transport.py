@@ -0,0 +1,140 @@
+"""
+Non-blocking HTTP transport used by ``HttpAction.aexecute``.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Optional, Tuple
+
+from common.cache import ResponseCache
+from common.codec import JsonCodec, default_codec
+from common.hedging import Hedger
+from common.http import HttpRequest
+from common.ratelimit import RateLimiter
+from common.resilience import Resilience, effective_timeout
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+
+
+class AsyncHttpTransport:
+    """
+    asyncio counterpart of ``HttpTransport`` backed by ``httpx.AsyncClient``.
+
+    An ``httpx`` client is tied to the event loop it first ran on, so one
+    client is kept per running loop; all coroutines on a loop share its
+    keep-alive pool. ``cache``, ``rate_limiter``, ``resilience`` and
+    ``hedger`` are used the same way as by ``HttpTransport`` and may be
+    shared with it, as is ``codec``.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+        http2: bool = False,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        resilience: Optional[Resilience] = None,
+        hedger: Optional[Hedger] = None,
+        codec: Optional[JsonCodec] = None,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.http2 = http2
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.resilience = resilience
+        self.hedger = hedger
+        self.codec = codec
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import httpx
+
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+            )
+            client = httpx.AsyncClient(limits=limits, http2=self.http2)
+            self._clients[loop] = client
+        return client
+
+    async def send(self, request: HttpRequest):
+        if request.stream:
+            return await self._resilient(request)
+        if self.cache is None:
+            return await self._send(request)
+        if request.method != "GET":
+            response = await self._send(request)
+            if response.status_code < 400:
+                self.cache.invalidate(request)
+            return response
+        if not request.cache_ttl:
+            return await self._send(request)
+        key, entry, upstream = self.cache.lookup(request)
+        if entry is not None and entry.fresh:
+            return entry.response
+        return self.cache.update(key, entry, request.cache_ttl, await self._send(upstream))
+
+    async def _send(self, request: HttpRequest):
+        if self.hedger is not None and request.hedge and request.method == "GET":
+            return await self.hedger.acall(request, self._resilient)
+        return await self._resilient(request)
+
+    async def _resilient(self, request: HttpRequest):
+        if self.resilience is None:
+            return await self._attempt(request, effective_timeout(request.timeout))
+        import httpx
+
+        return await self.resilience.acall(request, self._attempt, (httpx.TransportError,))
+
+    async def _attempt(self, request: HttpRequest, timeout: Tuple[float, float]):
+        import httpx
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire(request)
+        connect, read = timeout
+        client = self._client()
+        try:
+            headers, body = request.body(self.codec or default_codec())
+            outgoing = client.build_request(
+                request.method,
+                request.url,
+                headers=headers,
+                params=request.query(),
+                content=body,
+                timeout=httpx.Timeout(read, connect=connect),
+            )
+            response = await client.send(outgoing, stream=request.stream)
+        except BaseException:
+            if self.rate_limiter is not None:
+                self.rate_limiter.release(request)
+            raise
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(request, response)
+        return response
+
+    async def aclose(self) -> None:
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+_default_async_transport: Optional[AsyncHttpTransport] = None
+_default_lock = threading.Lock()
+
+
+def default_async_transport() -> AsyncHttpTransport:
+    """
+    Process-wide async transport for actions that were not bound to a tool.
+    """
+    global _default_async_transport
+    if _default_async_transport is None:
+        with _default_lock:
+            if _default_async_transport is None:
+                _default_async_transport = AsyncHttpTransport()
+    return _default_async_transport
@@ -0,0 +1,400 @@
+"""
+Base classes shared by the tool modules.
+"""
+import sys
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from pydantic import VERSION as PYDANTIC_VERSION, BaseModel, Field
+from shared.composio_tools.lib import Action, Tool
+
+from common.async_transport import AsyncHttpTransport, default_async_transport
+from common.batch import BatchCall, BatchResult, arun_batch, run_batch
+from common.cache import ResponseCache
+from common.codec import DecodedResponse, JsonCodec, default_codec
+from common.hedging import Hedger
+from common.http import HttpRequest, UpstreamError
+from common.jsonstream import DEFAULT_MAX_BYTES, StreamedList
+from common.projection import Projection, project_response
+from common.ratelimit import RateLimiter
+from common.resilience import DEFAULT_TIMEOUT, Resilience, deadline
+from common.singleflight import SingleFlight, flight_key
+from common.transport import HttpTransport, default_transport
+
+
+class TokenManager:
+    """
+    Keeps OAuth credentials fresh; the default passes them through unchanged.
+    """
+
+    def authorise(self, authorisation_data: dict) -> dict:
+        return authorisation_data
+
+    async def aauthorise(self, authorisation_data: dict) -> dict:
+        return authorisation_data
+
+
+class ActionRequest(BaseModel):
+    """
+    Base of every action's request model.
+    """
+    fields: Optional[str] = Field(
+        default=None,
+        description="Comma-separated dotted paths of the response to keep, e.g. id,name,map.summary_polyline. "
+        "Prefix a path with - to drop it instead; * returns everything.",
+    )
+
+    def body(self, **kwargs) -> dict:
+        """
+        The request as a provider payload: ``dict()`` without ``fields``,
+        which only shapes our response and must never be sent upstream.
+        """
+        exclude = set(kwargs.pop("exclude", None) or ()) | {"fields"}
+        return self.dict(exclude=exclude, **kwargs)
+
+
+# Validate response models as they are built; on by default under `python -X dev`.
+_strict_responses = sys.flags.dev_mode
+# The trusted fast path fills in pydantic v1 model state; other majors always validate.
+_trusted_responses_supported = PYDANTIC_VERSION.startswith("1.")
+
+
+def set_strict_responses(enabled: bool) -> None:
+    """
+    Turn full pydantic validation of every ``ActionResponse`` on or off.
+    """
+    global _strict_responses
+    _strict_responses = enabled
+
+
+@lru_cache(maxsize=None)
+def _response_fields(model: Type[BaseModel]) -> tuple:
+    return tuple(model.__fields__.items())
+
+
+class ActionResponse(BaseModel):
+    """
+    Base of every action's response model.
+
+    Responses wrap provider JSON that the codec has just decoded, so by
+    default they are built the way ``construct`` builds models: values are
+    stored as given, unknown keys are dropped and missing optional fields
+    get their defaults, with no validation pass. In strict mode (see
+    ``set_strict_responses``), and on any pydantic other than v1, they are
+    validated like any other model.
+    """
+
+    def __init__(__pydantic_self__, **data: Any) -> None:
+        if _strict_responses or not _trusted_responses_supported:
+            super().__init__(**data)
+            return
+        values = {}
+        for name, field in _response_fields(type(__pydantic_self__)):
+            if name in data:
+                values[name] = data[name]
+            elif not field.required:
+                values[name] = field.get_default()
+        object.__setattr__(__pydantic_self__, "__dict__", values)
+        object.__setattr__(__pydantic_self__, "__fields_set__", set(data) & values.keys())
+        if __pydantic_self__.__private_attributes__:
+            __pydantic_self__._init_private_attributes()
+
+
+# What a tool shares with its actions, and a composite action with its parts.
+_WIRING = ("transport", "async_transport", "single_flight", "token_manager")
+
+
+def _wire(action, source):
+    """
+    Give ``action`` (an action class or instance) the transports,
+    single-flight group and token manager of ``source``; returns ``action``.
+    """
+    for name in _WIRING:
+        setattr(action, name, getattr(source, name))
+    return action
+
+
+class HttpAction(Action):
+    """
+    Action that reaches its provider through injected HTTP transports.
+
+    Subclasses describe the call in ``prepare`` and turn the provider's
+    answer into the response model in ``parse``; ``execute`` and
+    ``aexecute`` only differ in which transport sends the request. Actions
+    whose decoding depends on the request put the relevant settings in
+    ``HttpRequest.decode_options`` and override ``decode``.
+
+    Response bodies are decoded with ``codec``, by default the fastest JSON
+    backend installed (see ``common.codec``). The request's ``fields`` (or
+    the action's ``default_fields``) trims the provider's JSON before the
+    response model validates it; see ``Projection``.
+
+    Read actions set ``cache_ttl`` to let a caching transport reuse their
+    responses for that many seconds; ``timeout`` is the (connect, read)
+    timeout of each attempt. Read-only actions may set ``hedge`` so that a
+    transport with a ``Hedger`` races a second copy of slow calls.
+
+    With an injected ``single_flight``, identical concurrent GETs of the
+    same action share one upstream call and one parsed response. An
+    injected ``token_manager`` refreshes OAuth tokens before they are used.
+
+    List actions that set ``stream_decode`` read their pages through
+    ``send_streamed``, decoding items while the body arrives instead of
+    buffering it; no page may exceed ``max_response_bytes``.
+    """
+    transport: Optional[HttpTransport] = None
+    async_transport: Optional[AsyncHttpTransport] = None
+    single_flight: Optional[SingleFlight] = None
+    token_manager: Optional[TokenManager] = None
+    cache_ttl: Optional[float] = None
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT
+    hedge: bool = False
+    default_fields: Optional[str] = None
+    codec: Optional[JsonCodec] = None
+    stream_decode: bool = False
+    max_response_bytes: Optional[int] = DEFAULT_MAX_BYTES
+
+    @property
+    def http(self) -> HttpTransport:
+        return self.transport or default_transport()
+
+    @property
+    def async_http(self) -> AsyncHttpTransport:
+        return self.async_transport or default_async_transport()
+
+    def authorise(self, authorisation_data: dict) -> dict:
+        if self.token_manager is None:
+            return authorisation_data
+        return self.token_manager.authorise(authorisation_data)
+
+    async def aauthorise(self, authorisation_data: dict) -> dict:
+        if self.token_manager is None:
+            return authorisation_data
+        return await self.token_manager.aauthorise(authorisation_data)
+
+    def sibling(self, action: Type["HttpAction"]) -> "HttpAction":
+        """
+        An instance of ``action`` sharing this action's transports,
+        single-flight group and token manager, for composite actions.
+        """
+        return _wire(action(), self)
+
+    def prepare(self, request: BaseModel, authorisation_data: dict) -> HttpRequest:
+        raise NotImplementedError
+
+    def parse(self, response) -> BaseModel:
+        raise NotImplementedError
+
+    def fields_spec(self, request: BaseModel) -> Optional[str]:
+        fields = getattr(request, "fields", None)
+        return self.default_fields if fields is None else fields
+
+    def projection(self, request: BaseModel) -> Optional[Projection]:
+        return Projection.parse(self.fields_spec(request))
+
+    @property
+    def json_codec(self) -> JsonCodec:
+        return self.codec or default_codec()
+
+    def decoded(self, response) -> DecodedResponse:
+        """
+        ``response`` with ``json()`` decoding through ``json_codec``.
+        """
+        return DecodedResponse(response, self.json_codec)
+
+    def projected(self, http_request: HttpRequest, response):
+        """
+        ``response`` decoded with ``json_codec`` and with the projection
+        chosen in ``build`` applied to its JSON.
+        """
+        fields = (http_request.decode_options or {}).get("fields")
+        return project_response(self.decoded(response), Projection.parse(fields))
+
+    def decode(self, http_request: HttpRequest, response) -> BaseModel:
+        return self.parse(self.projected(http_request, response))
+
+    def item_projection(self, request: BaseModel, envelope: Optional[str] = None) -> Optional[Projection]:
+        """
+        Projection of single listing items. ``envelope`` is the key the
+        provider wraps a page's items in, which ``fields`` paths start with.
+        """
+        projection = self.projection(request)
+        if projection is not None and envelope is not None:
+            projection = projection.child(envelope)
+        return projection
+
+    def collect(self, request: BaseModel, items: Iterable, envelope: Optional[str] = None) -> list:
+        """
+        Gather paginated ``items``, projecting each one as it arrives.
+        """
+        projection = self.item_projection(request, envelope)
+        if projection is None:
+            return list(items)
+        return [projection.apply(item) for item in items]
+
+    async def acollect(self, request: BaseModel, items: AsyncIterator, envelope: Optional[str] = None) -> list:
+        projection = self.item_projection(request, envelope)
+        if projection is None:
+            return [item async for item in items]
+        return [projection.apply(item) async for item in items]
+
+    def send_streamed(self, http_request: HttpRequest, envelope: Optional[str] = None, statuses: Tuple[int, ...] = (200,)) -> StreamedList:
+        """
+        Send ``http_request`` without reading its body and return the body's
+        items as a ``StreamedList``. Any status outside ``statuses`` raises
+        ``UpstreamError`` with the error payload.
+        """
+        http_request.stream = True
+        stream = StreamedList(self.http.send(http_request), envelope, self.max_response_bytes, self.json_codec)
+        if stream.status_code not in statuses:
+            raise UpstreamError(stream.status_code, stream.json())
+        return stream
+
+    async def asend_streamed(self, http_request: HttpRequest, envelope: Optional[str] = None, statuses: Tuple[int, ...] = (200,)) -> StreamedList:
+        http_request.stream = True
+        stream = StreamedList(await self.async_http.send(http_request), envelope, self.max_response_bytes, self.json_codec)
+        if stream.status_code not in statuses:
+            raise UpstreamError(stream.status_code, await stream.ajson())
+        return stream
+
+    def build(self, request: BaseModel, authorisation_data: dict) -> HttpRequest:
+        """
+        ``prepare`` the call and attach this action's transport policy to it.
+        """
+        http_request = self.prepare(request, authorisation_data)
+        http_request.cache_ttl = self.cache_ttl
+        http_request.timeout = self.timeout
+        http_request.hedge = self.hedge
+        http_request.endpoint = type(self).__name__
+        if self.projection(request) is not None:
+            http_request.decode_options = {**(http_request.decode_options or {}), "fields": self.fields_spec(request)}
+        return http_request
+
+    def execute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        http_request = self.build(request, self.authorise(authorisation_data))
+        if self.single_flight is None or http_request.method != "GET":
+            return self.decode(http_request, self.http.send(http_request))
+        return self.single_flight.do(
+            flight_key(http_request),
+            lambda: self.decode(http_request, self.http.send(http_request)),
+        )
+
+    async def aexecute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        http_request = self.build(request, await self.aauthorise(authorisation_data))
+        if self.single_flight is None or http_request.method != "GET":
+            return self.decode(http_request, await self.async_http.send(http_request))
+
+        async def work() -> BaseModel:
+            return self.decode(http_request, await self.async_http.send(http_request))
+
+        return await self.single_flight.ado(flight_key(http_request), work)
+
+
+class HttpTool(Tool):
+    """
+    Tool whose actions share the tool's HTTP transports, single-flight group
+    and token manager.
+
+    Every subclass gets its own response cache, rate limiter, resilience
+    policy, hedger and single-flight group, and a sync and an async
+    transport built on them, keeping ``host_pool_sizes`` connections open
+    per listed host. A subclass overrides only what differs, either by
+    setting the attribute itself or, for the token manager, through
+    ``create_token_manager``.
+
+    ``max_concurrency`` is the default number of calls a batch keeps in
+    flight against the provider.
+    """
+    cache: Optional[ResponseCache] = None
+    rate_limiter: Optional[RateLimiter] = None
+    resilience: Optional[Resilience] = None
+    hedger: Optional[Hedger] = None
+    transport: Optional[HttpTransport] = None
+    async_transport: Optional[AsyncHttpTransport] = None
+    single_flight: Optional[SingleFlight] = None
+    token_manager: Optional[TokenManager] = None
+    host_pool_sizes: Optional[Dict[str, int]] = None
+    max_concurrency: int = 8
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        own = vars(cls)
+        for name, factory in (
+            ("cache", ResponseCache),
+            ("rate_limiter", RateLimiter),
+            ("resilience", Resilience),
+            ("hedger", Hedger),
+            ("single_flight", SingleFlight),
+        ):
+            if name not in own:
+                setattr(cls, name, factory())
+        policies = dict(cache=cls.cache, rate_limiter=cls.rate_limiter, resilience=cls.resilience, hedger=cls.hedger)
+        if "transport" not in own:
+            cls.transport = HttpTransport(host_pool_sizes=cls.host_pool_sizes, **policies)
+        if "async_transport" not in own:
+            cls.async_transport = AsyncHttpTransport(**policies)
+        if "token_manager" not in own:
+            cls.token_manager = cls.create_token_manager()
+
+    @classmethod
+    def create_token_manager(cls) -> Optional[TokenManager]:
+        """
+        The token manager of this tool's actions, built once its transports
+        exist; none by default.
+        """
+        return None
+
+    def bind(self, actions: List[Type[HttpAction]]) -> List[Type[HttpAction]]:
+        """
+        Inject this tool's transports into the given action classes and
+        return them.
+        """
+        for action in actions:
+            _wire(action, self)
+        return actions
+
+    def instance(self, action: Type[HttpAction]) -> HttpAction:
+        """
+        Create an instance of ``action`` wired to this tool's transports,
+        without touching the class itself.
+        """
+        return _wire(action(), self)
+
+    def execute_batch(
+        self,
+        calls: Sequence[BatchCall],
+        authorisation_data: dict,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> List[BatchResult]:
+        """
+        Execute ``[(ActionClass, request), ...]`` concurrently on a bounded
+        thread pool and return one ``BatchResult`` per call, in order.
+
+        ``timeout`` is an overall deadline in seconds for the whole batch;
+        calls that cannot finish within it fail with ``DeadlineExceeded``.
+        """
+        with deadline(timeout) if timeout is not None else nullcontext():
+            return run_batch(
+                calls,
+                lambda action, request: self.instance(action).execute(request, authorisation_data),
+                max_concurrency or self.max_concurrency,
+            )
+
+    async def aexecute_batch(
+        self,
+        calls: Sequence[BatchCall],
+        authorisation_data: dict,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> List[BatchResult]:
+        """
+        asyncio counterpart of ``execute_batch`` built on ``aexecute``.
+        """
+        with deadline(timeout) if timeout is not None else nullcontext():
+            return await arun_batch(
+                calls,
+                lambda action, request: self.instance(action).aexecute(request, authorisation_data),
+                max_concurrency or self.max_concurrency,
+            )
@@ -0,0 +1,74 @@
+"""
+Fan-out helpers behind ``HttpTool.execute_batch``.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+BatchCall = Tuple[Type, BaseModel]
+
+
+@dataclass
+class BatchResult:
+    """
+    Outcome of one call in a batch; ``error`` is set when the call raised.
+    """
+    action: Type
+    request: BaseModel
+    response: Optional[BaseModel] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and bool(getattr(self.response, "success", True))
+
+
+def run_batch(
+    calls: Sequence[BatchCall],
+    run: Callable[[Type, BaseModel], Any],
+    max_concurrency: int,
+) -> List[BatchResult]:
+    """
+    Run ``run(action, request)`` for every call on at most
+    ``max_concurrency`` threads; results come back in input order.
+    """
+    def _one(call: BatchCall) -> BatchResult:
+        action, request = call
+        try:
+            return BatchResult(action, request, response=run(action, request))
+        except Exception as exc:
+            return BatchResult(action, request, error=exc)
+
+    if not calls:
+        return []
+    workers = max(1, min(max_concurrency, len(calls)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Workers run each call in the submitter's context so deadlines carry over.
+        futures = [pool.submit(contextvars.copy_context().run, _one, call) for call in calls]
+        return [future.result() for future in futures]
+
+
+async def arun_batch(
+    calls: Sequence[BatchCall],
+    run: Callable[[Type, BaseModel], Awaitable[Any]],
+    max_concurrency: int,
+) -> List[BatchResult]:
+    """
+    asyncio counterpart of ``run_batch``: at most ``max_concurrency`` calls
+    are in flight at once on the running loop.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _one(call: BatchCall) -> BatchResult:
+        action, request = call
+        async with semaphore:
+            try:
+                return BatchResult(action, request, response=await run(action, request))
+            except Exception as exc:
+                return BatchResult(action, request, error=exc)
+
+    return list(await asyncio.gather(*(_one(call) for call in calls)))
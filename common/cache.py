@@ -0,0 +1,182 @@
+"""
+Shared HTTP response cache with TTLs and ETag revalidation.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from common.codec import default_codec
+from common.http import HttpRequest
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+CACHEABLE_STATUSES = (200, 206)
+
+CacheKey = Tuple[str, str, str, str]
+
+
+class CachedHeaders(dict):
+    """
+    Response headers stored with lower-cased names, looked up case-insensitively.
+    """
+
+    def __init__(self, headers: Any = ()):
+        super().__init__((name.lower(), value) for name, value in dict(headers).items())
+
+    def __getitem__(self, name: str) -> str:
+        return super().__getitem__(name.lower())
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and super().__contains__(name.lower())
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return super().get(name.lower(), default)
+
+
+@dataclass
+class CachedResponse:
+    """
+    Response replayed from the cache; quacks like the transports' responses.
+    """
+    status_code: int
+    headers: CachedHeaders
+    content: bytes
+
+    def json(self) -> Any:
+        return default_codec().loads(self.content)
+
+
+@dataclass
+class CacheEntry:
+    response: CachedResponse
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.response.content)
+
+
+def credential_of(headers: Dict[str, str]) -> str:
+    """
+    Stable, non-reversible identifier of the credential a request is sent with.
+    """
+    for name, value in headers.items():
+        if name.lower() == "authorization":
+            return hashlib.sha256(value.encode()).hexdigest()
+    return ""
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of GET responses, bounded by total body bytes.
+
+    Entries are keyed by credential, URL, query and ``Range`` header and
+    live for the TTL the action asks for. Expired entries that carry an
+    ``ETag`` or ``Last-Modified`` are kept and revalidated with a
+    conditional request; a 304 answer renews them without a body.
+    Successful writes drop every entry of the same credential at, above or
+    below the written URL.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request: HttpRequest) -> CacheKey:
+        query = urlencode(sorted((request.query() or {}).items()))
+        range_ = next((v for k, v in request.headers.items() if k.lower() == "range"), "")
+        return credential_of(request.headers), request.url, query, range_
+
+    def lookup(self, request: HttpRequest) -> Tuple[CacheKey, Optional[CacheEntry], HttpRequest]:
+        """
+        Find the entry for ``request``. Returns its key, the entry (fresh or
+        stale) and the request to send upstream, which carries conditional
+        headers when a stale entry can be revalidated.
+        """
+        key = self.key(request)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None or entry.fresh:
+            return key, entry, request
+        conditional = {}
+        etag = entry.response.headers.get("etag")
+        last_modified = entry.response.headers.get("last-modified")
+        if etag:
+            conditional["If-None-Match"] = etag
+        if last_modified:
+            conditional["If-Modified-Since"] = last_modified
+        if conditional:
+            request = replace(request, headers={**request.headers, **conditional})
+        return key, entry, request
+
+    def update(self, key: CacheKey, entry: Optional[CacheEntry], ttl: float, response: Any) -> Any:
+        """
+        Record the upstream ``response`` to a (possibly conditional) GET and
+        return what the caller should see.
+        """
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                entry.expires_at = time.monotonic() + ttl
+            return entry.response
+        if response.status_code in CACHEABLE_STATUSES:
+            cached = CachedResponse(response.status_code, CachedHeaders(response.headers), response.content)
+            self._store(key, CacheEntry(cached, time.monotonic() + ttl))
+        return response
+
+    def _store(self, key: CacheKey, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def invalidate(self, request: HttpRequest) -> int:
+        """
+        Drop the entries a write to ``request.url`` may have changed and
+        return how many were removed.
+        """
+        credential = credential_of(request.headers)
+        written = request.url.rstrip("/")
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[0] == credential and _related(key[1].rstrip("/"), written)
+            ]
+            for key in stale:
+                self._bytes -= self._entries.pop(key).size
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+
+def _related(cached_url: str, written_url: str) -> bool:
+    return (
+        cached_url == written_url
+        or cached_url.startswith(written_url + "/")
+        or written_url.startswith(cached_url + "/")
+    )
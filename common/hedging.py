@@ -0,0 +1,203 @@
+"""
+Hedged requests: race a second copy of a slow idempotent read.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from common.http import HttpRequest
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent latencies for one endpoint.
+    """
+
+    def __init__(self, window: int):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """
+    Caps hedges at ``fraction`` of eligible requests: each request earns
+    ``fraction`` of a token, each hedge spends a whole one.
+    """
+
+    def __init__(self, fraction: float, max_tokens: float = 10.0):
+        self.fraction = fraction
+        self.max_tokens = max_tokens
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.fraction)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Hedger:
+    """
+    Sends a second copy of an opted-in GET when the first has not answered
+    within the endpoint's ``percentile`` latency, and keeps the first answer.
+
+    Thresholds adapt per endpoint once ``min_samples`` latencies are known,
+    never dropping below ``min_delay``. Extra upstream load is capped by a
+    ``HedgeBudget`` of ``budget_fraction``. Blocking attempts run on the
+    hedging pool so the caller can take whichever answers first; the delay
+    is counted from when the first attempt starts running, so time spent
+    queueing for a worker never triggers a hedge. Losing responses are
+    closed and losers that have not started are cancelled.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget_fraction: float = 0.05,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+        max_workers: int = 32,
+    ):
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = HedgeBudget(budget_fraction)
+        self.hedges_sent = 0
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def _tracker(self, request: HttpRequest) -> LatencyTracker:
+        key = request.endpoint or request.url
+        tracker = self._trackers.get(key)
+        if tracker is None:
+            tracker = self._trackers.setdefault(key, LatencyTracker(self.window))
+        return tracker
+
+    def _delay(self, tracker: LatencyTracker) -> Optional[float]:
+        threshold = tracker.percentile(self.percentile, self.min_samples)
+        return None if threshold is None else max(threshold, self.min_delay)
+
+    def _hedged(self) -> bool:
+        if not self.budget.spend():
+            return False
+        with self._lock:
+            self.hedges_sent += 1
+        return True
+
+    def _submit(self, send: Callable[[HttpRequest], Any], request: HttpRequest, running: Optional[threading.Event] = None):
+        def attempt():
+            if running is not None:
+                running.set()
+            return send(request)
+
+        return self._pool.submit(contextvars.copy_context().run, attempt)
+
+    def call(self, request: HttpRequest, send: Callable[[HttpRequest], Any]) -> Any:
+        tracker = self._tracker(request)
+        self.budget.deposit()
+        delay = self._delay(tracker)
+        started = time.monotonic()
+        if delay is None:
+            response = send(request)
+            tracker.record(time.monotonic() - started)
+            return response
+
+        running = threading.Event()
+        pending = {self._submit(send, request, running)}
+        try:
+            running.wait()
+            done, pending = wait(pending, timeout=delay)
+            if not done and self._hedged():
+                pending.add(self._submit(send, request))
+            error: Optional[BaseException] = None
+            while True:
+                winner = next((future for future in done if future.exception() is None), None)
+                if winner is not None:
+                    tracker.record(time.monotonic() - started)
+                    for loser in done - {winner}:
+                        _close_loser(loser)
+                    return winner.result()
+                for future in done:
+                    error = future.exception()
+                if not pending:
+                    raise error
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        finally:
+            for loser in pending:
+                if not loser.cancel():
+                    loser.add_done_callback(_close_loser)
+
+    async def acall(self, request: HttpRequest, send: Callable[[HttpRequest], Awaitable[Any]]) -> Any:
+        tracker = self._tracker(request)
+        self.budget.deposit()
+        delay = self._delay(tracker)
+        started = time.monotonic()
+        if delay is None:
+            response = await send(request)
+            tracker.record(time.monotonic() - started)
+            return response
+
+        pending = {asyncio.ensure_future(send(request))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done and self._hedged():
+                pending.add(asyncio.ensure_future(send(request)))
+            error: Optional[BaseException] = None
+            while True:
+                done = {task for task in done if not task.cancelled()}
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    tracker.record(time.monotonic() - started)
+                    for loser in done - {winner}:
+                        if loser.exception() is None:
+                            await _aclose(loser.result())
+                    return winner.result()
+                for task in done:
+                    error = task.exception()
+                if not pending:
+                    if error is None:
+                        raise asyncio.CancelledError()
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for loser in pending:
+                loser.cancel()
+
+
+def _close_loser(future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    response = future.result()
+    if hasattr(response, "close"):
+        response.close()
+
+
+async def _aclose(response: Any) -> None:
+    if hasattr(response, "aclose"):
+        await response.aclose()
+    elif hasattr(response, "close"):
+        response.close()
@@ -0,0 +1,73 @@
+"""
+Transport-neutral description of an outgoing HTTP call.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from common.codec import JsonCodec
+
+
+@dataclass
+class HttpRequest:
+    """
+    What an action wants sent; built by ``HttpAction.prepare`` and sent by
+    either the blocking or the asyncio transport.
+
+    ``cache_ttl`` lets a transport with a ``ResponseCache`` serve the GET
+    from cache for that many seconds; ``timeout`` is the (connect, read)
+    timeout in seconds. ``hedge`` opts the GET into hedging, and
+    ``endpoint`` names the action it came from for per-endpoint statistics.
+    With ``stream`` the transport returns as soon as the headers are in and
+    leaves the body to be read, and the connection released, by the caller;
+    such calls are neither cached nor hedged.
+    """
+    method: str
+    url: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    params: Optional[Dict[str, Any]] = None
+    json: Any = None
+    cache_ttl: Optional[float] = None
+    timeout: Optional[Tuple[float, float]] = None
+    hedge: bool = False
+    endpoint: Optional[str] = None
+    decode_options: Optional[Dict[str, Any]] = None
+    stream: bool = False
+
+    def body(self, codec: JsonCodec) -> Tuple[Dict[str, str], Optional[bytes]]:
+        """
+        Headers and body to send, with ``json`` encoded by ``codec``.
+        """
+        if self.json is None:
+            return self.headers, None
+        headers = self.headers
+        if not any(name.lower() == "content-type" for name in headers):
+            headers = {**headers, "Content-Type": "application/json"}
+        return headers, codec.dumps(self.json)
+
+    def query(self) -> Optional[Dict[str, Any]]:
+        """
+        Query parameters with ``None`` values dropped and booleans rendered
+        the same way by both HTTP clients.
+        """
+        if self.params is None:
+            return None
+        query = {}
+        for key, value in self.params.items():
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            query[key] = value
+        return query
+
+
+class UpstreamError(Exception):
+    """
+    Raised by helpers that cannot report failure through a response model,
+    such as streaming iterators, when the provider answers with an error.
+    """
+
+    def __init__(self, status_code: int, payload: Any = None):
+        super().__init__(f"upstream returned HTTP {status_code}")
+        self.status_code = status_code
+        self.payload = payload
@@ -0,0 +1,250 @@
+"""
+Incremental decoding of JSON list responses as their body arrives.
+"""
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from common.codec import JsonCodec, default_codec
+
+CHUNK_SIZE = 64 * 1024
+# Largest decoded body a single streamed response may have.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITERS = ",]} \t\n\r"
+_INCOMPLETE = object()
+
+
+class ResponseTooLarge(ValueError):
+    """
+    A streamed response body grew past its byte cap; the connection has
+    been closed without reading the rest.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"response body exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class ListParser:
+    """
+    Push parser for a JSON array, or for an object holding one under the key
+    ``envelope`` (e.g. Workable's ``{"members": [...], "paging": {...}}``).
+
+    ``feed`` takes the next bytes of the document and returns the items
+    completed by them; only the unfinished tail of the document is kept.
+    The envelope's other keys end up in ``fields``.
+    """
+
+    def __init__(self, envelope: Optional[str] = None):
+        self.envelope = envelope
+        self.fields: Dict[str, Any] = {}
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._state = "start"
+        self._key = None
+        # Do not re-scan an unfinished value until the buffer has doubled.
+        self._resume = 0
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, data: bytes, final: bool = False) -> List[Any]:
+        self._buffer += self._text.decode(data, final)
+        if len(self._buffer) < self._resume and not final:
+            return []
+        items: List[Any] = []
+        position = self._parse(items, final)
+        self._buffer = self._buffer[position:]
+        self._resume = 2 * len(self._buffer) if self._buffer.strip() else 0
+        return items
+
+    def close(self) -> List[Any]:
+        items = self.feed(b"", final=True)
+        if not self.done:
+            raise ValueError("JSON document ended before its list did")
+        return items
+
+    def _value(self, position: int, final: bool):
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, position)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return _INCOMPLETE, position
+        # A number cut off by the end of the chunk ("12", "-4.", "1e")
+        # decodes as a shorter one; wait until it is followed by a delimiter.
+        if not final and (end == len(self._buffer) or self._buffer[end] not in _DELIMITERS):
+            return _INCOMPLETE, position
+        return value, end
+
+    def _expect(self, char: str, expected: str, position: int) -> None:
+        if char not in expected:
+            raise ValueError(f"expected one of {expected!r} at {position}, got {char!r}")
+
+    def _parse(self, items: List[Any], final: bool) -> int:
+        buffer = self._buffer
+        position = 0
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                return position
+            char = buffer[position]
+            state = self._state
+            if state == "done":
+                raise ValueError(f"extra data at {position}")
+            if state == "start":
+                self._expect(char, "[" if self.envelope is None else "{", position)
+                self._state = "array" if self.envelope is None else "object"
+                position += 1
+            elif state == "array" and char == "]":
+                self._state = self._after_array()
+                position += 1
+            elif state == "object" and char == "}":
+                self._state = "done"
+                position += 1
+            elif state in ("array", "array_next"):
+                value, position = self._value(position, final)
+                if value is _INCOMPLETE:
+                    return position
+                items.append(value)
+                self._state = "array_sep"
+            elif state == "array_sep":
+                self._expect(char, ",]", position)
+                self._state = "array_next" if char == "," else self._after_array()
+                position += 1
+            elif state in ("object", "object_next"):
+                key, end = self._value(position, final)
+                if key is _INCOMPLETE:
+                    return position
+                if not isinstance(key, str):
+                    raise ValueError(f"expected an object key at {position}")
+                end = _WHITESPACE.match(buffer, end).end()
+                if end == len(buffer):
+                    return position
+                self._expect(buffer[end], ":", end)
+                self._key = key
+                self._state = "envelope" if key == self.envelope else "value"
+                position = end + 1
+            elif state == "envelope" and char == "[":
+                self._state = "array"
+                position += 1
+            elif state in ("envelope", "value"):
+                value, position = self._value(position, final)
+                if value is _INCOMPLETE:
+                    return position
+                if state == "envelope":
+                    items.extend(value or [])
+                else:
+                    self.fields[self._key] = value
+                self._state = "object_sep"
+            elif state == "object_sep":
+                self._expect(char, ",}", position)
+                self._state = "object_next" if char == "," else "done"
+                position += 1
+
+    def _after_array(self) -> str:
+        return "done" if self.envelope is None else "object_sep"
+
+
+class StreamedList:
+    """
+    A JSON list response, decoded item by item while its body is read.
+
+    Iterate it (with ``for`` on a ``requests`` response sent with
+    ``stream=True``, ``async for`` on a streamed ``httpx`` response) to get
+    the items of the top-level array, or of the array under ``envelope``;
+    the envelope's other keys are in ``fields`` once iteration is over.
+    Only the item being decoded is held, never the whole body. More than
+    ``max_bytes`` of body raises ``ResponseTooLarge``. The response is
+    closed when iteration ends, however it ends. ``json``/``ajson`` decode
+    with ``codec``, by default the process-wide ``default_codec()``.
+    """
+
+    def __init__(
+        self,
+        response,
+        envelope: Optional[str] = None,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        codec: Optional[JsonCodec] = None,
+    ):
+        self.response = response
+        self.envelope = envelope
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    def _count(self, received: int, chunk: bytes) -> int:
+        received += len(chunk)
+        if self.max_bytes is not None and received > self.max_bytes:
+            raise ResponseTooLarge(self.max_bytes)
+        return received
+
+    def _check_length(self) -> None:
+        length = self.response.headers.get("Content-Length")
+        if self.max_bytes is not None and length and length.isdigit() and int(length) > self.max_bytes:
+            raise ResponseTooLarge(self.max_bytes)
+
+    def _chunks(self) -> Iterator[bytes]:
+        self._check_length()
+        received = 0
+        for chunk in self.response.iter_content(CHUNK_SIZE):
+            received = self._count(received, chunk)
+            yield chunk
+
+    async def _achunks(self) -> AsyncIterator[bytes]:
+        self._check_length()
+        received = 0
+        async for chunk in self.response.aiter_bytes(CHUNK_SIZE):
+            received = self._count(received, chunk)
+            yield chunk
+
+    def __iter__(self) -> Iterator[Any]:
+        parser = ListParser(self.envelope)
+        self.fields = parser.fields
+        try:
+            for chunk in self._chunks():
+                yield from parser.feed(chunk)
+            yield from parser.close()
+        finally:
+            self.response.close()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        parser = ListParser(self.envelope)
+        self.fields = parser.fields
+        try:
+            async for chunk in self._achunks():
+                for item in parser.feed(chunk):
+                    yield item
+            for item in parser.close():
+                yield item
+        finally:
+            await self.response.aclose()
+
+    def json(self) -> Any:
+        """
+        The whole body decoded at once, still under the byte cap; meant for
+        error payloads.
+        """
+        try:
+            return (self.codec or default_codec()).loads(b"".join(self._chunks()))
+        finally:
+            self.response.close()
+
+    async def ajson(self) -> Any:
+        try:
+            return (self.codec or default_codec()).loads(b"".join([chunk async for chunk in self._achunks()]))
+        finally:
+            await self.response.aclose()
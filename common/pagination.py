@@ -0,0 +1,104 @@
+"""
+Streaming pagination helpers for provider list endpoints.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Tuple
+
+
+def iter_numbered_pages(
+    fetch: Callable[[int], List],
+    first_page: int,
+    page_size: int,
+    prefetch: bool = False,
+) -> Iterator:
+    """
+    Yield items from ``fetch(page)`` for ``first_page``, ``first_page + 1``, …
+    until a page comes back shorter than ``page_size``.
+
+    With ``prefetch`` the next page is requested on a background thread
+    while the caller consumes the current one, in a copy of the caller's
+    context so a surrounding ``deadline`` still applies; at most one extra
+    page is fetched past the end of the listing.
+    """
+    page = first_page
+    if not prefetch:
+        while True:
+            items = fetch(page)
+            yield from items
+            if len(items) < page_size:
+                return
+            page += 1
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(contextvars.copy_context().run, fetch, page)
+        while True:
+            items = pending.result()
+            if len(items) < page_size:
+                yield from items
+                return
+            page += 1
+            pending = pool.submit(contextvars.copy_context().run, fetch, page)
+            yield from items
+
+
+async def aiter_numbered_pages(
+    fetch: Callable[[int], Awaitable[List]],
+    first_page: int,
+    page_size: int,
+    prefetch: bool = False,
+) -> AsyncIterator:
+    """
+    asyncio counterpart of ``iter_numbered_pages``; ``prefetch`` runs the
+    next page's request as a task while the current one is consumed.
+    """
+    page = first_page
+    pending = asyncio.ensure_future(fetch(page))
+    try:
+        while True:
+            items = await pending
+            pending = None
+            last = len(items) < page_size
+            if not last:
+                page += 1
+                if prefetch:
+                    pending = asyncio.ensure_future(fetch(page))
+            for item in items:
+                yield item
+            if last:
+                return
+            if pending is None:
+                pending = asyncio.ensure_future(fetch(page))
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+
+def iter_cursor_pages(fetch: Callable[[Any], Tuple[List, Optional[Any]]], first_cursor: Any) -> Iterator:
+    """
+    Yield items from a listing where each page says where the next one is,
+    e.g. Heroku's ``Next-Range`` header or Workable's ``paging.next`` link.
+
+    ``fetch(cursor)`` returns one page of items and the cursor for the next
+    page, or ``None`` once the listing is exhausted.
+    """
+    cursor = first_cursor
+    while cursor is not None:
+        items, cursor = fetch(cursor)
+        yield from items
+
+
+async def aiter_cursor_pages(
+    fetch: Callable[[Any], Awaitable[Tuple[List, Optional[Any]]]],
+    first_cursor: Any,
+) -> AsyncIterator:
+    """
+    asyncio counterpart of ``iter_cursor_pages``.
+    """
+    cursor = first_cursor
+    while cursor is not None:
+        items, cursor = await fetch(cursor)
+        for item in items:
+            yield item
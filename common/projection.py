@@ -0,0 +1,134 @@
+"""
+Field projection of provider JSON, applied before response models see it.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+
+# A `fields` spec meaning "everything", overriding an action's default.
+ALL_FIELDS = "*"
+
+Tree = Dict[str, Any]
+
+
+def _tree(paths: Iterable[str]) -> Tree:
+    tree: Tree = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for key in parents:
+            child = node.setdefault(key, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node[leaf] = True
+    return tree
+
+
+def _include(value: Any, tree: Tree) -> Any:
+    if isinstance(value, list):
+        return [_include(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kept = {}
+    for key, subtree in tree.items():
+        if key in value:
+            kept[key] = value[key] if subtree is True else _include(value[key], subtree)
+    return kept
+
+
+def _exclude(value: Any, tree: Tree) -> Any:
+    if isinstance(value, list):
+        return [_exclude(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kept = {}
+    for key, item in value.items():
+        subtree = tree.get(key)
+        if subtree is None:
+            kept[key] = item
+        elif subtree is not True:
+            kept[key] = _exclude(item, subtree)
+    return kept
+
+
+class Projection:
+    """
+    Which parts of a JSON document to keep.
+
+    Built from a ``fields`` spec of comma-separated dotted paths such as
+    ``"id,name,map.summary_polyline"``. Paths prefixed with ``-`` are
+    dropped instead, e.g. ``"-segment_efforts,-map.polyline"``; with no
+    plain paths everything else is kept. Lists are traversed transparently,
+    so a path applies to every item.
+    """
+
+    def __init__(self, include: Optional[Iterable[str]] = None, exclude: Iterable[str] = ()):
+        self.include = None if include is None else _tree(include)
+        self.exclude = _tree(exclude)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def parse(spec: Optional[str]) -> Optional["Projection"]:
+        """
+        The projection of a ``fields`` spec, or None when it keeps everything.
+        """
+        if not spec or spec.strip() == ALL_FIELDS:
+            return None
+        paths = [path.strip() for path in spec.split(",") if path.strip()]
+        include = [path for path in paths if not path.startswith("-")]
+        exclude = [path[1:] for path in paths if path.startswith("-")]
+        return Projection(include or None, exclude)
+
+    def apply(self, value: Any) -> Any:
+        if self.include is not None:
+            value = _include(value, self.include)
+        if self.exclude:
+            value = _exclude(value, self.exclude)
+        return value
+
+    def child(self, key: str) -> Optional["Projection"]:
+        """
+        The projection of the items under ``key``, for listings whose items
+        have already been unwrapped from their envelope.
+        """
+        child = Projection()
+        if self.include is not None:
+            subtree = self.include.get(key, {})
+            child.include = None if subtree is True else subtree
+        subtree = self.exclude.get(key)
+        if subtree is True:
+            child.include = {}
+        elif subtree is not None:
+            child.exclude = subtree
+        return child
+
+
+class ProjectedResponse:
+    """
+    Wraps a successful HTTP response so that ``json()`` returns the projected
+    document; everything else is passed through.
+    """
+
+    def __init__(self, response, projection: Projection):
+        self._response = response
+        self._projection = projection
+        self._json = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    def json(self, **kwargs) -> Any:
+        if self._json is None:
+            self._json = self._projection.apply(self._response.json(**kwargs))
+        return self._json
+
+
+def project_response(response, projection: Optional[Projection]):
+    """
+    ``response`` with its JSON projected, unless there is nothing to project
+    or it is an error whose payload should reach the caller intact.
+    """
+    if projection is None or response.status_code >= 400:
+        return response
+    return ProjectedResponse(response, projection)
@@ -0,0 +1,253 @@
+"""
+Rate-limit-aware scheduling driven by the providers' quota headers.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+from common.cache import credential_of
+from common.http import HttpRequest
+from common.resilience import DeadlineExceeded, time_left
+
+DEFAULT_BURST = 10
+# Heroku refills an account's 4500-request budget continuously over an hour.
+HEROKU_REFILL_RATE = 4500 / 3600
+
+BucketKey = Tuple[str, str]
+
+
+@dataclass
+class Budget:
+    """
+    What a response says about the remaining quota: ``remaining`` calls now,
+    refilled at ``rate`` calls per second, or none until ``reset_in`` seconds.
+    """
+    remaining: float
+    rate: float
+    reset_in: Optional[float] = None
+
+
+def _strava_budget(limits: str, usage: str, now: datetime) -> Budget:
+    # Strava reports "15-minute,daily" pairs; windows end on the quarter hour and at UTC midnight.
+    short_limit, daily_limit = (int(v) for v in limits.split(","))
+    short_usage, daily_usage = (int(v) for v in usage.split(","))
+    quarter_end = now.replace(minute=now.minute - now.minute % 15, second=0, microsecond=0) + timedelta(minutes=15)
+    day_end = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    windows = [
+        (short_limit - short_usage, (quarter_end - now).total_seconds()),
+        (daily_limit - daily_usage, (day_end - now).total_seconds()),
+    ]
+    remaining, reset_in = min(windows, key=lambda w: max(w[0], 0) / max(w[1], 1))
+    remaining = max(remaining, 0)
+    return Budget(remaining, remaining / max(reset_in, 1), reset_in)
+
+
+def parse_budget(headers: Mapping[str, str], now: Optional[datetime] = None) -> Optional[Budget]:
+    """
+    Read the quota headers of Strava, Heroku or Workable; ``None`` if the
+    response carries none.
+    """
+    now = now or datetime.now(timezone.utc)
+    budgets = []
+    for prefix in ("X-RateLimit", "X-ReadRateLimit"):
+        limits, usage = headers.get(f"{prefix}-Limit"), headers.get(f"{prefix}-Usage")
+        if limits and usage:
+            try:
+                budgets.append(_strava_budget(limits, usage, now))
+            except ValueError:
+                pass
+    heroku_remaining = headers.get("RateLimit-Remaining")
+    if heroku_remaining is not None:
+        budgets.append(Budget(float(heroku_remaining), HEROKU_REFILL_RATE))
+    workable_remaining, workable_reset = headers.get("X-Rate-Limit-Remaining"), headers.get("X-Rate-Limit-Reset")
+    if workable_remaining is not None and workable_reset is not None:
+        reset_in = max(float(workable_reset) - now.timestamp(), 1)
+        budgets.append(Budget(float(workable_remaining), float(workable_remaining) / reset_in, reset_in))
+    if not budgets:
+        return None
+    return min(budgets, key=lambda b: (b.remaining, b.rate))
+
+
+class TokenBucket:
+    """
+    Token bucket whose capacity and refill rate follow the latest ``Budget``.
+
+    Until a budget is learned the bucket does not pace calls. A budget only
+    ever lowers the token count: the provider's ``remaining`` does not yet
+    count the ``in_flight`` calls whose tokens were already taken.
+    """
+
+    def __init__(self, burst: int = DEFAULT_BURST):
+        self.burst = burst
+        self.capacity: Optional[float] = None
+        self.tokens = 0.0
+        self.rate = 0.0
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.in_flight = 0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, now: float) -> float:
+        """
+        Take a token if one is available and return 0, otherwise return how
+        long to wait before trying again.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.capacity is None:
+            self.in_flight += 1
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.in_flight += 1
+            return 0.0
+        if self.rate <= 0:
+            return max(self.blocked_until - now, 1.0)
+        return (1 - self.tokens) / self.rate
+
+    def release(self) -> None:
+        self.in_flight = max(self.in_flight - 1, 0)
+
+    def learn(self, budget: Budget, now: float) -> None:
+        self._refill(now)
+        first = self.capacity is None
+        self.capacity = max(1.0, min(budget.remaining, self.burst))
+        available = max(budget.remaining - self.in_flight, 0.0)
+        self.tokens = min(self.capacity if first else self.tokens, available, self.capacity)
+        self.rate = budget.rate
+        if budget.remaining < 1 and budget.reset_in:
+            self.blocked_until = now + budget.reset_in
+
+    def block(self, seconds: float, now: float) -> None:
+        self._refill(now)
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """
+    Per-credential scheduler that paces calls before they are sent.
+
+    One ``TokenBucket`` is kept per host and credential. Every response
+    teaches the bucket the provider's current budget, and a 429 blocks it
+    for ``Retry-After`` seconds.
+    """
+
+    def __init__(self, burst: int = DEFAULT_BURST):
+        self.burst = burst
+        self._buckets: Dict[BucketKey, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request: HttpRequest) -> BucketKey:
+        return urlsplit(request.url).netloc, credential_of(request.headers)
+
+    def _bucket(self, key: BucketKey) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets.setdefault(key, TokenBucket(self.burst))
+        return bucket
+
+    def _reserve(self, bucket: TokenBucket) -> float:
+        with self._lock:
+            wait = bucket.reserve(time.monotonic())
+        left = time_left()
+        if wait and left is not None and wait >= left:
+            raise DeadlineExceeded("rate limit budget would outlast the deadline")
+        return wait
+
+    def acquire(self, request: HttpRequest) -> None:
+        """
+        Block the calling thread until ``request`` may be sent; raises
+        ``DeadlineExceeded`` instead of waiting past the current deadline.
+        """
+        bucket = self._bucket(self.key(request))
+        wait = self._reserve(bucket)
+        if not wait:
+            return
+        with self._lock:
+            bucket.waiting += 1
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = self._reserve(bucket)
+        finally:
+            with self._lock:
+                bucket.waiting -= 1
+
+    async def aacquire(self, request: HttpRequest) -> None:
+        """
+        asyncio counterpart of ``acquire``.
+        """
+        bucket = self._bucket(self.key(request))
+        wait = self._reserve(bucket)
+        if not wait:
+            return
+        with self._lock:
+            bucket.waiting += 1
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._reserve(bucket)
+        finally:
+            with self._lock:
+                bucket.waiting -= 1
+
+    def release(self, request: HttpRequest) -> None:
+        """
+        Mark a call taken by ``acquire`` as no longer in flight, when it
+        failed without a response to ``observe``.
+        """
+        bucket = self._bucket(self.key(request))
+        with self._lock:
+            bucket.release()
+
+    def observe(self, request: HttpRequest, response: Any) -> None:
+        """
+        Learn the remaining budget from ``response``'s headers.
+        """
+        bucket = self._bucket(self.key(request))
+        budget = parse_budget(response.headers)
+        with self._lock:
+            now = time.monotonic()
+            bucket.release()
+            if budget is not None:
+                bucket.learn(budget, now)
+            if response.status_code == 429:
+                retry_after = response.headers.get("Retry-After")
+                bucket.block(float(retry_after) if retry_after and retry_after.isdigit() else 1.0, now)
+
+    def snapshot(self) -> Dict[BucketKey, Dict[str, float]]:
+        """
+        Current budget and queue depth of every bucket, for monitoring.
+        Credentials appear as the same hash the cache uses.
+        """
+        with self._lock:
+            now = time.monotonic()
+            stats = {}
+            for key, bucket in self._buckets.items():
+                bucket._refill(now)
+                stats[key] = {
+                    "tokens": bucket.tokens,
+                    "capacity": bucket.capacity if bucket.capacity is not None else float("inf"),
+                    "rate": bucket.rate,
+                    "blocked_for": max(bucket.blocked_until - now, 0.0),
+                    "queue_depth": bucket.waiting,
+                    "in_flight": bucket.in_flight,
+                }
+            return stats
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(bucket.waiting for bucket in self._buckets.values())
@@ -0,0 +1,244 @@
+"""
+Timeouts, retries, circuit breaking and deadlines for provider calls.
+"""
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple, Type
+from urllib.parse import urlsplit
+
+from common.http import HttpRequest
+
+# (connect, read) seconds; connect is a little over a TCP retransmission window.
+DEFAULT_TIMEOUT = (3.05, 30.0)
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    The caller's deadline passed before the call could be (re)tried.
+    """
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    The host's circuit breaker is open; the call was not sent.
+    """
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Bound every provider call made inside the block, including those made by
+    batch workers and asyncio tasks started from it, to ``seconds`` from now.
+    Nested deadlines can only shorten the budget.
+    """
+    expires_at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires_at if current is None else min(current, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """
+    Seconds until the current deadline, or ``None`` when there is none.
+    """
+    expires_at = _deadline.get()
+    return None if expires_at is None else expires_at - time.monotonic()
+
+
+def effective_timeout(timeout: Optional[Tuple[float, float]]) -> Tuple[float, float]:
+    """
+    The request's (connect, read) timeout clamped to the current deadline.
+    """
+    connect, read = timeout or DEFAULT_TIMEOUT
+    left = time_left()
+    if left is None:
+        return connect, read
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded before the request was sent")
+    return min(connect, left), min(read, left)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retries for idempotent calls with "decorrelated jitter" backoff: each
+    sleep is drawn uniformly from [base, 3 * previous sleep], capped at ``cap``.
+    """
+    max_attempts: int = 3
+    base: float = 0.2
+    cap: float = 5.0
+
+    def backoff(self, previous: float) -> float:
+        return min(self.cap, random.uniform(self.base, max(self.base, previous * 3)))
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and fails calls
+    fast for ``reset_timeout`` seconds, then lets a single probe through.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """
+        Forget an allowed call that ended without telling anything about the host.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Resilience:
+    """
+    Runs transport attempts under a per-host ``CircuitBreaker`` and retries
+    idempotent calls that failed transiently, within the current deadline.
+
+    ``attempt(request, timeout)`` performs one upstream call; ``transient``
+    lists the exception types of the client that count as transient.
+    """
+
+    def __init__(
+        self,
+        retry: Optional[RetryPolicy] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, request: HttpRequest) -> CircuitBreaker:
+        host = urlsplit(request.url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers.setdefault(host, CircuitBreaker(self.failure_threshold, self.reset_timeout))
+        return breaker
+
+    def _attempts(self, request: HttpRequest) -> int:
+        return self.retry.max_attempts if request.method in IDEMPOTENT_METHODS else 1
+
+    def _sleep_for(self, previous: float) -> Optional[float]:
+        sleep = self.retry.backoff(previous)
+        left = time_left()
+        if left is not None and sleep >= left:
+            return None
+        return sleep
+
+    def call(
+        self,
+        request: HttpRequest,
+        attempt: Callable[[HttpRequest, Tuple[float, float]], Any],
+        transient: Tuple[Type[BaseException], ...],
+    ) -> Any:
+        breaker = self.breaker(request)
+        attempts = self._attempts(request)
+        sleep = self.retry.base
+        for number in range(1, attempts + 1):
+            timeout = effective_timeout(request.timeout)
+            if not breaker.allow():
+                raise CircuitOpenError(f"circuit open for {urlsplit(request.url).netloc}")
+            try:
+                response = attempt(request, timeout)
+            except transient:
+                breaker.record(False)
+                if number == attempts or (sleep := self._sleep_for(sleep)) is None:
+                    raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                breaker.record(response.status_code < 500)
+                if response.status_code not in RETRYABLE_STATUSES or number == attempts:
+                    return response
+                if (sleep := self._sleep_for(sleep)) is None:
+                    return response
+                if request.stream:
+                    # Hand the unread body's connection back before retrying.
+                    response.close()
+            time.sleep(sleep)
+
+    async def acall(
+        self,
+        request: HttpRequest,
+        attempt: Callable[[HttpRequest, Tuple[float, float]], Awaitable[Any]],
+        transient: Tuple[Type[BaseException], ...],
+    ) -> Any:
+        breaker = self.breaker(request)
+        attempts = self._attempts(request)
+        sleep = self.retry.base
+        for number in range(1, attempts + 1):
+            timeout = effective_timeout(request.timeout)
+            if not breaker.allow():
+                raise CircuitOpenError(f"circuit open for {urlsplit(request.url).netloc}")
+            try:
+                response = await asyncio.wait_for(attempt(request, timeout), time_left())
+            except DeadlineExceeded:
+                breaker.release()
+                raise
+            except asyncio.TimeoutError as exc:
+                breaker.release()
+                raise DeadlineExceeded("deadline exceeded while waiting for the response") from exc
+            except transient:
+                breaker.record(False)
+                if number == attempts or (sleep := self._sleep_for(sleep)) is None:
+                    raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                breaker.record(response.status_code < 500)
+                if response.status_code not in RETRYABLE_STATUSES or number == attempts:
+                    return response
+                if (sleep := self._sleep_for(sleep)) is None:
+                    return response
+                if request.stream:
+                    await response.aclose()
+            await asyncio.sleep(sleep)
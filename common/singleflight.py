@@ -0,0 +1,83 @@
+"""
+Single-flight coalescing of identical in-flight reads.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from common.cache import ResponseCache
+from common.http import HttpRequest
+
+
+def flight_key(request: HttpRequest) -> Tuple:
+    """
+    Identity of a read: the action and its decode options plus credential,
+    URL, query and range.
+    """
+    options = tuple(sorted((request.decode_options or {}).items()))
+    return (request.endpoint, request.method, options) + ResponseCache.key(request)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one execution.
+
+    The first caller runs the work; callers arriving while it is in flight
+    wait for and receive the same result (or exception). Nothing is kept
+    once the flight lands, so this never serves stale data.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, work: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            try:
+                flight.result = work()
+            except BaseException as exc:
+                flight.error = exc
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    async def ado(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        asyncio counterpart of ``do``. The work runs as its own task, so a
+        cancelled caller does not cancel it for the others.
+        """
+        key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = asyncio.ensure_future(work())
+                task.add_done_callback(lambda _: self._forget(key))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable) -> None:
+        with self._lock:
+            self._tasks.pop(key, None)
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights) + len(self._tasks)
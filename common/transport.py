@@ -0,0 +1,180 @@
+"""
+Pooled HTTP transport shared by the tool actions.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.cache import ResponseCache
+from common.codec import JsonCodec, default_codec
+from common.hedging import Hedger
+from common.http import HttpRequest
+from common.ratelimit import RateLimiter
+from common.resilience import Resilience, effective_timeout
+
+DEFAULT_POOL_MAXSIZE = 10
+# Number of distinct hosts whose pools are kept alive by the fallback adapter
+# (Workable talks to one host per customer subdomain).
+DEFAULT_MAX_HOSTS = 64
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class HttpTransport:
+    """
+    Thread-safe HTTP client keeping one keep-alive connection pool per host.
+
+    ``host_pool_sizes`` maps a host (e.g. ``"www.strava.com"``) to the maximum
+    number of connections kept open to it; any other host gets a pool of
+    ``pool_maxsize``. Adapters are mounted once at construction so the
+    session is never mutated while other threads are sending through it.
+
+    With a ``cache``, GETs that carry a ``cache_ttl`` are answered from it
+    and successful writes invalidate the entries they affect. With a
+    ``rate_limiter``, every call that reaches the provider is paced by it.
+    ``resilience`` adds retries and per-host circuit breaking; timeouts and
+    the caller's deadline are applied either way. A ``hedger`` races slow
+    GETs that opted into hedging. JSON bodies are encoded with ``codec``,
+    by default the process-wide ``default_codec()``.
+    """
+
+    def __init__(
+        self,
+        host_pool_sizes: Optional[Dict[str, int]] = None,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        max_hosts: int = DEFAULT_MAX_HOSTS,
+        pool_block: bool = False,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        resilience: Optional[Resilience] = None,
+        hedger: Optional[Hedger] = None,
+        codec: Optional[JsonCodec] = None,
+    ):
+        self.host_pool_sizes = dict(host_pool_sizes or {})
+        self.pool_maxsize = pool_maxsize
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.resilience = resilience
+        self.hedger = hedger
+        self.codec = codec
+        self._session = requests.Session()
+        # Cookies are per-credential state; never carry them between calls.
+        self._session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        fallback = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self._session.mount("https://", fallback)
+        self._session.mount("http://", fallback)
+        for host, size in self.host_pool_sizes.items():
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, pool_block=pool_block)
+            self._session.mount(f"https://{host}/", adapter)
+
+    def send(self, request: HttpRequest) -> requests.Response:
+        if request.stream:
+            return self._resilient(request)
+        if self.cache is None:
+            return self._send(request)
+        if request.method != "GET":
+            response = self._send(request)
+            if response.status_code < 400:
+                self.cache.invalidate(request)
+            return response
+        if not request.cache_ttl:
+            return self._send(request)
+        key, entry, upstream = self.cache.lookup(request)
+        if entry is not None and entry.fresh:
+            return entry.response
+        return self.cache.update(key, entry, request.cache_ttl, self._send(upstream))
+
+    def _send(self, request: HttpRequest) -> requests.Response:
+        if self.hedger is not None and request.hedge and request.method == "GET":
+            return self.hedger.call(request, self._resilient)
+        return self._resilient(request)
+
+    def _resilient(self, request: HttpRequest) -> requests.Response:
+        if self.resilience is None:
+            return self._attempt(request, effective_timeout(request.timeout))
+        return self.resilience.call(request, self._attempt, TRANSIENT_ERRORS)
+
+    def _attempt(self, request: HttpRequest, timeout: Tuple[float, float]) -> requests.Response:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(request)
+        try:
+            headers, body = request.body(self.codec or default_codec())
+            response = self.request(
+                request.method,
+                request.url,
+                headers=headers,
+                params=request.query(),
+                data=body,
+                timeout=timeout,
+                stream=request.stream,
+            )
+        except BaseException:
+            if self.rate_limiter is not None:
+                self.rate_limiter.release(request)
+            raise
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(request, response)
+        return response
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def warm_up(self, hosts: Optional[Iterable[str]] = None, connections: int = 2, timeout: float = 5.0) -> int:
+        """
+        Open ``connections`` keep-alive connections to each host ahead of the
+        first real call, so TCP and TLS setup is paid at deploy time.
+
+        Defaults to every host with a configured pool size. Failures are
+        ignored; returns the number of connections that were established.
+        """
+        hosts = list(self.host_pool_sizes if hosts is None else hosts)
+        urls = [f"https://{host}/" for host in hosts for _ in range(connections)]
+        if not urls:
+            return 0
+
+        def _touch(url: str) -> bool:
+            try:
+                self._session.head(url, timeout=timeout, allow_redirects=False)
+            except requests.RequestException:
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+            return sum(pool.map(_touch, urls))
+
+    def close(self) -> None:
+        self._session.close()
+
+
+_default_transport: Optional[HttpTransport] = None
+_default_lock = threading.Lock()
+
+
+def default_transport() -> HttpTransport:
+    """
+    Process-wide transport for actions that were not bound to a tool.
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = HttpTransport()
+    return _default_transport
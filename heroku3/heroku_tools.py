@@ -1,20 +1,105 @@
-import requests
 from pydantic import BaseModel, Field
-from shared.composio_tools.lib import Tool,Action
-from typing import Optional, Type
+from common import (
+    ActionRequest,
+    ActionResponse,
+    HttpAction,
+    HttpRequest,
+    HttpTool,
+    UpstreamError,
+)
+from common.pagination import aiter_cursor_pages, iter_cursor_pages
+from typing import AsyncIterator, Iterator, Optional, Tuple, Type
+
+# Heroku list endpoints page through Range/Next-Range; 1000 is the largest page they serve.
+HEROKU_FIRST_RANGE = "id ..; max=1000"
+
+
+class HerokuListAction(HttpAction):
+    """
+    Base for Heroku list endpoints paged with the Range/Next-Range headers.
+
+    Heroku answers 206 Partial Content with a Next-Range header while more
+    items remain. `iter_items`/`aiter_items` stream the whole listing and
+    `execute`/`aexecute` return all of it. With `stream_decode` set, each
+    page is decoded item by item as it arrives.
+    """
+    items_field = "items"
+
+    def _page_request(self, request: BaseModel, authorisation_data: dict, range_: str) -> HttpRequest:
+        page_request = self.build(request, authorisation_data)
+        page_request.headers = {**page_request.headers, "Range": range_}
+        return page_request
+
+    def _page(self, response) -> Tuple[list, Optional[str]]:
+        if response.status_code not in (200, 206):
+            raise UpstreamError(response.status_code, response.json())
+        return response.json(), self._next_range(response)
+
+    def _next_range(self, response) -> Optional[str]:
+        return response.headers.get("Next-Range") if response.status_code == 206 else None
+
+    def _stream_pages(self, request: BaseModel, authorisation_data: dict) -> Iterator:
+        range_ = HEROKU_FIRST_RANGE
+        while range_ is not None:
+            page = self.send_streamed(self._page_request(request, authorisation_data, range_), statuses=(200, 206))
+            range_ = self._next_range(page)
+            yield from page
+
+    async def _astream_pages(self, request: BaseModel, authorisation_data: dict) -> AsyncIterator:
+        range_ = HEROKU_FIRST_RANGE
+        while range_ is not None:
+            page = await self.asend_streamed(self._page_request(request, authorisation_data, range_), statuses=(200, 206))
+            range_ = self._next_range(page)
+            async for item in page:
+                yield item
+
+    def iter_items(self, request: BaseModel, authorisation_data: dict) -> Iterator:
+        if self.stream_decode:
+            return self._stream_pages(request, authorisation_data)
+
+        def fetch(range_: str) -> Tuple[list, Optional[str]]:
+            return self._page(self.decoded(self.http.send(self._page_request(request, authorisation_data, range_))))
+
+        return iter_cursor_pages(fetch, HEROKU_FIRST_RANGE)
+
+    def aiter_items(self, request: BaseModel, authorisation_data: dict) -> AsyncIterator:
+        if self.stream_decode:
+            return self._astream_pages(request, authorisation_data)
+
+        async def fetch(range_: str) -> Tuple[list, Optional[str]]:
+            return self._page(self.decoded(await self.async_http.send(self._page_request(request, authorisation_data, range_))))
+
+        return aiter_cursor_pages(fetch, HEROKU_FIRST_RANGE)
+
+    def execute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        try:
+            items = self.collect(request, self.iter_items(request, authorisation_data))
+        except UpstreamError:
+            return self.response_schema(success=False, **{self.items_field: []})
+        return self.response_schema(success=True, **{self.items_field: items})
+
+    async def aexecute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        try:
+            items = await self.acollect(request, self.aiter_items(request, authorisation_data))
+        except UpstreamError:
+            return self.response_schema(success=False, **{self.items_field: []})
+        return self.response_schema(success=True, **{self.items_field: items})
+
 
 # Actions of Heroku Apps
-class HerokuAppInfoRequest(BaseModel):
+class HerokuAppInfoRequest(ActionRequest):
     app_id: str = Field(..., description="The unique identifier for the Heroku app.")
 
-class HerokuAppInfoResponse(BaseModel):
+class HerokuAppInfoResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the app information retrieval was successful.")
     app_info: dict = Field(..., description="The full response data returned by the Heroku API.")
 
-class GetHerokuAppInfo(Action):
+class GetHerokuAppInfo(HttpAction):
     """
     Get Heroku App Information
     """
+    hedge = True
+
     @property
     def display_name(self) -> str:
         return "Get Heroku App Information"
@@ -27,21 +112,23 @@ class GetHerokuAppInfo(Action):
     def response_schema(self) -> Type[BaseModel]:
         return HerokuAppInfoResponse
     
-    def execute(self, request: HerokuAppInfoRequest, authorisation_data: dict) -> HerokuAppInfoResponse:
+    def prepare(self, request: HerokuAppInfoRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         app_id = request.app_id
         app_info_url = f"https://api.heroku.com/apps/{app_id}"
 
-        app_info_response = requests.get(app_info_url, headers=headers)
-        if app_info_response.status_code != 200:
-            return HerokuAppInfoResponse(success=False, app_info=app_info_response.json())
+        return HttpRequest("GET", app_info_url, headers=headers)
+
+    def parse(self, response) -> HerokuAppInfoResponse:
+        if response.status_code != 200:
+            return HerokuAppInfoResponse(success=False, app_info=response.json())
 
         return HerokuAppInfoResponse(
             success=True,
-            app_info=app_info_response.json()
+            app_info=response.json()
         )
     
-class CreateHerokuAppRequest(BaseModel):
+class CreateHerokuAppRequest(ActionRequest):
     app_name: str = Field(..., description="The name of the Heroku app to be created.")
     region: str = Field(..., description="The region where the Heroku app will be deployed.")
     stack: str = Field(..., description="The stack to be used for the Heroku app.")
@@ -51,11 +138,11 @@ class CreateHerokuAppRequest(BaseModel):
     team: Optional[str] = Field(None, description="The team that will own the Heroku app.")
     personal: Optional[bool] = Field(None, description="Indicates whether the Heroku app is personal.")
 
-class CreateHerokuAppResponse(BaseModel):
+class CreateHerokuAppResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the app creation was successful.")
     app_info: dict = Field(..., description="The full response data returned by the Heroku API.")
 
-class CreateHerokuApp(Action):
+class CreateHerokuApp(HttpAction):
     """
     Create Heroku App
     """
@@ -71,7 +158,7 @@ class CreateHerokuApp(Action):
     def response_schema(self) -> Type[BaseModel]:
         return CreateHerokuAppResponse
     
-    def execute(self, request: CreateHerokuAppRequest, authorisation_data: dict) -> CreateHerokuAppResponse:
+    def prepare(self, request: CreateHerokuAppRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         create_app_url = "https://api.heroku.com/apps"
         app_data = {
@@ -89,26 +176,30 @@ class CreateHerokuApp(Action):
         if request.personal:
             app_data["personal"] = str(request.personal).lower()
 
-        create_app_response = requests.post(create_app_url, headers=headers, json=app_data)
-        if create_app_response.status_code != 201:
-            return CreateHerokuAppResponse(success=False, app_info=create_app_response.json())
+        return HttpRequest("POST", create_app_url, headers=headers, json=app_data)
+
+    def parse(self, response) -> CreateHerokuAppResponse:
+        if response.status_code != 201:
+            return CreateHerokuAppResponse(success=False, app_info=response.json())
 
         return CreateHerokuAppResponse(
             success=True,
-            app_info=create_app_response.json()
+            app_info=response.json()
         )
 
-class GetHerokuAppListRequest(BaseModel):
+class GetHerokuAppListRequest(ActionRequest):
     pass
 
-class GetHerokuAppListResponse(BaseModel):
+class GetHerokuAppListResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the app list retrieval was successful.")
     app_list: list = Field(..., description="The full response data returned by the Heroku API.")
 
-class GetHerokuAppList(Action):
+class GetHerokuAppList(HerokuListAction):
     """
     Get Heroku App List
     """
+    items_field = "app_list"
+
     @property
     def display_name(self) -> str:
         return "Get Heroku App List"
@@ -121,27 +212,29 @@ class GetHerokuAppList(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetHerokuAppListResponse
     
-    def execute(self, request: GetHerokuAppListRequest, authorisation_data: dict) -> GetHerokuAppListResponse:
+    def prepare(self, request: GetHerokuAppListRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         app_list_url = "https://api.heroku.com/apps"
 
-        app_list_response = requests.get(app_list_url, headers=headers)
-        if app_list_response.status_code != 200:
+        return HttpRequest("GET", app_list_url, headers=headers)
+
+    def parse(self, response) -> GetHerokuAppListResponse:
+        if response.status_code not in (200, 206):
             return GetHerokuAppListResponse(success=False, app_list=[])
 
         return GetHerokuAppListResponse(
             success=True,
-            app_list=app_list_response.json()
+            app_list=response.json()
         )
 
-class DeleteHerokuAppRequest(BaseModel):
+class DeleteHerokuAppRequest(ActionRequest):
     app_id: str = Field(..., description="The unique identifier for the Heroku app to be deleted.")
 
-class DeleteHerokuAppResponse(BaseModel):
+class DeleteHerokuAppResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the app deletion was successful.")
     message: dict = Field(..., description="The message returned by the Heroku API.")
 
-class DeleteHerokuApp(Action):
+class DeleteHerokuApp(HttpAction):
     """
     Delete Heroku App
     """
@@ -157,33 +250,37 @@ class DeleteHerokuApp(Action):
     def response_schema(self) -> Type[BaseModel]:
         return DeleteHerokuAppResponse
     
-    def execute(self, request: DeleteHerokuAppRequest, authorisation_data: dict) -> DeleteHerokuAppResponse:
+    def prepare(self, request: DeleteHerokuAppRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         app_id = request.app_id
         delete_app_url = f"https://api.heroku.com/apps/{app_id}"
 
-        delete_app_response = requests.delete(delete_app_url, headers=headers)
-        if delete_app_response.status_code != 200:
-            return DeleteHerokuAppResponse(success=False, message=delete_app_response.json())
+        return HttpRequest("DELETE", delete_app_url, headers=headers)
+
+    def parse(self, response) -> DeleteHerokuAppResponse:
+        if response.status_code != 200:
+            return DeleteHerokuAppResponse(success=False, message=response.json())
 
         return DeleteHerokuAppResponse(
             success=True,
-            message=delete_app_response.json()
+            message=response.json()
         )
 
 # Actions related to account information
 
-class GetAccountInfoRequest(BaseModel): 
+class GetAccountInfoRequest(ActionRequest): 
     pass
 
-class GetAccountInfoResponse(BaseModel):
+class GetAccountInfoResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the account information retrieval was successful.")
     account_info: dict = Field(..., description="The full response data returned by the Heroku API.")
 
-class GetAccountInfo(Action):
+class GetAccountInfo(HttpAction):
     """
     Get Heroku Account Information
     """
+    cache_ttl = 300
+
     @property
     def display_name(self) -> str:
         return "Get Heroku Account Information"
@@ -196,29 +293,31 @@ class GetAccountInfo(Action):
     def response_schema(self) -> BaseModel:
         return GetAccountInfoResponse
     
-    def execute(self, request: GetAccountInfoRequest, authorisation_data: dict) -> GetAccountInfoResponse:
+    def prepare(self, request: GetAccountInfoRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         account_info_url = "https://api.heroku.com/account"
 
-        account_info_response = requests.get(account_info_url, headers=headers)
-        if account_info_response.status_code != 200:
-            return GetAccountInfoResponse(success=False, account_info=account_info_response.json())
+        return HttpRequest("GET", account_info_url, headers=headers)
+
+    def parse(self, response) -> GetAccountInfoResponse:
+        if response.status_code != 200:
+            return GetAccountInfoResponse(success=False, account_info=response.json())
 
         return GetAccountInfoResponse(
             success=True,
-            account_info=account_info_response.json()
+            account_info=response.json()
         )
 
-class UpdateAccountInfoRequest(BaseModel):
+class UpdateAccountInfoRequest(ActionRequest):
     allow_tracking: Optional[bool] = Field(None, description="Indicates whether tracking is allowed.")
     beta: Optional[bool] = Field(None, description="Indicates whether beta features are enabled.")
     name: Optional[str] = Field(None, description="The name of the account.")
 
-class UpdateAccountInfoResponse(BaseModel):
+class UpdateAccountInfoResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the account information update was successful.")
     account_info: dict = Field(..., description="The full response data returned by the Heroku API.")
 
-class UpdateAccountInfo(Action):
+class UpdateAccountInfo(HttpAction):
     """
     Update Heroku Account Information
     """
@@ -234,7 +333,7 @@ class UpdateAccountInfo(Action):
     def response_schema(self) -> Type[BaseModel]:
         return UpdateAccountInfoResponse
     
-    def execute(self, request: UpdateAccountInfoRequest, authorisation_data: dict) -> UpdateAccountInfoResponse:
+    def prepare(self, request: UpdateAccountInfoRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         update_account_info_url = "https://api.heroku.com/account"
 
@@ -246,23 +345,25 @@ class UpdateAccountInfo(Action):
         if request.name:
             account_data["name"] = request.name
 
-        update_account_info_response = requests.patch(update_account_info_url, headers=headers, json=account_data)
-        if update_account_info_response.status_code != 200:
-            return UpdateAccountInfoResponse(success=False, account_info=update_account_info_response.json())
+        return HttpRequest("PATCH", update_account_info_url, headers=headers, json=account_data)
+
+    def parse(self, response) -> UpdateAccountInfoResponse:
+        if response.status_code != 200:
+            return UpdateAccountInfoResponse(success=False, account_info=response.json())
 
         return UpdateAccountInfoResponse(
             success=True,
-            account_info=update_account_info_response.json()
+            account_info=response.json()
         )
     
-class AccountDelinquencyInfoRequest(BaseModel):
+class AccountDelinquencyInfoRequest(ActionRequest):
     pass
 
-class AccountDelinquencyInfoResponse(BaseModel):
+class AccountDelinquencyInfoResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the account delinquency information retrieval was successful.")
     delinquency_info: dict = Field(..., description="The full response data returned by the Heroku API.")
 
-class GetAccountDelinquencyInfo(Action):
+class GetAccountDelinquencyInfo(HttpAction):
     """
     Get Heroku Account Delinquency Information
     """
@@ -278,28 +379,30 @@ class GetAccountDelinquencyInfo(Action):
     def response_schema(self) -> Type[BaseModel]:
         return AccountDelinquencyInfoResponse
     
-    def execute(self, request: AccountDelinquencyInfoRequest, authorisation_data: dict) -> AccountDelinquencyInfoResponse:
+    def prepare(self, request: AccountDelinquencyInfoRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         delinquency_info_url = "https://api.heroku.com/account/delinquency"
 
-        delinquency_info_response = requests.get(delinquency_info_url, headers=headers)
-        if delinquency_info_response.status_code != 200:
-            return AccountDelinquencyInfoResponse(success=False, delinquency_info=delinquency_info_response.json())
+        return HttpRequest("GET", delinquency_info_url, headers=headers)
+
+    def parse(self, response) -> AccountDelinquencyInfoResponse:
+        if response.status_code != 200:
+            return AccountDelinquencyInfoResponse(success=False, delinquency_info=response.json())
 
         return AccountDelinquencyInfoResponse(
             success=True,
-            delinquency_info=delinquency_info_response.json()
+            delinquency_info=response.json()
         )
 
 # GET /account/features/{account_feature_id_or_name}
-class AccountFeatureInfoRequest(BaseModel):
+class AccountFeatureInfoRequest(ActionRequest):
     account_feature_id_or_name: str = Field(..., description="The unique identifier or name of the account feature.")
 
-class AccountFeatureInfoResponse(BaseModel):
+class AccountFeatureInfoResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the account feature information retrieval was successful.")
     feature_info: dict = Field(..., description="The full response data returned by the Heroku API.")
 
-class GetAccountFeatureInfo(Action):
+class GetAccountFeatureInfo(HttpAction):
     """
     Get Heroku Account Feature Information
     """
@@ -315,31 +418,36 @@ class GetAccountFeatureInfo(Action):
     def response_schema(self) -> Type[BaseModel]:
         return AccountFeatureInfoResponse
     
-    def execute(self, request: AccountFeatureInfoRequest, authorisation_data: dict) -> AccountFeatureInfoResponse:
+    def prepare(self, request: AccountFeatureInfoRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         feature_id_or_name = request.account_feature_id_or_name
         feature_info_url = f"https://api.heroku.com/account/features/{feature_id_or_name}"
 
-        feature_info_response = requests.get(feature_info_url, headers=headers)
-        if feature_info_response.status_code != 200:
-            return AccountFeatureInfoResponse(success=False, feature_info=feature_info_response.json())
+        return HttpRequest("GET", feature_info_url, headers=headers)
+
+    def parse(self, response) -> AccountFeatureInfoResponse:
+        if response.status_code != 200:
+            return AccountFeatureInfoResponse(success=False, feature_info=response.json())
 
         return AccountFeatureInfoResponse(
             success=True,
-            feature_info=feature_info_response.json()
+            feature_info=response.json()
         )
     
-class AccountFeatureListRequest(BaseModel):
+class AccountFeatureListRequest(ActionRequest):
     pass
 
-class AccountFeatureListResponse(BaseModel):
+class AccountFeatureListResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the account feature list retrieval was successful.")
     feature_list: list = Field(..., description="The full response data returned by the Heroku API.")
 
-class GetAccountFeatureList(Action):
+class GetAccountFeatureList(HerokuListAction):
     """
     Get Heroku Account Feature List
     """
+    items_field = "feature_list"
+    cache_ttl = 300
+
     @property
     def display_name(self) -> str:
         return "Get Heroku Account Feature List"
@@ -352,28 +460,30 @@ class GetAccountFeatureList(Action):
     def response_schema(self) -> Type[BaseModel]:
         return AccountFeatureListResponse
     
-    def execute(self, request: AccountFeatureListRequest, authorisation_data: dict) -> AccountFeatureListResponse:
+    def prepare(self, request: AccountFeatureListRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         feature_list_url = "https://api.heroku.com/account/features"
 
-        feature_list_response = requests.get(feature_list_url, headers=headers)
-        if feature_list_response.status_code != 200:
+        return HttpRequest("GET", feature_list_url, headers=headers)
+
+    def parse(self, response) -> AccountFeatureListResponse:
+        if response.status_code not in (200, 206):
             return AccountFeatureListResponse(success=False, feature_list=[])
 
         return AccountFeatureListResponse(
             success=True,
-            feature_list=feature_list_response.json()
+            feature_list=response.json()
         )
     
-class AccountFeatureUpdateRequest(BaseModel):
+class AccountFeatureUpdateRequest(ActionRequest):
     account_feature_id_or_name: str = Field(..., description="The unique identifier or name of the account feature.")
     enabled: bool = Field(..., description="Indicates whether the account feature is enabled.")
 
-class AccountFeatureUpdateResponse(BaseModel):
+class AccountFeatureUpdateResponse(ActionResponse):
     success: bool = Field(..., description="Indicates whether the account feature update was successful.")
     feature_info: dict = Field(..., description="The full response data returned by the Heroku API.")
 
-class UpdateAccountFeature(Action):
+class UpdateAccountFeature(HttpAction):
     """
     Update Heroku Account Feature
     """
@@ -389,7 +499,7 @@ class UpdateAccountFeature(Action):
     def response_schema(self) -> Type[BaseModel]:
         return AccountFeatureUpdateResponse
     
-    def execute(self, request: AccountFeatureUpdateRequest, authorisation_data: dict) -> AccountFeatureUpdateResponse:
+    def prepare(self, request: AccountFeatureUpdateRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         feature_id_or_name = request.account_feature_id_or_name
         update_feature_url = f"https://api.heroku.com/account/features/{feature_id_or_name}"
@@ -398,24 +508,29 @@ class UpdateAccountFeature(Action):
             "enabled": request.enabled
         }
 
-        update_feature_response = requests.patch(update_feature_url, headers=headers, json=feature_data)
-        if update_feature_response.status_code != 200:
-            return AccountFeatureUpdateResponse(success=False, feature_info=update_feature_response.json())
+        return HttpRequest("PATCH", update_feature_url, headers=headers, json=feature_data)
+
+    def parse(self, response) -> AccountFeatureUpdateResponse:
+        if response.status_code != 200:
+            return AccountFeatureUpdateResponse(success=False, feature_info=response.json())
 
         return AccountFeatureUpdateResponse(
             success=True,
-            feature_info=update_feature_response.json()
+            feature_info=response.json()
         )
 
 # Heroku Tools
-class Heroku3(Tool):
+class Heroku3(HttpTool):
     """
     Connect to Heroku
     """
+    host_pool_sizes = {"api.heroku.com": 32}
+    max_concurrency = 16
+
     def actions(self) -> list:
-        return [
+        return self.bind([
             GetAccountInfo
-        ]
+        ])
 
     def triggers(self) -> list:
         return []
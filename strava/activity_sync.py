@@ -0,0 +1,306 @@
+"""
+Incremental sync of an athlete's Strava activities into a local SQLite store.
+"""
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Union
+
+from common import UpstreamError
+from strava.strava_tools import (
+    STRAVA_MAX_PAGE_SIZE,
+    GetAthlete,
+    GetAthleteRequest,
+    ListAthleteActivities,
+    ListAthleteActivitiesRequest,
+    Strava,
+)
+
+Timestamp = Union[int, float, datetime]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY,
+    athlete_id INTEGER NOT NULL,
+    name TEXT,
+    sport_type TEXT,
+    start_date INTEGER NOT NULL,
+    distance REAL,
+    moving_time INTEGER,
+    elapsed_time INTEGER,
+    total_elevation_gain REAL,
+    summary_polyline TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS activities_athlete_start ON activities (athlete_id, start_date);
+CREATE INDEX IF NOT EXISTS activities_athlete_sport ON activities (athlete_id, sport_type, start_date);
+CREATE INDEX IF NOT EXISTS activities_athlete_distance ON activities (athlete_id, distance);
+CREATE TABLE IF NOT EXISTS sync_state (
+    athlete_id INTEGER PRIMARY KEY,
+    after INTEGER NOT NULL,
+    page INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+
+UPSERT = '''
+INSERT INTO activities (
+    id, athlete_id, name, sport_type, start_date, distance,
+    moving_time, elapsed_time, total_elevation_gain, summary_polyline, data
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    athlete_id = excluded.athlete_id,
+    name = excluded.name,
+    sport_type = excluded.sport_type,
+    start_date = excluded.start_date,
+    distance = excluded.distance,
+    moving_time = excluded.moving_time,
+    elapsed_time = excluded.elapsed_time,
+    total_elevation_gain = excluded.total_elevation_gain,
+    summary_polyline = excluded.summary_polyline,
+    data = excluded.data
+'''
+
+
+def epoch(value: Timestamp) -> int:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def parse_start_date(start_date: str) -> int:
+    """
+    Epoch seconds of a Strava `start_date` such as `2018-02-16T14:52:54Z`.
+    """
+    return int(datetime.strptime(start_date, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp())
+
+
+@dataclass
+class Checkpoint:
+    after: int
+    page: int
+
+
+@dataclass
+class SyncResult:
+    athlete_id: int
+    pages: int
+    activities: int
+    watermark: int
+
+
+class ActivityStore:
+    """
+    SQLite store of summary activities, one row per activity id.
+
+    Indexed columns back the common filters (sport type, start date,
+    distance); the full summary JSON is kept in `data`. `sync_state` holds a
+    per-athlete checkpoint so an interrupted sync resumes at the next page.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row(athlete_id: int, activity: dict) -> tuple:
+        return (
+            activity['id'],
+            (activity.get('athlete') or {}).get('id', athlete_id),
+            activity.get('name'),
+            activity.get('sport_type') or activity.get('type'),
+            parse_start_date(activity['start_date']),
+            activity.get('distance'),
+            activity.get('moving_time'),
+            activity.get('elapsed_time'),
+            activity.get('total_elevation_gain'),
+            (activity.get('map') or {}).get('summary_polyline'),
+            json.dumps(activity),
+        )
+
+    def upsert(self, athlete_id: int, activities: Iterable[dict], checkpoint: Optional[Checkpoint] = None) -> int:
+        """
+        Insert or update `activities` and, in the same transaction, record
+        `checkpoint` for the athlete. Returns the number of rows written.
+        """
+        rows = [self._row(athlete_id, activity) for activity in activities]
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, rows)
+            if checkpoint is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO sync_state (athlete_id, after, page, updated_at) VALUES (?, ?, ?, ?)',
+                    (athlete_id, checkpoint.after, checkpoint.page, time.time()),
+                )
+        return len(rows)
+
+    def checkpoint(self, athlete_id: int) -> Optional[Checkpoint]:
+        with self._lock:
+            row = self._conn.execute('SELECT after, page FROM sync_state WHERE athlete_id = ?', (athlete_id,)).fetchone()
+        return Checkpoint(row['after'], row['page']) if row else None
+
+    def clear_checkpoint(self, athlete_id: int) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM sync_state WHERE athlete_id = ?', (athlete_id,))
+
+    def watermark(self, athlete_id: int) -> int:
+        """
+        Start time of the athlete's latest stored activity, or 0.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT MAX(start_date) AS watermark FROM activities WHERE athlete_id = ?', (athlete_id,)
+            ).fetchone()
+        return row['watermark'] or 0
+
+    def query(
+        self,
+        athlete_id: Optional[int] = None,
+        sport_type: Optional[str] = None,
+        start: Optional[Timestamp] = None,
+        end: Optional[Timestamp] = None,
+        min_distance: Optional[float] = None,
+        max_distance: Optional[float] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = True,
+    ) -> List[dict]:
+        """
+        Stored activities matching every given filter. `start` is inclusive
+        and `end` exclusive; both take epoch seconds or datetimes (naive ones
+        are read as UTC). Distances are in metres.
+        """
+        clauses, params = [], []
+        for clause, value in (
+            ('athlete_id = ?', athlete_id),
+            ('sport_type = ?', sport_type),
+            ('start_date >= ?', None if start is None else epoch(start)),
+            ('start_date < ?', None if end is None else epoch(end)),
+            ('distance >= ?', min_distance),
+            ('distance <= ?', max_distance),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = 'SELECT data FROM activities'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY start_date ' + ('DESC' if newest_first else 'ASC')
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def count(self, athlete_id: Optional[int] = None) -> int:
+        with self._lock:
+            if athlete_id is None:
+                row = self._conn.execute('SELECT COUNT(*) FROM activities').fetchone()
+            else:
+                row = self._conn.execute('SELECT COUNT(*) FROM activities WHERE athlete_id = ?', (athlete_id,)).fetchone()
+        return row[0]
+
+
+class ActivitySync:
+    """
+    Pulls only the activities that started after the newest one already in
+    `store`, 200 per request, and upserts each page together with a
+    checkpoint. If a run is interrupted it resumes from the page after the
+    last committed one with the same `after` watermark, so nothing is fetched
+    twice. Activities uploaded later with an older start time are not picked
+    up; run `full_resync` to backfill those.
+    """
+
+    def __init__(self, store: ActivityStore, tool: Optional[Strava] = None):
+        tool = tool or Strava()
+        self.store = store
+        self.list_activities = tool.instance(ListAthleteActivities)
+        self.get_athlete = tool.instance(GetAthlete)
+
+    def athlete_id(self, authorisation_data: dict) -> int:
+        request = self.get_athlete.build(GetAthleteRequest(), self.get_athlete.authorise(authorisation_data))
+        response = self.get_athlete.decoded(self.get_athlete.http.send(request))
+        if response.status_code != 200:
+            raise UpstreamError(response.status_code, response.json())
+        return response.json()['id']
+
+    async def aathlete_id(self, authorisation_data: dict) -> int:
+        request = self.get_athlete.build(GetAthleteRequest(), await self.get_athlete.aauthorise(authorisation_data))
+        response = self.get_athlete.decoded(await self.get_athlete.async_http.send(request))
+        if response.status_code != 200:
+            raise UpstreamError(response.status_code, response.json())
+        return response.json()['id']
+
+    def _start(self, athlete_id: int) -> Checkpoint:
+        checkpoint = self.store.checkpoint(athlete_id)
+        if checkpoint is None:
+            checkpoint = Checkpoint(after=self.store.watermark(athlete_id), page=0)
+        return checkpoint
+
+    def _commit(self, athlete_id: int, checkpoint: Checkpoint, items: list) -> bool:
+        """
+        Store one page; returns whether there are more pages to fetch.
+        """
+        if len(items) < STRAVA_MAX_PAGE_SIZE:
+            self.store.upsert(athlete_id, items)
+            self.store.clear_checkpoint(athlete_id)
+            return False
+        self.store.upsert(athlete_id, items, checkpoint)
+        return True
+
+    def run(self, authorisation_data: dict, athlete_id: Optional[int] = None) -> SyncResult:
+        """
+        Sync the authenticated athlete's new activities. Upstream errors
+        propagate as `UpstreamError`, leaving the checkpoint in place.
+        """
+        if athlete_id is None:
+            athlete_id = self.athlete_id(authorisation_data)
+        checkpoint = self._start(athlete_id)
+        request = ListAthleteActivitiesRequest(after=checkpoint.after)
+        pages = synced = 0
+        more = True
+        while more:
+            checkpoint.page += 1
+            items = self.list_activities.fetch_page(request, authorisation_data, checkpoint.page)
+            more = self._commit(athlete_id, checkpoint, items)
+            pages += 1
+            synced += len(items)
+        return SyncResult(athlete_id, pages, synced, self.store.watermark(athlete_id))
+
+    async def arun(self, authorisation_data: dict, athlete_id: Optional[int] = None) -> SyncResult:
+        if athlete_id is None:
+            athlete_id = await self.aathlete_id(authorisation_data)
+        checkpoint = self._start(athlete_id)
+        request = ListAthleteActivitiesRequest(after=checkpoint.after)
+        pages = synced = 0
+        more = True
+        while more:
+            checkpoint.page += 1
+            items = await self.list_activities.afetch_page(request, authorisation_data, checkpoint.page)
+            more = self._commit(athlete_id, checkpoint, items)
+            pages += 1
+            synced += len(items)
+        return SyncResult(athlete_id, pages, synced, self.store.watermark(athlete_id))
+
+    def full_resync(self, authorisation_data: dict, athlete_id: Optional[int] = None) -> SyncResult:
+        """
+        Re-fetch the athlete's whole history, updating every stored row.
+        """
+        if athlete_id is None:
+            athlete_id = self.athlete_id(authorisation_data)
+        self.store.upsert(athlete_id, [], Checkpoint(after=0, page=0))
+        return self.run(authorisation_data, athlete_id)
@@ -0,0 +1,219 @@
+"""
+Vectorized summaries of Strava activity streams.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+STANDARD_DURATIONS = [5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600]
+STANDARD_DISTANCES = [400, 1000, 1609, 5000, 10000, 21097, 42195]
+# Streams `analyse` reads; request only these from GetStreams.
+ANALYTICS_STREAMS = 'time,distance,altitude,heartrate,watts,velocity_smooth'
+
+
+@dataclass
+class AnalyticsOptions:
+    """
+    Tunables for `analyse`; the defaults suit most rides and runs.
+
+    Samples further apart than `max_gap` seconds are treated as a pause:
+    power reads as zero across it and it adds no time in zone.
+    """
+    durations: List[int] = field(default_factory=lambda: list(STANDARD_DURATIONS))
+    distances: List[float] = field(default_factory=lambda: list(STANDARD_DISTANCES))
+    rolling_window: int = 30
+    elevation_window: int = 7
+    max_gap: float = 10.0
+
+
+def require_numpy() -> None:
+    if numpy is None:
+        raise ImportError('numpy is required for stream analytics')
+
+
+def per_second(time, values, max_gap: float):
+    """
+    Resample `values` onto a 1 Hz grid from the first to the last sample,
+    holding each sample until the next and zeroing pauses.
+    """
+    grid = numpy.arange(time[0], time[-1] + 1)
+    index = numpy.searchsorted(time, grid, side='right') - 1
+    resampled = values[index].astype(float)
+    resampled[(grid - time[index]) > max_gap] = 0.0
+    return resampled
+
+
+def rolling_mean(values, window: int):
+    """
+    Mean of every `window` consecutive values; windows holding a NaN (a gap
+    in the stream) are NaN.
+    """
+    if window <= 0 or len(values) < window:
+        return numpy.empty(0)
+    missing = numpy.isnan(values)
+    cumulative = numpy.concatenate(([0.0], numpy.cumsum(numpy.where(missing, 0.0, values), dtype=float)))
+    means = (cumulative[window:] - cumulative[:-window]) / window
+    if missing.any():
+        gaps = numpy.concatenate(([0], numpy.cumsum(missing)))
+        means[(gaps[window:] - gaps[:-window]) > 0] = numpy.nan
+    return means
+
+
+def mean_max(values, durations: Sequence[int]) -> Dict[str, float]:
+    """
+    Best average of a 1 Hz series over each duration (the power curve).
+    """
+    curve = {}
+    for duration in durations:
+        averages = rolling_mean(values, duration)
+        if len(averages):
+            curve[str(duration)] = round(float(averages.max()), 1)
+    return curve
+
+
+def best_efforts(time, distance, distances: Sequence[float]) -> Dict[str, dict]:
+    """
+    Fastest elapsed time over each distance, from any sample to the first
+    sample at least that far on.
+    """
+    efforts = {}
+    for target in distances:
+        ends = numpy.searchsorted(distance, distance + target, side='left')
+        valid = ends < len(distance)
+        if not valid.any():
+            continue
+        starts = numpy.nonzero(valid)[0]
+        elapsed = time[ends[valid]] - time[starts]
+        best = int(numpy.argmin(elapsed))
+        efforts[str(int(target))] = {
+            'elapsed_time': int(elapsed[best]),
+            'start_index': int(starts[best]),
+            'pace': round(float(elapsed[best]) / target * 1000, 1),
+        }
+    return efforts
+
+
+def time_in_zones(time, values, zones: Sequence[dict], max_gap: float) -> List[dict]:
+    """
+    Seconds spent in each Strava zone (`min` inclusive, `max` exclusive,
+    `max` of -1 for the open top zone), charging each interval to the zone
+    of the sample that starts it. Intervals starting on a NaN sample (a gap
+    in the stream) count towards no zone.
+    """
+    if not zones or len(time) < 2:
+        return []
+    bounds = numpy.array([zone['min'] for zone in zones[1:]], dtype=float)
+    index = numpy.digitize(values[:-1], bounds)
+    durations = numpy.diff(time).astype(float)
+    durations[durations > max_gap] = 0.0
+    durations[numpy.isnan(values[:-1])] = 0.0
+    seconds = numpy.bincount(index, weights=durations, minlength=len(zones))
+    return [
+        {'min': zone['min'], 'max': zone['max'], 'time': int(round(seconds[position]))}
+        for position, zone in enumerate(zones)
+    ]
+
+
+def elevation(altitude, window: int) -> Dict[str, float]:
+    """
+    Total gain and loss after a centred moving average, which removes the
+    barometric and GPS jitter that inflates naive sums.
+    """
+    if len(altitude) < 2:
+        return {'gain': 0.0, 'loss': 0.0}
+    window = max(1, min(window, len(altitude)))
+    padded = numpy.pad(altitude.astype(float), (window // 2, window - 1 - window // 2), mode='edge')
+    smoothed = rolling_mean(padded, window)
+    steps = numpy.diff(smoothed)
+    return {
+        'gain': round(float(steps[steps > 0].sum()), 1),
+        'loss': round(float(-steps[steps < 0].sum()), 1),
+    }
+
+
+def rolling_summary(values, window: int) -> Dict[str, float]:
+    # NaN samples are gaps: left out of the mean and of every rolling window.
+    averages = rolling_mean(values, window)
+    averages = averages[~numpy.isnan(averages)]
+    present = values[~numpy.isnan(values)]
+    summary = {'mean': round(float(present.mean()), 1) if len(present) else 0.0}
+    if len(averages):
+        summary['max_rolling'] = round(float(averages.max()), 1)
+    return summary
+
+
+def analyse(streams: Mapping[str, 'numpy.ndarray'], zones: Optional[dict] = None, options: Optional[AnalyticsOptions] = None) -> dict:
+    """
+    Summarise one activity's streams (NumPy arrays keyed by stream type, as
+    in a compact `StreamSet`) against the athlete's zones from
+    `GetAthleteZones`. Streams that are missing are skipped.
+    """
+    require_numpy()
+    options = options or AnalyticsOptions()
+    zones = zones or {}
+    time = streams.get('time')
+    if time is None or len(time) == 0:
+        return {}
+    time = numpy.asarray(time, dtype=float)
+    summary = {'elapsed_time': int(time[-1] - time[0]), 'samples': int(len(time))}
+    rolling = {}
+
+    watts = streams.get('watts')
+    if watts is not None and len(watts) == len(time):
+        watts = numpy.nan_to_num(numpy.asarray(watts, dtype=float))
+        power = per_second(time, watts, options.max_gap)
+        summary['power_curve'] = mean_max(power, options.durations)
+        rolling['watts'] = rolling_summary(power, options.rolling_window)
+        smoothed = rolling_mean(power, 30)
+        if len(smoothed):
+            rolling['watts']['normalized'] = round(float(numpy.mean(smoothed ** 4) ** 0.25), 1)
+        summary['power_zones'] = time_in_zones(time, watts, (zones.get('power') or {}).get('zones', []), options.max_gap)
+
+    heartrate = streams.get('heartrate')
+    if heartrate is not None and len(heartrate) == len(time):
+        heartrate = numpy.asarray(heartrate, dtype=float)
+        rolling['heartrate'] = rolling_summary(per_second(time, heartrate, options.max_gap), options.rolling_window)
+        summary['heartrate_zones'] = time_in_zones(time, heartrate, (zones.get('heart_rate') or {}).get('zones', []), options.max_gap)
+
+    velocity = streams.get('velocity_smooth')
+    if velocity is not None and len(velocity) == len(time):
+        rolling['velocity_smooth'] = rolling_summary(per_second(time, numpy.asarray(velocity, dtype=float), options.max_gap), options.rolling_window)
+
+    distance = streams.get('distance')
+    if distance is not None and len(distance) == len(time):
+        summary['best_efforts'] = best_efforts(time, numpy.asarray(distance, dtype=float), options.distances)
+
+    altitude = streams.get('altitude')
+    if altitude is not None and len(altitude):
+        summary['elevation'] = elevation(numpy.asarray(altitude, dtype=float), options.elevation_window)
+
+    if rolling:
+        summary['rolling'] = dict(rolling, window=options.rolling_window)
+    return summary
+
+
+def _analyse(arguments: tuple) -> dict:
+    return analyse(*arguments)
+
+
+def analyse_many(
+    activities: Sequence[Mapping[str, 'numpy.ndarray']],
+    zones: Optional[dict] = None,
+    options: Optional[AnalyticsOptions] = None,
+    processes: Optional[int] = None,
+) -> List[dict]:
+    """
+    `analyse` each activity, on a pool of `processes` worker processes when
+    given and there is more than one activity.
+    """
+    require_numpy()
+    arguments = [(streams, zones, options) for streams in activities]
+    if not processes or len(arguments) < 2:
+        return [_analyse(argument) for argument in arguments]
+    with ProcessPoolExecutor(max_workers=min(processes, len(arguments))) as pool:
+        return list(pool.map(_analyse, arguments))
@@ -0,0 +1,164 @@
+"""
+Shape-preserving reduction of Strava activity streams to a target size.
+"""
+import heapq
+import math
+from typing import List, Optional, Sequence, Union
+
+# Streams that can serve as the x axis of the others, in order of preference.
+SERIES_STREAMS = ('time', 'distance')
+
+
+def lttb(x: Sequence[float], y: Sequence[Optional[float]], threshold: int) -> List[int]:
+    """
+    Indices of the `threshold` samples that Largest-Triangle-Three-Buckets
+    keeps from the series `y` over `x`. The first and last samples are always
+    kept; gaps (`None`) count as zero when comparing areas.
+    """
+    size = len(y)
+    if threshold >= size:
+        return list(range(size))
+    if threshold < 3:
+        return [0, size - 1][:max(threshold, 0)]
+    y = [0.0 if value is None else value for value in y]
+    every = (size - 2) / (threshold - 2)
+    kept = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, size)
+        count = next_end - next_start
+        average_x = sum(x[next_start:next_end]) / count
+        average_y = sum(y[next_start:next_end]) / count
+        anchor_x, anchor_y = x[previous], y[previous]
+        best_area, chosen = -1.0, next_start - 1
+        for index in range(int(bucket * every) + 1, next_start):
+            area = abs((anchor_x - average_x) * (y[index] - anchor_y) - (anchor_x - x[index]) * (average_y - anchor_y))
+            if area > best_area:
+                best_area, chosen = area, index
+        kept.append(chosen)
+        previous = chosen
+    kept.append(size - 1)
+    return kept
+
+
+def douglas_peucker(points: Sequence[Sequence[float]], threshold: int) -> List[int]:
+    """
+    Indices of the `threshold` most significant `[lat, lng]` points under
+    Douglas-Peucker. Instead of a distance tolerance, the segment whose
+    farthest point deviates most is split first until `threshold` points
+    are kept, so the result always has the requested size.
+    """
+    size = len(points)
+    if threshold >= size:
+        return list(range(size))
+    if threshold < 3:
+        return [0, size - 1][:max(threshold, 0)]
+    # Equirectangular projection is accurate enough at activity scale.
+    scale = math.cos(math.radians(points[0][0]))
+    xs = [point[1] * scale for point in points]
+    ys = [point[0] for point in points]
+
+    def farthest(start: int, end: int):
+        ax, ay = xs[start], ys[start]
+        dx, dy = xs[end] - ax, ys[end] - ay
+        length = math.hypot(dx, dy)
+        best_distance, best_index = -1.0, None
+        for index in range(start + 1, end):
+            if length:
+                distance = abs(dy * (xs[index] - ax) - dx * (ys[index] - ay)) / length
+            else:
+                distance = math.hypot(xs[index] - ax, ys[index] - ay)
+            if distance > best_distance:
+                best_distance, best_index = distance, index
+        return best_distance, best_index
+
+    kept = {0, size - 1}
+    segments = []
+
+    def push(start: int, end: int) -> None:
+        if end - start > 1:
+            distance, index = farthest(start, end)
+            heapq.heappush(segments, (-distance, start, end, index))
+
+    push(0, size - 1)
+    while len(kept) < threshold and segments:
+        _, start, end, index = heapq.heappop(segments)
+        kept.add(index)
+        push(start, index)
+        push(index, end)
+    return sorted(kept)
+
+
+def _series(streams: dict, series_type: Optional[str]) -> Optional[list]:
+    for stream_type in ((series_type,) if series_type else ()) + SERIES_STREAMS:
+        stream = streams.get(stream_type)
+        if stream is not None:
+            return stream.get('data')
+    return None
+
+
+def _uniform(size: int, threshold: int) -> List[int]:
+    if threshold >= size:
+        return list(range(size))
+    if threshold < 2:
+        return [0][:max(threshold, 0)]
+    step = (size - 1) / (threshold - 1)
+    return sorted({round(position * step) for position in range(threshold)})
+
+
+def shared_indices(streams: dict, max_points: int, series_type: Optional[str] = None) -> List[int]:
+    """
+    One set of at most `max_points` sample positions that keeps the shape of
+    every stream: `max_points` is split between the shape streams (`latlng`
+    by Douglas-Peucker, the others by LTTB over the `series_type` stream)
+    and their selections are merged. The x-axis streams only shape the
+    others; with nothing else to follow, samples are spaced evenly.
+    """
+    size = max(len(stream.get('data') or []) for stream in streams.values())
+    series = _series(streams, series_type)
+    shapes = [
+        stream_type for stream_type, stream in streams.items()
+        if stream_type not in SERIES_STREAMS and len(stream.get('data') or []) == size
+    ]
+    shapes.sort(key=lambda stream_type: stream_type != 'latlng')
+    # Every selection needs its two end points and one sample in between.
+    shapes = shapes[:max(max_points // 3, 1)]
+    if not shapes:
+        return _uniform(size, max_points)
+    budget = max_points // len(shapes)
+    x = series if series is not None and len(series) == size else range(size)
+    kept = set()
+    for stream_type in shapes:
+        data = streams[stream_type]['data']
+        kept.update(douglas_peucker(data, budget) if stream_type == 'latlng' else lttb(x, data, budget))
+    return sorted(kept)
+
+
+def downsample_streams(payload: Union[dict, list], max_points: int, series_type: Optional[str] = None) -> Union[dict, list]:
+    """
+    Reduce every stream of a `GetStreams` payload (keyed by type or not) to
+    at most `max_points` samples taken at the same positions, found by
+    `shared_indices`, so the reduced streams still line up sample by sample.
+    Each reduced stream carries those original positions in `indices`.
+    """
+    keyed = isinstance(payload, dict)
+    streams = payload if keyed else {stream['type']: stream for stream in payload}
+    sizes = {len(stream.get('data') or []) for stream in streams.values()}
+    if not streams or max(sizes) <= max_points:
+        return payload
+    indices = shared_indices(streams, max_points, series_type)
+    size = max(sizes)
+    reduced = {}
+    for stream_type, stream in streams.items():
+        data = stream.get('data') or []
+        if len(data) != size:
+            reduced[stream_type] = stream
+            continue
+        reduced[stream_type] = dict(
+            stream,
+            data=[data[index] for index in indices],
+            indices=indices,
+            original_size=stream.get('original_size', len(data)),
+        )
+    return reduced if keyed else list(reduced.values())
@@ -0,0 +1,339 @@
+"""
+Streaming Parquet/Arrow export of Strava activities, laps, zones and streams.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+
+from strava.streams import StreamSet
+
+# Columns of each exported table. The schemas are fixed so that files from
+# different runs can be read as one dataset; absent values are null.
+ACTIVITY_COLUMNS = [
+    ('id', 'int64'),
+    ('athlete_id', 'int64'),
+    ('name', 'string'),
+    ('sport_type', 'string'),
+    ('start_date', 'timestamp'),
+    ('timezone', 'string'),
+    ('distance', 'float64'),
+    ('moving_time', 'int32'),
+    ('elapsed_time', 'int32'),
+    ('total_elevation_gain', 'float64'),
+    ('average_speed', 'float64'),
+    ('max_speed', 'float64'),
+    ('average_heartrate', 'float64'),
+    ('max_heartrate', 'float64'),
+    ('average_watts', 'float64'),
+    ('kilojoules', 'float64'),
+    ('device_watts', 'bool'),
+    ('gear_id', 'string'),
+    ('summary_polyline', 'string'),
+]
+LAP_COLUMNS = [
+    ('activity_id', 'int64'),
+    ('lap_index', 'int32'),
+    ('id', 'int64'),
+    ('name', 'string'),
+    ('start_date', 'timestamp'),
+    ('elapsed_time', 'int32'),
+    ('moving_time', 'int32'),
+    ('distance', 'float64'),
+    ('start_index', 'int32'),
+    ('end_index', 'int32'),
+    ('total_elevation_gain', 'float64'),
+    ('average_speed', 'float64'),
+    ('max_speed', 'float64'),
+    ('average_heartrate', 'float64'),
+    ('max_heartrate', 'float64'),
+    ('average_watts', 'float64'),
+    ('average_cadence', 'float64'),
+]
+ZONE_COLUMNS = [
+    ('activity_id', 'int64'),
+    ('zone_type', 'string'),
+    ('sensor_based', 'bool'),
+    ('score', 'float64'),
+    ('bucket', 'int16'),
+    ('min', 'float64'),
+    ('max', 'float64'),
+    ('time', 'int32'),
+]
+# One row per sample; `latlng` is split into `lat` and `lng`.
+STREAM_COLUMNS = [
+    ('activity_id', 'int64'),
+    ('index', 'int32'),
+    ('time', 'uint32'),
+    ('distance', 'float64'),
+    ('lat', 'float64'),
+    ('lng', 'float64'),
+    ('altitude', 'float32'),
+    ('velocity_smooth', 'float32'),
+    ('heartrate', 'uint16'),
+    ('cadence', 'uint16'),
+    ('watts', 'uint16'),
+    ('temp', 'int16'),
+    ('moving', 'bool'),
+    ('grade_smooth', 'float32'),
+]
+TABLES = {
+    'activities': ACTIVITY_COLUMNS,
+    'laps': LAP_COLUMNS,
+    'zones': ZONE_COLUMNS,
+    'streams': STREAM_COLUMNS,
+}
+DEFAULT_BATCH_ROWS = 10000
+
+
+def schema(table: str):
+    import pyarrow
+
+    types = {
+        'timestamp': pyarrow.timestamp('s', tz='UTC'),
+        'string': pyarrow.string(),
+        'bool': pyarrow.bool_(),
+    }
+    return pyarrow.schema([
+        (name, types.get(kind) or getattr(pyarrow, kind)())
+        for name, kind in TABLES[table]
+    ])
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+
+def _cast(kind: str, value):
+    if value is None:
+        return None
+    if kind == 'timestamp':
+        return _timestamp(value)
+    if kind.startswith(('int', 'uint')):
+        return int(value)
+    if kind.startswith('float'):
+        return float(value)
+    return value
+
+
+class ArrowExporter:
+    """
+    Writes activities, laps, zones and streams to one file per table in
+    `directory` (`activities.parquet`, ... or `.arrow` IPC files).
+
+    Rows are buffered per table and written as a record batch every
+    `batch_rows` rows; each activity's streams go out as their own batch
+    straight from the sample arrays. Memory therefore stays flat however
+    many activities are exported. Needs `pyarrow`; call `close()` (or use
+    it as a context manager) to finish the files.
+    """
+
+    def __init__(self, directory: str, format: str = 'parquet', batch_rows: int = DEFAULT_BATCH_ROWS, compression: str = 'zstd'):
+        if format not in ('parquet', 'arrow'):
+            raise ValueError(f'unsupported export format {format!r}')
+        import pyarrow
+
+        self.pyarrow = pyarrow
+        self.directory = directory
+        self.format = format
+        self.batch_rows = batch_rows
+        self.compression = compression
+        self._schemas = {table: schema(table) for table in TABLES}
+        self._rows: Dict[str, Dict[str, list]] = {table: self._empty(table) for table in TABLES if table != 'streams'}
+        self._writers = {}
+        self.rows_written = {table: 0 for table in TABLES}
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self) -> 'ArrowExporter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _empty(table: str) -> Dict[str, list]:
+        return {name: [] for name, _ in TABLES[table]}
+
+    def path(self, table: str) -> str:
+        return os.path.join(self.directory, f'{table}.{self.format}')
+
+    def _writer(self, table: str):
+        writer = self._writers.get(table)
+        if writer is None:
+            if self.format == 'parquet':
+                import pyarrow.parquet
+
+                writer = pyarrow.parquet.ParquetWriter(self.path(table), self._schemas[table], compression=self.compression)
+            else:
+                writer = self.pyarrow.ipc.new_file(self.path(table), self._schemas[table])
+            self._writers[table] = writer
+        return writer
+
+    def _write(self, table: str, batch) -> None:
+        if self.format == 'parquet':
+            self._writer(table).write_batch(batch)
+        else:
+            self._writer(table).write(batch)
+        self.rows_written[table] += batch.num_rows
+
+    def _append(self, table: str, row: dict) -> None:
+        rows = self._rows[table]
+        for name, kind in TABLES[table]:
+            rows[name].append(_cast(kind, row.get(name)))
+        if len(rows[TABLES[table][0][0]]) >= self.batch_rows:
+            self.flush(table)
+
+    def flush(self, table: Optional[str] = None) -> None:
+        """
+        Write the buffered rows of `table`, or of every table.
+        """
+        for name in [table] if table else list(self._rows):
+            rows = self._rows[name]
+            if not rows[TABLES[name][0][0]]:
+                continue
+            table_schema = self._schemas[name]
+            arrays = [self.pyarrow.array(rows[field.name], type=field.type) for field in table_schema]
+            self._write(name, self.pyarrow.RecordBatch.from_arrays(arrays, schema=table_schema))
+            self._rows[name] = self._empty(name)
+
+    def add_activity(self, activity: dict) -> None:
+        """
+        Add a `GetActivity` (or activity listing) result.
+        """
+        row = dict(activity)
+        row['athlete_id'] = (activity.get('athlete') or {}).get('id')
+        row['sport_type'] = activity.get('sport_type') or activity.get('type')
+        row['summary_polyline'] = (activity.get('map') or {}).get('summary_polyline')
+        self._append('activities', row)
+
+    def add_laps(self, activity_id: int, laps: List[dict]) -> None:
+        """
+        Add a `ListActivityLaps` result.
+        """
+        for lap_index, lap in enumerate(laps):
+            self._append('laps', dict(lap, activity_id=activity_id, lap_index=lap.get('lap_index', lap_index + 1)))
+
+    def add_zones(self, activity_id: int, zones: List[dict]) -> None:
+        """
+        Add a `GetActivityZones` result, one row per distribution bucket.
+        """
+        for zone in zones:
+            for bucket, distribution in enumerate(zone.get('distribution_buckets') or []):
+                self._append('zones', dict(
+                    distribution,
+                    activity_id=activity_id,
+                    zone_type=zone.get('type'),
+                    sensor_based=zone.get('sensor_based'),
+                    score=zone.get('score'),
+                    bucket=bucket,
+                ))
+
+    def add_streams(self, activity_id: int, streams: Union[StreamSet, dict, list]) -> None:
+        """
+        Add a `GetStreams` result (compact or not) as one batch of samples.
+        """
+        pyarrow = self.pyarrow
+        if not isinstance(streams, StreamSet):
+            streams = StreamSet.from_json(streams)
+        size = max((len(stream) for stream in streams.values()), default=0)
+        if not size:
+            return
+        columns = {}
+        for stream_type, stream in streams.items():
+            if len(stream) != size:
+                continue
+            samples = stream.samples
+            if stream_type == 'latlng':
+                flat = list(samples) if not hasattr(samples, 'reshape') else samples.reshape(-1)
+                columns['lat'], columns['lng'] = flat[0::2], flat[1::2]
+            else:
+                columns[stream_type] = samples
+        table_schema = self._schemas['streams']
+        arrays = []
+        for field in table_schema:
+            if field.name == 'activity_id':
+                arrays.append(pyarrow.array([activity_id] * size, type=field.type))
+            elif field.name == 'index':
+                arrays.append(pyarrow.array(range(size), type=field.type))
+            elif field.name in columns:
+                values = columns[field.name]
+                # NaN marks a gap in a stream; export it as null.
+                values = values if hasattr(values, 'dtype') else list(values)
+                arrays.append(pyarrow.array(values, from_pandas=True).cast(field.type, safe=False))
+            else:
+                arrays.append(pyarrow.nulls(size, type=field.type))
+        self._write('streams', pyarrow.RecordBatch.from_arrays(arrays, schema=table_schema))
+
+    def close(self) -> None:
+        self.flush()
+        # Open every table so that empty ones still get a file with the schema.
+        for table in TABLES:
+            self._writer(table)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def export_activities(
+    activity_ids: List[int],
+    authorisation_data: dict,
+    directory: str,
+    format: str = 'parquet',
+    tool=None,
+    chunk: int = 32,
+) -> dict:
+    """
+    Fetch each activity with its laps, zones and streams through the Strava
+    tool and export them, `chunk` activities at a time so that only one
+    chunk of responses is ever held.
+
+    Returns `rows_written` per table and the `failures`: one entry per call
+    that raised or came back unsuccessful, with its `activity_id`, `action`
+    and the `error` (the exception message or Strava's error payload).
+    Whatever those calls would have added is missing from the export.
+    """
+    from strava.strava_tools import (
+        GetActivity,
+        GetActivityRequest,
+        GetActivityZones,
+        GetActivityZonesRequest,
+        GetStreams,
+        GetStreamsRequest,
+        ListActivityLaps,
+        ListActivityLapsRequest,
+        Strava,
+    )
+
+    tool = tool or Strava()
+    stream_types = ','.join(name for name, _ in STREAM_COLUMNS[2:] if name not in ('lat', 'lng')) + ',latlng'
+    failures = []
+    with ArrowExporter(directory, format) as exporter:
+        for start in range(0, len(activity_ids), chunk):
+            calls = []
+            for activity_id in activity_ids[start:start + chunk]:
+                calls += [
+                    (GetActivity, GetActivityRequest(activity_id=activity_id)),
+                    (ListActivityLaps, ListActivityLapsRequest(activity_id=activity_id)),
+                    (GetActivityZones, GetActivityZonesRequest(activity_id=activity_id)),
+                    (GetStreams, GetStreamsRequest(activity_id=activity_id, stream_types=stream_types, compact=True)),
+                ]
+            for result in tool.execute_batch(calls, authorisation_data):
+                activity_id = result.request.activity_id
+                if not result.success:
+                    if result.error is not None:
+                        error = str(result.error)
+                    else:
+                        # Every response has `success` plus exactly one payload field.
+                        error = next(value for name, value in result.response if name != 'success')
+                    failures.append({'activity_id': activity_id, 'action': result.action.__name__, 'error': error})
+                    continue
+                if result.action is GetActivity:
+                    exporter.add_activity(result.response.activity)
+                elif result.action is ListActivityLaps:
+                    exporter.add_laps(activity_id, result.response.laps)
+                elif result.action is GetActivityZones:
+                    exporter.add_zones(activity_id, result.response.zones)
+                else:
+                    exporter.add_streams(activity_id, result.response.streams)
+    return {'rows_written': exporter.rows_written, 'failures': failures}
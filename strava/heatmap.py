@@ -0,0 +1,262 @@
+"""
+Incremental web-mercator heatmap tiles built from activity tracks.
+"""
+import io
+import json
+import math
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TILE_SIZE = 256
+DEFAULT_ZOOM = 12
+# Log-scaled colour saturates at this many activities through a pixel.
+DEFAULT_SATURATION = 50
+# Jumps longer than this many pixels are GPS glitches or pauses, not paths.
+MAX_SEGMENT = 512
+
+Tile = Tuple[int, int]
+
+
+def require_numpy() -> None:
+    if numpy is None:
+        raise ImportError('numpy is required for heatmaps')
+
+
+_directory_locks: Dict[str, threading.Lock] = {}
+_directory_locks_guard = threading.Lock()
+
+
+@contextmanager
+def locked(directory: str) -> Iterator[None]:
+    """
+    Hold the heatmap in `directory` for writing: exclusive across threads
+    of this process and, where `fcntl` exists, across processes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _directory_locks_guard:
+        lock = _directory_locks.setdefault(os.path.realpath(directory), threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, '.lock'), 'w') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _replace(path: str, data: bytes) -> None:
+    with open(path + '.tmp', 'wb') as handle:
+        handle.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def project(points, zoom: int, tile_size: int = TILE_SIZE):
+    """
+    Global web-mercator pixel coordinates `(x, y)` of `[lat, lng]` points.
+    """
+    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+    scale = tile_size * 2 ** zoom
+    lat = numpy.radians(numpy.clip(points[:, 0], -85.0511, 85.0511))
+    x = (points[:, 1] + 180.0) / 360.0 * scale
+    y = (1.0 - numpy.log(numpy.tan(lat) + 1.0 / numpy.cos(lat)) / math.pi) / 2.0 * scale
+    return numpy.column_stack((x, y))
+
+
+def rasterize(pixels, max_segment: float = MAX_SEGMENT):
+    """
+    Distinct integer pixels covered by the polyline through `pixels`, found
+    by sampling every segment at sub-pixel spacing in one vectorized pass.
+    """
+    if not len(pixels):
+        return numpy.empty((0, 2), dtype=numpy.int64)
+    starts, deltas = pixels[:-1], numpy.diff(pixels, axis=0)
+    lengths = numpy.abs(deltas).max(axis=1)
+    keep = lengths <= max_segment
+    starts, deltas = starts[keep], deltas[keep]
+    steps = numpy.maximum(numpy.ceil(lengths[keep]).astype(numpy.int64), 1)
+    segment = numpy.repeat(numpy.arange(len(steps)), steps)
+    offset = numpy.arange(len(segment)) - numpy.repeat(numpy.cumsum(steps) - steps, steps)
+    samples = starts[segment] + deltas[segment] * (offset / steps[segment])[:, None]
+    samples = numpy.vstack((samples, pixels[-1:]))
+    return numpy.unique(numpy.floor(samples).astype(numpy.int64), axis=0)
+
+
+def colorize(counts, saturation: int = DEFAULT_SATURATION):
+    """
+    RGBA image of a count tile on a log-scaled black-red-yellow-white ramp;
+    untouched pixels are transparent.
+    """
+    level = numpy.log1p(counts) / math.log1p(saturation)
+    level = numpy.clip(level, 0.0, 1.0)
+    image = numpy.empty(counts.shape + (4,), dtype=numpy.uint8)
+    image[..., 0] = numpy.clip(level * 3.0, 0.0, 1.0) * 255
+    image[..., 1] = numpy.clip(level * 3.0 - 1.0, 0.0, 1.0) * 255
+    image[..., 2] = numpy.clip(level * 3.0 - 2.0, 0.0, 1.0) * 255
+    image[..., 3] = numpy.where(counts > 0, 255, 0)
+    return image
+
+
+def encode_png(image) -> bytes:
+    """
+    Minimal PNG encoder for an 8-bit RGBA array.
+    """
+    height, width = image.shape[:2]
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    rows = numpy.hstack((numpy.zeros((height, 1), dtype=numpy.uint8), image.reshape(height, width * 4)))
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)),
+        chunk(b'IEND', b''),
+    ))
+
+
+class Heatmap:
+    """
+    Per-pixel activity counts for one zoom level, persisted as `.npy` tiles
+    under `directory/<zoom>/<x>/<y>.npy` with optional `.png` renderings
+    beside them.
+
+    Adding an activity only loads and rewrites the tiles its track crosses,
+    and each activity counts once per pixel however often it passes. The
+    ids already added are kept in `manifest.json`, so re-adding one is a
+    no-op. Writers must hold `locked(directory)`, as `build` does; files
+    are replaced atomically, so readers never see a partial tile.
+    """
+
+    def __init__(self, directory: str, zoom: int = DEFAULT_ZOOM, tile_size: int = TILE_SIZE, saturation: int = DEFAULT_SATURATION):
+        require_numpy()
+        self.directory = directory
+        self.saturation = saturation
+        self._manifest_path = os.path.join(directory, 'manifest.json')
+        manifest = {'zoom': zoom, 'tile_size': tile_size, 'activities': []}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as handle:
+                manifest = json.load(handle)
+            if (manifest['zoom'], manifest['tile_size']) != (zoom, tile_size):
+                raise ValueError(f'{directory} holds zoom {manifest["zoom"]} tiles of {manifest["tile_size"]} px')
+        self.zoom = zoom
+        self.tile_size = tile_size
+        self.activities = set(manifest['activities'])
+        self._tiles: Dict[Tile, 'numpy.ndarray'] = {}
+        self._dirty = set()
+
+    def _path(self, tile: Tile, extension: str) -> str:
+        return os.path.join(self.directory, str(self.zoom), str(tile[0]), f'{tile[1]}.{extension}')
+
+    def tile(self, tile: Tile):
+        counts = self._tiles.get(tile)
+        if counts is None:
+            path = self._path(tile, 'npy')
+            if os.path.exists(path):
+                counts = numpy.load(path)
+            else:
+                counts = numpy.zeros((self.tile_size, self.tile_size), dtype=numpy.uint32)
+            self._tiles[tile] = counts
+        return counts
+
+    def add(self, activity_id, points) -> bool:
+        """
+        Accumulate one activity's `[lat, lng]` track. Returns False if the
+        activity was already in the heatmap.
+        """
+        key = str(activity_id)
+        if key in self.activities:
+            return False
+        pixels = rasterize(project(points, self.zoom, self.tile_size))
+        tiles, local = numpy.divmod(pixels, self.tile_size)
+        unique, inverse = numpy.unique(tiles, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for position, (x, y) in enumerate(unique.tolist()):
+            selected = local[inverse == position]
+            # Pixels are distinct per activity, so plain fancy-index adds are safe.
+            self.tile((x, y))[selected[:, 1], selected[:, 0]] += 1
+            self._dirty.add((x, y))
+        self.activities.add(key)
+        return True
+
+    def flush(self, formats: Iterable[str] = ('png',)) -> List[str]:
+        """
+        Write every tile changed since the last flush, as `.npy` counts plus
+        any of `formats` (`png`, `npy`), and the manifest. Returns the paths
+        of the rendered tiles.
+        """
+        written = []
+        for tile in sorted(self._dirty):
+            counts = self._tiles[tile]
+            os.makedirs(os.path.dirname(self._path(tile, 'npy')), exist_ok=True)
+            buffer = io.BytesIO()
+            numpy.save(buffer, counts)
+            _replace(self._path(tile, 'npy'), buffer.getvalue())
+            if 'npy' in formats:
+                written.append(self._path(tile, 'npy'))
+            if 'png' in formats:
+                _replace(self._path(tile, 'png'), encode_png(colorize(counts, self.saturation)))
+                written.append(self._path(tile, 'png'))
+        self._dirty.clear()
+        self._tiles.clear()
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {'zoom': self.zoom, 'tile_size': self.tile_size, 'activities': sorted(self.activities)}
+        _replace(self._manifest_path, json.dumps(manifest).encode())
+        return written
+
+
+def named_directory(root: str, name: str) -> str:
+    """
+    Directory of the heatmap called `name` under `root`. Names are a single
+    path component, so a heatmap can never live outside `root`.
+    """
+    if not name or name in ('.', '..') or os.path.basename(name) != name or (os.altsep and os.altsep in name):
+        raise ValueError(f'invalid heatmap name {name!r}')
+    return os.path.join(root, name)
+
+
+def build(directory: str, tracks: Dict[str, object], zoom: int = DEFAULT_ZOOM, formats: Iterable[str] = ('png',)) -> dict:
+    """
+    Add `tracks` (`[lat, lng]` points by activity id) to the heatmap in
+    `directory` and flush it, holding the directory's lock throughout.
+    Module-level so it can run in an executor.
+    """
+    require_numpy()
+    with locked(directory):
+        heatmap = Heatmap(directory, zoom)
+        added = [activity_id for activity_id, points in tracks.items() if heatmap.add(activity_id, points)]
+        tiles = heatmap.flush(formats)
+    return {
+        'directory': directory,
+        'zoom': zoom,
+        'activities_added': len(added),
+        'activities_total': len(heatmap.activities),
+        'tiles_written': len(tiles),
+    }
+
+
+def known_activities(directory: str) -> set:
+    """
+    Ids already in the heatmap at `directory`, without loading any tiles.
+    """
+    path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(path):
+        return set()
+    with open(path) as handle:
+        return set(json.load(handle)['activities'])
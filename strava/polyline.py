@@ -0,0 +1,144 @@
+"""
+Encoded polyline decoding, encoding, simplification and bounds.
+
+Strava returns routes and activity maps as Google encoded polylines
+(`map.summary_polyline`, `map.polyline`). With NumPy installed a whole batch
+is decoded in a handful of array operations; without it the same functions
+fall back to the reference per-character decoder.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from strava.downsample import douglas_peucker
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PRECISION = 5
+
+BoundingBox = Tuple[float, float, float, float]
+
+
+def decode_python(encoded: str, precision: int = PRECISION) -> List[List[float]]:
+    """
+    Reference decoder, one character at a time.
+    """
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                chunk = ord(encoded[index]) - 63
+                index += 1
+                result |= (chunk & 0x1f) << shift
+                shift += 5
+                if chunk < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append([lat / factor, lng / factor])
+    return points
+
+
+def decode_many(encoded: Sequence[Optional[str]], precision: int = PRECISION) -> list:
+    """
+    Decode a batch of polylines into one `(n, 2)` array of `[lat, lng]`
+    per polyline (lists of pairs without NumPy). Missing polylines decode
+    to empty arrays.
+    """
+    encoded = [polyline or '' for polyline in encoded]
+    if numpy is None:
+        return [decode_python(polyline, precision) for polyline in encoded]
+    data = numpy.frombuffer(''.join(encoded).encode('ascii'), dtype=numpy.uint8).astype(numpy.int64) - 63
+    if not len(data):
+        return [numpy.empty((0, 2)) for _ in encoded]
+    # Every value is a run of 5-bit chunks ending with one below 0x20.
+    ends = data < 0x20
+    starts = numpy.flatnonzero(numpy.concatenate(([True], ends[:-1])))
+    position = numpy.arange(len(data)) - numpy.repeat(starts, numpy.diff(numpy.append(starts, len(data))))
+    values = numpy.add.reduceat((data & 0x1f) << (5 * position), starts)
+    deltas = numpy.where(values & 1, ~(values >> 1), values >> 1).reshape(-1, 2)
+    # Deltas accumulate across the whole batch; rebase each polyline on its
+    # own start by subtracting the running total before it.
+    boundaries = numpy.cumsum([0] + [len(polyline) for polyline in encoded])
+    counts = numpy.diff(numpy.concatenate(([0], numpy.cumsum(ends)))[boundaries]) // 2
+    totals = numpy.cumsum(deltas, axis=0)
+    offsets = numpy.cumsum(counts)
+    before = numpy.vstack((numpy.zeros((1, 2), dtype=numpy.int64), totals))[offsets - counts]
+    points = (totals - numpy.repeat(before, counts, axis=0)) / 10 ** precision
+    return numpy.split(points, offsets[:-1])
+
+
+def decode(encoded: Optional[str], precision: int = PRECISION):
+    return decode_many([encoded], precision)[0]
+
+
+def _encode_value(value: int, chunks: list) -> None:
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def encode(points: Iterable[Sequence[float]], precision: int = PRECISION) -> str:
+    """
+    Encode `[lat, lng]` points. Coordinates are rounded before taking
+    deltas, so a decode/encode round trip is lossless.
+    """
+    factor = 10 ** precision
+    chunks = []
+    previous_lat = previous_lng = 0
+    for lat, lng in points:
+        lat, lng = int(round(lat * factor)), int(round(lng * factor))
+        _encode_value(lat - previous_lat, chunks)
+        _encode_value(lng - previous_lng, chunks)
+        previous_lat, previous_lng = lat, lng
+    return ''.join(chunks)
+
+
+def simplify(points, max_points: int):
+    """
+    The `max_points` most significant points under Douglas-Peucker.
+    """
+    indices = douglas_peucker(points, max_points)
+    if numpy is not None and isinstance(points, numpy.ndarray):
+        return points[indices]
+    return [points[index] for index in indices]
+
+
+def bbox(points) -> Optional[BoundingBox]:
+    """
+    `(min_lat, min_lng, max_lat, max_lng)` of the points, or None if empty.
+    """
+    if not len(points):
+        return None
+    if numpy is not None:
+        points = numpy.asarray(points, dtype=float)
+        low, high = points.min(axis=0), points.max(axis=0)
+        return float(low[0]), float(low[1]), float(high[0]), float(high[1])
+    lats = [point[0] for point in points]
+    lngs = [point[1] for point in points]
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+
+def polyline_of(item: dict) -> Optional[str]:
+    """
+    The encoded polyline of an activity or route from any Strava listing:
+    the detailed `map.polyline` when present, else `map.summary_polyline`.
+    """
+    route_map = item.get('map') or {}
+    return route_map.get('polyline') or route_map.get('summary_polyline')
+
+
+def decode_items(items: Sequence[dict], precision: int = PRECISION) -> list:
+    """
+    Decode the polylines of the activities or routes returned by
+    `GetClubActivities`, `ListAthleteRoutes` and friends, in input order.
+    """
+    return decode_many([polyline_of(item) for item in items], precision)
@@ -1,21 +1,158 @@
-import requests
 from pydantic import BaseModel, Field
-from shared.composio_tools.lib import Action, Tool
-from typing import Optional, Type
-import json
+from common import (
+    ActionRequest,
+    ActionResponse,
+    HttpAction,
+    HttpRequest,
+    HttpTool,
+    UpstreamError,
+)
+from common.batch import BatchResult, arun_batch, run_batch
+from common.pagination import aiter_numbered_pages, iter_numbered_pages
+from typing import AsyncIterator, Dict, Iterator, List, Literal, Optional, Type, Union, get_args
+import asyncio
+from strava import heatmap
+from strava.analytics import ANALYTICS_STREAMS, AnalyticsOptions, analyse_many, require_numpy
+from strava.downsample import downsample_streams
+from strava.polyline import decode, polyline_of
+from strava.stream_archive import StreamArchive, shared_archive
+from strava.streams import StreamSet
+from strava.token_manager import StravaTokenManager
+
+# Largest page size Strava accepts on its page/per_page list endpoints.
+STRAVA_MAX_PAGE_SIZE = 200
+
+
+class StravaListAction(HttpAction):
+    """
+    Base for Strava list endpoints paged with `page` and a page-size parameter.
+
+    `iter_items`/`aiter_items` stream every item from `request.page` onwards at
+    the largest page size Strava allows, stopping on the first short page.
+    With `auto_paginate` set on the request, `execute` returns all of them.
+    With `stream_decode` set, pages are decoded item by item as they arrive
+    (and not prefetched), including the single page of a plain `execute`.
+    """
+    items_field = 'items'
+    page_size_field = 'per_page'
+
+    def _page_items(self, response) -> list:
+        response_json = response.json()
+        if response.status_code != 200:
+            raise UpstreamError(response.status_code, response_json)
+        return response_json
+
+    def _page_request(self, request: BaseModel, page: int) -> BaseModel:
+        return request.copy(update={'page': page, self.page_size_field: STRAVA_MAX_PAGE_SIZE})
+
+    def fetch_page(self, request: BaseModel, authorisation_data: dict, page: int) -> list:
+        """
+        Fetch one full-size page of items, raising `UpstreamError` on failure.
+        """
+        page_request = self.build(self._page_request(request, page), self.authorise(authorisation_data))
+        return self._page_items(self.decoded(self.http.send(page_request)))
+
+    async def afetch_page(self, request: BaseModel, authorisation_data: dict, page: int) -> list:
+        page_request = self.build(self._page_request(request, page), await self.aauthorise(authorisation_data))
+        return self._page_items(self.decoded(await self.async_http.send(page_request)))
+
+    def _stream_pages(self, request: BaseModel, authorisation_data: dict) -> Iterator:
+        page = request.page or 1
+        while True:
+            page_request = self.build(self._page_request(request, page), self.authorise(authorisation_data))
+            count = 0
+            for count, item in enumerate(self.send_streamed(page_request), 1):
+                yield item
+            if count < STRAVA_MAX_PAGE_SIZE:
+                return
+            page += 1
+
+    async def _astream_pages(self, request: BaseModel, authorisation_data: dict) -> AsyncIterator:
+        page = request.page or 1
+        while True:
+            page_request = self.build(self._page_request(request, page), await self.aauthorise(authorisation_data))
+            count = 0
+            async for item in await self.asend_streamed(page_request):
+                count += 1
+                yield item
+            if count < STRAVA_MAX_PAGE_SIZE:
+                return
+            page += 1
+
+    def _stream_page(self, request: BaseModel, authorisation_data: dict) -> Iterator:
+        yield from self.send_streamed(self.build(request, self.authorise(authorisation_data)))
+
+    async def _astream_page(self, request: BaseModel, authorisation_data: dict) -> AsyncIterator:
+        async for item in await self.asend_streamed(self.build(request, await self.aauthorise(authorisation_data))):
+            yield item
+
+    def iter_items(self, request: BaseModel, authorisation_data: dict, prefetch: bool = False) -> Iterator:
+        if self.stream_decode:
+            return self._stream_pages(request, authorisation_data)
+
+        def fetch(page: int) -> list:
+            return self.fetch_page(request, authorisation_data, page)
+
+        return iter_numbered_pages(fetch, request.page or 1, STRAVA_MAX_PAGE_SIZE, prefetch)
+
+    def aiter_items(self, request: BaseModel, authorisation_data: dict, prefetch: bool = False) -> AsyncIterator:
+        if self.stream_decode:
+            return self._astream_pages(request, authorisation_data)
+
+        async def fetch(page: int) -> list:
+            return await self.afetch_page(request, authorisation_data, page)
+
+        return aiter_numbered_pages(fetch, request.page or 1, STRAVA_MAX_PAGE_SIZE, prefetch)
+
+    def execute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        if request.auto_paginate:
+            items = self.iter_items(request, authorisation_data, prefetch=True)
+        elif self.stream_decode:
+            items = self._stream_page(request, authorisation_data)
+        else:
+            return super().execute(request, authorisation_data)
+        try:
+            items = self.collect(request, items)
+        except UpstreamError as exc:
+            return self.response_schema(success=False, **{self.items_field: exc.payload})
+        return self.response_schema(success=True, **{self.items_field: items})
+
+    async def aexecute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        if request.auto_paginate:
+            items = self.aiter_items(request, authorisation_data, prefetch=True)
+        elif self.stream_decode:
+            items = self._astream_page(request, authorisation_data)
+        else:
+            return await super().aexecute(request, authorisation_data)
+        try:
+            items = await self.acollect(request, items)
+        except UpstreamError as exc:
+            return self.response_schema(success=False, **{self.items_field: exc.payload})
+        return self.response_schema(success=True, **{self.items_field: items})
 
-class GetActivityRequest(BaseModel):
+
+class GetActivityRequest(ActionRequest):
     activity_id: int = Field(..., description='The id of the activity.')
     include_all_efforts: Optional[bool] = Field(None, description='To include all segment efforts.')
 
-class GetActivityResponse(BaseModel):
+class GetActivityResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     activity: dict = Field(..., description='The details of the activity.')
 
-class GetActivity(Action):
+class GetActivity(HttpAction):
     """
     Get activity details.
+
+    By default the detailed polyline and the segment, athlete and activity
+    objects repeated inside every effort and lap are left out; pass
+    `fields='*'` to get them.
     """
+    hedge = True
+    default_fields = (
+        '-map.polyline,-segment_efforts.segment,-segment_efforts.athlete,-segment_efforts.activity,'
+        '-best_efforts.athlete,-best_efforts.activity,-laps.athlete,-laps.activity'
+    )
+
     @property
     def display_name(self) -> str:
         return 'Get Activity'
@@ -28,19 +165,16 @@ class GetActivity(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetActivityResponse
     
-    def execute(self, request: GetActivityRequest, authorisation_data: dict) -> GetActivityResponse:
+    def prepare(self, request: GetActivityRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         activity_id = request.activity_id
-        if request.include_all_efforts:
-            include_all_efforts = request.include_all_efforts
-        else:
-            include_all_efforts = True
-        
         params = {
-            'include_all_efforts': include_all_efforts
+            'include_all_efforts': request.include_all_efforts
         }
 
-        response = requests.get(f'https://www.strava.com/api/v3/activities/{activity_id}', headers=headers, params=params)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/activities/{activity_id}', headers=headers, params=params)
+
+    def parse(self, response) -> GetActivityResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetActivityResponse(success=False, activity=response_json)
@@ -49,17 +183,19 @@ class GetActivity(Action):
 
 
 # GetAthlete action
-class GetAthleteRequest(BaseModel):
+class GetAthleteRequest(ActionRequest):
     pass
 
-class GetAthleteResponse(BaseModel):
+class GetAthleteResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     athlete: dict = Field(..., description='The details of the athlete.')
 
-class GetAthlete(Action):
+class GetAthlete(HttpAction):
     """
     Get athlete details.
     """
+    cache_ttl = 300
+
     @property
     def display_name(self) -> str:
         return 'Get Athlete'
@@ -72,10 +208,12 @@ class GetAthlete(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetAthleteResponse
     
-    def execute(self, request: GetAthleteRequest, authorisation_data: dict) -> GetAthleteResponse:
+    def prepare(self, request: GetAthleteRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
 
-        response = requests.get(f'https://www.strava.com/api/v3/athlete', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/athlete', headers=headers)
+
+    def parse(self, response) -> GetAthleteResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetAthleteResponse(success=False, athlete=response_json)
@@ -84,14 +222,14 @@ class GetAthlete(Action):
 
 
 # GetAthleteStats action
-class GetAthleteStatsRequest(BaseModel):
+class GetAthleteStatsRequest(ActionRequest):
     athlete_id: int = Field(..., description='The id of the athlete.')
 
-class GetAthleteStatsResponse(BaseModel):
+class GetAthleteStatsResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     stats: dict = Field(..., description='The statistics of the athlete.')
 
-class GetAthleteStats(Action):
+class GetAthleteStats(HttpAction):
     """
     Get athlete statistics.
     """
@@ -107,11 +245,13 @@ class GetAthleteStats(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetAthleteStatsResponse
     
-    def execute(self, request: GetAthleteStatsRequest, authorisation_data: dict) -> GetAthleteStatsResponse:
+    def prepare(self, request: GetAthleteStatsRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         athlete_id = request.athlete_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/athletes/{athlete_id}/stats', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/athletes/{athlete_id}/stats', headers=headers)
+
+    def parse(self, response) -> GetAthleteStatsResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetAthleteStatsResponse(success=False, stats=response_json)
@@ -120,17 +260,19 @@ class GetAthleteStats(Action):
 
 
 # GetAthleteZones action
-class GetAthleteZonesRequest(BaseModel):
+class GetAthleteZonesRequest(ActionRequest):
     pass 
 
-class GetAthleteZonesResponse(BaseModel):
+class GetAthleteZonesResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     zones: dict = Field(..., description='The zones of the athlete.')
 
-class GetAthleteZones(Action):
+class GetAthleteZones(HttpAction):
     """
     Returns the the authenticated athlete's heart rate and power zones.
     """
+    cache_ttl = 3600
+
     @property
     def display_name(self) -> str:
         return 'Get Athlete Zones'
@@ -143,10 +285,12 @@ class GetAthleteZones(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetAthleteZonesResponse
     
-    def execute(self, authorisation_data: dict) -> GetAthleteZonesResponse:
+    def prepare(self, request: GetAthleteZonesRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
 
-        response = requests.get(f'https://www.strava.com/api/v3/athlete/zones', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/athlete/zones', headers=headers)
+
+    def parse(self, response) -> GetAthleteZonesResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetAthleteZonesResponse(success=False, zones=response_json)
@@ -155,14 +299,14 @@ class GetAthleteZones(Action):
 
 
 # GetClub action
-class GetClubRequest(BaseModel):
+class GetClubRequest(ActionRequest):
     club_id: int = Field(..., description='The id of the club.')
 
-class GetClubResponse(BaseModel):
+class GetClubResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     club: dict = Field(..., description='The details of the club.')
 
-class GetClub(Action):
+class GetClub(HttpAction):
     """
     Get club details.
     """
@@ -178,11 +322,13 @@ class GetClub(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetClubResponse
     
-    def execute(self, request: GetClubRequest, authorisation_data: dict) -> GetClubResponse:
+    def prepare(self, request: GetClubRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         club_id = request.club_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/clubs/{club_id}', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/clubs/{club_id}', headers=headers)
+
+    def parse(self, response) -> GetClubResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetClubResponse(success=False, club=response_json)
@@ -190,19 +336,22 @@ class GetClub(Action):
         return GetClubResponse(success=True, club=response_json)
 
 # GetClubActivities action
-class GetClubActivitiesRequest(BaseModel):
+class GetClubActivitiesRequest(ActionRequest):
     club_id: int = Field(..., description='The id of the club.')
     page: Optional[int] = Field(default=1, description='The page number of the activities.') 
     per_page: Optional[int] = Field(default=30, description='The number of activities per page.')
+    auto_paginate: Optional[bool] = Field(default=False, description='Fetch every page of activities from `page` onwards, 200 per request.')
 
-class GetClubActivitiesResponse(BaseModel):
+class GetClubActivitiesResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    activities: dict = Field(..., description='The activities of the club.')
+    activities: Union[list, dict] = Field(..., description='The activities of the club.')
 
-class GetClubActivities(Action):
+class GetClubActivities(StravaListAction):
     """
     Get club activities.
     """
+    items_field = 'activities'
+
     @property
     def display_name(self) -> str:
         return 'Get Club Activities'
@@ -215,7 +364,7 @@ class GetClubActivities(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetClubActivitiesResponse
     
-    def execute(self, request: GetClubActivitiesRequest, authorisation_data: dict) -> GetClubActivitiesResponse:
+    def prepare(self, request: GetClubActivitiesRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         club_id = request.club_id
         params = {
@@ -223,7 +372,9 @@ class GetClubActivities(Action):
             'per_page': request.per_page
         }
 
-        response = requests.get(f'https://www.strava.com/api/v3/clubs/{club_id}/activities', headers=headers, params=params)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/clubs/{club_id}/activities', headers=headers, params=params)
+
+    def parse(self, response) -> GetClubActivitiesResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetClubActivitiesResponse(success=False, activities=response_json)
@@ -232,17 +383,19 @@ class GetClubActivities(Action):
 
 
 # GetGear action
-class GetGearRequest(BaseModel):
+class GetGearRequest(ActionRequest):
     gear_id: str = Field(..., description='The id of the gear.')
 
-class GetGearResponse(BaseModel):
+class GetGearResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     gear: dict = Field(..., description='The details of the gear.')
 
-class GetGear(Action):
+class GetGear(HttpAction):
     """
     Get gear details.
     """
+    cache_ttl = 3600
+
     @property
     def display_name(self) -> str:
         return 'Get Gear'
@@ -255,11 +408,13 @@ class GetGear(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetGearResponse
     
-    def execute(self, request: GetGearRequest, authorisation_data: dict) -> GetGearResponse:
+    def prepare(self, request: GetGearRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         gear_id = request.gear_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/gear/{gear_id}', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/gear/{gear_id}', headers=headers)
+
+    def parse(self, response) -> GetGearResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetGearResponse(success=False, gear=response_json)
@@ -268,17 +423,19 @@ class GetGear(Action):
 
 
 # GetRoute action
-class GetRouteRequest(BaseModel):
+class GetRouteRequest(ActionRequest):
     route_id: int = Field(..., description='The id of the route.')
 
-class GetRouteResponse(BaseModel):
+class GetRouteResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     route: dict = Field(..., description='The details of the route.')
 
-class GetRoute(Action):
+class GetRoute(HttpAction):
     """
     Get route details.
     """
+    cache_ttl = 3600
+
     @property
     def display_name(self) -> str:
         return 'Get Route'
@@ -291,11 +448,13 @@ class GetRoute(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetRouteResponse
     
-    def execute(self, request: GetRouteRequest, authorisation_data: dict) -> GetRouteResponse:
+    def prepare(self, request: GetRouteRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         route_id = request.route_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/routes/{route_id}', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/routes/{route_id}', headers=headers)
+
+    def parse(self, response) -> GetRouteResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetRouteResponse(success=False, route=response_json)
@@ -304,17 +463,19 @@ class GetRoute(Action):
 
 
 # GetSegment action
-class GetSegmentRequest(BaseModel):
+class GetSegmentRequest(ActionRequest):
     segment_id: int = Field(..., description='The id of the segment.')
 
-class GetSegmentResponse(BaseModel):
+class GetSegmentResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     segment: dict = Field(..., description='The details of the segment.')
 
-class GetSegment(Action):
+class GetSegment(HttpAction):
     """
     Get segment details.
     """
+    cache_ttl = 3600
+
     @property
     def display_name(self) -> str:
         return 'Get Segment'
@@ -327,11 +488,13 @@ class GetSegment(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetSegmentResponse
     
-    def execute(self, request: GetSegmentRequest, authorisation_data: dict) -> GetSegmentResponse:
+    def prepare(self, request: GetSegmentRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         segment_id = request.segment_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/segments/{segment_id}', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/segments/{segment_id}', headers=headers)
+
+    def parse(self, response) -> GetSegmentResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetSegmentResponse(success=False, segment=response_json)
@@ -340,14 +503,14 @@ class GetSegment(Action):
 
 
 # GetSegmentEffort action
-class GetSegmentEffortRequest(BaseModel):
+class GetSegmentEffortRequest(ActionRequest):
     segment_effort_id: int = Field(..., description='The id of the segment effort.')
 
-class GetSegmentEffortResponse(BaseModel):
+class GetSegmentEffortResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     segment_effort: dict = Field(..., description='The details of the segment effort.')
 
-class GetSegmentEffort(Action):
+class GetSegmentEffort(HttpAction):
     """
     Get segment effort details.
     """
@@ -363,11 +526,13 @@ class GetSegmentEffort(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetSegmentEffortResponse
     
-    def execute(self, request: GetSegmentEffortRequest, authorisation_data: dict) -> GetSegmentEffortResponse:
+    def prepare(self, request: GetSegmentEffortRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         segment_effort_id = request.segment_effort_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/segment_efforts/{segment_effort_id}', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/segment_efforts/{segment_effort_id}', headers=headers)
+
+    def parse(self, response) -> GetSegmentEffortResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetSegmentEffortResponse(success=False, segment_effort=response_json)
@@ -376,19 +541,35 @@ class GetSegmentEffort(Action):
 
 
 # GetStreams action
-class GetStreamsRequest(BaseModel):
+class GetStreamsRequest(ActionRequest):
     activity_id: int = Field(..., description='The id of the activity.')
     stream_types: str = Field(..., description='Desired stream types. May take one of the following values')
     key_by_type: Optional[bool] = Field(default=True, description='Must be true to return streams')
+    resolution: Optional[str] = Field(default=None, description='Upstream resolution: low, medium or high.')
+    series_type: Optional[str] = Field(default=None, description='Series the upstream resolution and local downsampling sample over: time or distance.')
+    max_points: Optional[int] = Field(default=None, ge=2, description='Downsample every stream to at most this many points (at least 2), keeping its shape.')
+    compact: Optional[bool] = Field(default=False, description='Decode the streams into typed arrays (NumPy when installed) instead of lists.')
 
-class GetStreamsResponse(BaseModel):
+class GetStreamsResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    streams: dict = Field(..., description='The streams data for the activity.')
+    streams: Union[StreamSet, dict, list] = Field(..., description='The streams data for the activity.')
 
-class GetStreams(Action):
+    class Config:
+        arbitrary_types_allowed = True
+        json_encoders = {StreamSet: StreamSet.to_json}
+
+class GetStreams(HttpAction):
     """
     Get activity streams.
+
+    `max_points` reduces the streams locally to samples at shared positions
+    chosen to keep every stream's shape (Douglas-Peucker for `latlng`, LTTB
+    for the rest), so they stay aligned. With `compact` set, successful
+    responses carry a `StreamSet` of typed arrays; its `to_json()` gives the
+    usual dict when one is needed.
     """
+    timeout = (3.05, 60.0)
+
     @property
     def display_name(self) -> str:
         return 'Get Streams'
@@ -401,15 +582,37 @@ class GetStreams(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetStreamsResponse
     
-    def execute(self, request: GetStreamsRequest, authorisation_data: dict) -> GetStreamsResponse:
+    def prepare(self, request: GetStreamsRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         activity_id = request.activity_id
         params = {
             "keys": request.stream_types,
-            'key_by_type': request.key_by_type
+            'key_by_type': request.key_by_type,
+            'resolution': request.resolution,
+            'series_type': request.series_type
         }
 
-        response = requests.get(f'https://www.strava.com/api/v3/activities/{activity_id}/streams', headers=headers, params=params)
+        http_request = HttpRequest('GET', f'https://www.strava.com/api/v3/activities/{activity_id}/streams', headers=headers, params=params)
+        http_request.decode_options = {
+            'compact': bool(request.compact),
+            'max_points': request.max_points,
+            'series_type': request.series_type,
+        }
+        return http_request
+
+    def decode(self, http_request: HttpRequest, response) -> GetStreamsResponse:
+        response = self.projected(http_request, response)
+        options = http_request.decode_options
+        if response.status_code != 200 or not (options['compact'] or options['max_points'] is not None):
+            return self.parse(response)
+        streams = response.json()
+        if options['max_points'] is not None:
+            streams = downsample_streams(streams, options['max_points'], options['series_type'])
+        if options['compact']:
+            streams = StreamSet.from_json(streams)
+        return GetStreamsResponse(success=True, streams=streams)
+
+    def parse(self, response) -> GetStreamsResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetStreamsResponse(success=False, streams=response_json)
@@ -446,13 +649,13 @@ class GetStreams(Action):
 #         file_path = request.file_path
 
 #         # Implementation to upload activity file to Strava
-#         # Example: Using requests.post() to upload the file to the Strava API
+#         # Example: Using self.http.post() to upload the file to the Strava API
 #         # This implementation may vary based on the specific requirements and API specifications
 
 #         return UploadActivityResponse(success=True, activity_id=123456)  # Dummy response, actual implementation needed
 
 # CreateActivity action
-class CreateActivityRequest(BaseModel):
+class CreateActivityRequest(ActionRequest):
     name: str = Field(..., description='The name of the activity.')
     type: str = Field(..., description='The type of the activity (e.g., "ride", "run").')
     sport_type: str = Field(..., description='The sport type of the activity (e.g., Run, MountainBikeRide, Ride, etc.).')
@@ -463,11 +666,11 @@ class CreateActivityRequest(BaseModel):
     trainer: bool = Field(None, description='Set to 1 to mark as a trainer activity')
     commute: bool = Field(None, description='Set to 1 to mark as a commute')
 
-class CreateActivityResponse(BaseModel):
+class CreateActivityResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     activity: dict = Field(None, description='The details of the created activity, if successful.')
 
-class CreateActivity(Action):
+class CreateActivity(HttpAction):
     """
     Create a new activity.
     """
@@ -483,11 +686,13 @@ class CreateActivity(Action):
     def response_schema(self) -> Type[BaseModel]:
         return CreateActivityResponse
     
-    def execute(self, request: CreateActivityRequest, authorisation_data: dict) -> CreateActivityResponse:
+    def prepare(self, request: CreateActivityRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
-        data = request.dict()
+        data = request.body()
 
-        response = requests.post('https://www.strava.com/api/v3/activities', headers=headers, json=data)
+        return HttpRequest('POST', 'https://www.strava.com/api/v3/activities', headers=headers, json=data)
+
+    def parse(self, response) -> CreateActivityResponse:
         response_json = response.json()
         if response.status_code != 201:
             return CreateActivityResponse(success=False, activity=response_json)
@@ -496,7 +701,7 @@ class CreateActivity(Action):
 
 
 # UpdateActivity action
-class UpdateActivityRequest(BaseModel):
+class UpdateActivityRequest(ActionRequest):
     activity_id: int = Field(..., description='The id of the activity to update.')
     name: str = Field(None, description='Optional new name of the activity.')
     type: str = Field(None, description='Optional new type of the activity (e.g., "ride", "run").')
@@ -504,11 +709,11 @@ class UpdateActivityRequest(BaseModel):
     private: bool = Field(None, description='Optional flag to update activity privacy.')
     commute: bool = Field(None, description='Optional flag to update activity commute status.')
 
-class UpdateActivityResponse(BaseModel):
+class UpdateActivityResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     activity: dict = Field(None, description='The updated details of the activity, if successful.')
 
-class UpdateActivity(Action):
+class UpdateActivity(HttpAction):
     """
     Update an existing activity.
     """
@@ -524,7 +729,7 @@ class UpdateActivity(Action):
     def response_schema(self) -> Type[BaseModel]:
         return UpdateActivityResponse
     
-    def execute(self, request: UpdateActivityRequest, authorisation_data: dict) -> UpdateActivityResponse:
+    def prepare(self, request: UpdateActivityRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         activity_id = request.activity_id
         data = {
@@ -537,9 +742,9 @@ class UpdateActivity(Action):
         # filter none values 
         data = {k: v for k, v in data.items() if v is not None}
 
-        data_json = json.dumps(data)
+        return HttpRequest('PUT', f'https://www.strava.com/api/v3/activities/{activity_id}', headers=headers, json=data)
 
-        response = requests.put(f'https://www.strava.com/api/v3/activities/{activity_id}', headers=headers, json=data_json)
+    def parse(self, response) -> UpdateActivityResponse:
         response_json = response.json()
         if response.status_code != 200:
             return UpdateActivityResponse(success=False, activity=response_json)
@@ -548,19 +753,23 @@ class UpdateActivity(Action):
 
 
 # ListActivityComments action
-class ListActivityCommentsRequest(BaseModel):
+class ListActivityCommentsRequest(ActionRequest):
     activity_id: int = Field(..., description='The id of the activity.')
     page: Optional[int] = Field(default=1, description='The page number of the comments.')
     page_size: Optional[int] = Field(default=30, description='The number of comments per page.')
+    auto_paginate: Optional[bool] = Field(default=False, description='Fetch every page of comments from `page` onwards, 200 per request.')
 
-class ListActivityCommentsResponse(BaseModel):
+class ListActivityCommentsResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    comments: dict = Field(..., description='The comments on the activity.')
+    comments: Union[list, dict] = Field(..., description='The comments on the activity.')
 
-class ListActivityComments(Action):
+class ListActivityComments(StravaListAction):
     """
     List comments on an activity.
     """
+    items_field = 'comments'
+    page_size_field = 'page_size'
+
     @property
     def display_name(self) -> str:
         return 'List Activity Comments'
@@ -573,7 +782,7 @@ class ListActivityComments(Action):
     def response_schema(self) -> Type[BaseModel]:
         return ListActivityCommentsResponse
     
-    def execute(self, request: ListActivityCommentsRequest, authorisation_data: dict) -> ListActivityCommentsResponse:
+    def prepare(self, request: ListActivityCommentsRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         activity_id = request.activity_id
         params = {
@@ -581,7 +790,9 @@ class ListActivityComments(Action):
             'page_size': request.page_size
         }
 
-        response = requests.get(f'https://www.strava.com/api/v3/activities/{activity_id}/comments', headers=headers, params=params)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/activities/{activity_id}/comments', headers=headers, params=params)
+
+    def parse(self, response) -> ListActivityCommentsResponse:
         response_json = response.json()
         if response.status_code != 200:
             return ListActivityCommentsResponse(success=False, comments=response_json)
@@ -590,19 +801,22 @@ class ListActivityComments(Action):
 
 
 # ListActivityKudoers action
-class ListActivityKudoersRequest(BaseModel):
+class ListActivityKudoersRequest(ActionRequest):
     activity_id: int = Field(..., description='The id of the activity.')
     page: Optional[int] = Field(default=1, description='The page number of the kudoers.')
     per_page: Optional[int] = Field(default=30, description='The number of kudoers per page.')
+    auto_paginate: Optional[bool] = Field(default=False, description='Fetch every page of kudoers from `page` onwards, 200 per request.')
 
-class ListActivityKudoersResponse(BaseModel):
+class ListActivityKudoersResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    kudoers: dict = Field(..., description='The users who gave kudos to the activity.')
+    kudoers: Union[list, dict] = Field(..., description='The users who gave kudos to the activity.')
 
-class ListActivityKudoers(Action):
+class ListActivityKudoers(StravaListAction):
     """
     List users who gave kudos to an activity.
     """
+    items_field = 'kudoers'
+
     @property
     def display_name(self) -> str:
         return 'List Activity Kudoers'
@@ -615,7 +829,7 @@ class ListActivityKudoers(Action):
     def response_schema(self) -> Type[BaseModel]:
         return ListActivityKudoersResponse
     
-    def execute(self, request: ListActivityKudoersRequest, authorisation_data: dict) -> ListActivityKudoersResponse:
+    def prepare(self, request: ListActivityKudoersRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         activity_id = request.activity_id
         params = {
@@ -623,7 +837,9 @@ class ListActivityKudoers(Action):
             'per_page': request.per_page
         }
 
-        response = requests.get(f'https://www.strava.com/api/v3/activities/{activity_id}/kudos', headers=headers, params=params)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/activities/{activity_id}/kudos', headers=headers, params=params)
+
+    def parse(self, response) -> ListActivityKudoersResponse:
         response_json = response.json()
         if response.status_code != 200:
             return ListActivityKudoersResponse(success=False, kudoers=response_json)
@@ -632,14 +848,14 @@ class ListActivityKudoers(Action):
 
 
 # ListActivityLaps action
-class ListActivityLapsRequest(BaseModel):
+class ListActivityLapsRequest(ActionRequest):
     activity_id: int = Field(..., description='The id of the activity.')
 
-class ListActivityLapsResponse(BaseModel):
+class ListActivityLapsResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    laps: dict = Field(..., description='The laps data for the activity.')
+    laps: Union[list, dict] = Field(..., description='The laps data for the activity.')
 
-class ListActivityLaps(Action):
+class ListActivityLaps(HttpAction):
     """
     List laps for an activity.
     """
@@ -655,11 +871,13 @@ class ListActivityLaps(Action):
     def response_schema(self) -> Type[BaseModel]:
         return ListActivityLapsResponse
     
-    def execute(self, request: ListActivityLapsRequest, authorisation_data: dict) -> ListActivityLapsResponse:
+    def prepare(self, request: ListActivityLapsRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         activity_id = request.activity_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/activities/{activity_id}/laps', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/activities/{activity_id}/laps', headers=headers)
+
+    def parse(self, response) -> ListActivityLapsResponse:
         response_json = response.json()
         if response.status_code != 200:
             return ListActivityLapsResponse(success=False, laps=response_json)
@@ -668,14 +886,14 @@ class ListActivityLaps(Action):
 
 
 # GetActivityZones action
-class GetActivityZonesRequest(BaseModel):
+class GetActivityZonesRequest(ActionRequest):
     activity_id: int = Field(..., description='The id of the activity.')
 
-class GetActivityZonesResponse(BaseModel):
+class GetActivityZonesResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    zones: dict = Field(..., description='The zones data for the activity.')
+    zones: Union[list, dict] = Field(..., description='The zones data for the activity.')
 
-class GetActivityZones(Action):
+class GetActivityZones(HttpAction):
     """
     Get activity zones.
     """
@@ -691,11 +909,13 @@ class GetActivityZones(Action):
     def response_schema(self) -> Type[BaseModel]:
         return GetActivityZonesResponse
     
-    def execute(self, request: GetActivityZonesRequest, authorisation_data: dict) -> GetActivityZonesResponse:
+    def prepare(self, request: GetActivityZonesRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         activity_id = request.activity_id
 
-        response = requests.get(f'https://www.strava.com/api/v3/activities/{activity_id}/zones', headers=headers)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/activities/{activity_id}/zones', headers=headers)
+
+    def parse(self, response) -> GetActivityZonesResponse:
         response_json = response.json()
         if response.status_code != 200:
             return GetActivityZonesResponse(success=False, zones=response_json)
@@ -704,19 +924,22 @@ class GetActivityZones(Action):
 
 
 # ListClubMembers action
-class ListClubMembersRequest(BaseModel):
+class ListClubMembersRequest(ActionRequest):
     club_id: int = Field(..., description='The id of the club.')
     page: Optional[int] = Field(default=1, description='The page number of the members.')
     per_page: Optional[int] = Field(default=30, description='The number of members per page.')
+    auto_paginate: Optional[bool] = Field(default=False, description='Fetch every page of members from `page` onwards, 200 per request.')
 
-class ListClubMembersResponse(BaseModel):
+class ListClubMembersResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    members: list = Field(..., description='The members of the club.')
+    members: Union[list, dict] = Field(..., description='The members of the club.')
 
-class ListClubMembers(Action):
+class ListClubMembers(StravaListAction):
     """
     List members of a club.
     """
+    items_field = 'members'
+
     @property
     def display_name(self) -> str:
         return 'List Club Members'
@@ -729,7 +952,7 @@ class ListClubMembers(Action):
     def response_schema(self) -> Type[BaseModel]:
         return ListClubMembersResponse
     
-    def execute(self, request: ListClubMembersRequest, authorisation_data: dict) -> ListClubMembersResponse:
+    def prepare(self, request: ListClubMembersRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         club_id = request.club_id
         params = {
@@ -737,7 +960,9 @@ class ListClubMembers(Action):
             'per_page': request.per_page
         }
 
-        response = requests.get(f'https://www.strava.com/api/v3/clubs/{club_id}/members', headers=headers, params=params)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/clubs/{club_id}/members', headers=headers, params=params)
+
+    def parse(self, response) -> ListClubMembersResponse:
         response_json = response.json()
         if response.status_code != 200:
             return ListClubMembersResponse(success=False, members=response_json)
@@ -746,14 +971,14 @@ class ListClubMembers(Action):
 
 
 # UpdateAthlete action
-class UpdateAthleteRequest(BaseModel):
+class UpdateAthleteRequest(ActionRequest):
     weight: float = Field(None, description='Optional new weight of the athlete.')
 
-class UpdateAthleteResponse(BaseModel):
+class UpdateAthleteResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
     athlete: dict = Field(None, description='The updated details of the athlete, if successful.')
 
-class UpdateAthlete(Action):
+class UpdateAthlete(HttpAction):
     """
     Update athlete details.
     """
@@ -769,14 +994,14 @@ class UpdateAthlete(Action):
     def response_schema(self) -> Type[BaseModel]:
         return UpdateAthleteResponse
     
-    def execute(self, request: UpdateAthleteRequest, authorisation_data: dict) -> UpdateAthleteResponse:
+    def prepare(self, request: UpdateAthleteRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         data = {
             'weight': request.weight
         }
-        data_json = json.dumps(data)
+        return HttpRequest('PUT', 'https://www.strava.com/api/v3/athlete', headers=headers, json=data)
 
-        response = requests.put('https://www.strava.com/api/v3/athlete', headers=headers, json=data_json)
+    def parse(self, response) -> UpdateAthleteResponse:
         response_json = response.json()
         if response.status_code != 200:
             return UpdateAthleteResponse(success=False, athlete=response_json)
@@ -785,19 +1010,24 @@ class UpdateAthlete(Action):
 
 
 # ListAthleteRoutes action
-class ListAthleteRoutesRequest(BaseModel):
+class ListAthleteRoutesRequest(ActionRequest):
     athlete_id: int = Field(..., description='The id of the athlete.')
     page: Optional[int] = Field(default=1, description='The page number of the routes.')
     per_page: Optional[int] = Field(default=30, description='The number of routes per page.')
+    auto_paginate: Optional[bool] = Field(default=False, description='Fetch every page of routes from `page` onwards, 200 per request.')
 
-class ListAthleteRoutesResponse(BaseModel):
+class ListAthleteRoutesResponse(ActionResponse):
     success: bool = Field(..., description='Whether the request was successful.')
-    routes: dict = Field(..., description='The routes of the athlete.')
+    routes: Union[list, dict] = Field(..., description='The routes of the athlete.')
 
-class ListAthleteRoutes(Action):
+class ListAthleteRoutes(StravaListAction):
     """
-    List routes of an athlete.
+    List routes of an athlete. The segments and detailed polyline of each
+    route are left out unless asked for with `fields`.
     """
+    items_field = 'routes'
+    default_fields = '-segments,-map.polyline'
+
     @property
     def display_name(self) -> str:
         return 'List Athlete Routes'
@@ -810,7 +1040,7 @@ class ListAthleteRoutes(Action):
     def response_schema(self) -> Type[BaseModel]:
         return ListAthleteRoutesResponse
     
-    def execute(self, request: ListAthleteRoutesRequest, authorisation_data: dict) -> ListAthleteRoutesResponse:
+    def prepare(self, request: ListAthleteRoutesRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         athlete_id = request.athlete_id
         params = {
@@ -818,7 +1048,9 @@ class ListAthleteRoutes(Action):
             'per_page': request.per_page
         }
 
-        response = requests.get(f'https://www.strava.com/api/v3/athletes/{athlete_id}/routes', headers=headers, params=params)
+        return HttpRequest('GET', f'https://www.strava.com/api/v3/athletes/{athlete_id}/routes', headers=headers, params=params)
+
+    def parse(self, response) -> ListAthleteRoutesResponse:
         response_json = response.json()
         if response.status_code != 200:
             return ListAthleteRoutesResponse(success=False, routes=response_json)
@@ -826,9 +1058,378 @@ class ListAthleteRoutes(Action):
         return ListAthleteRoutesResponse(success=True, routes=response_json)
 
 
-class Strava(Tool):
+class ListAthleteActivitiesRequest(ActionRequest):
+    before: Optional[int] = Field(default=None, description='Only return activities that started before this epoch timestamp.')
+    after: Optional[int] = Field(default=None, description='Only return activities that started after this epoch timestamp.')
+    page: Optional[int] = Field(default=1, description='The page number of the activities.')
+    per_page: Optional[int] = Field(default=30, description='The number of activities per page.')
+    auto_paginate: Optional[bool] = Field(default=False, description='Fetch every page of activities from `page` onwards, 200 per request.')
+
+class ListAthleteActivitiesResponse(ActionResponse):
+    success: bool = Field(..., description='Whether the request was successful.')
+    activities: Union[list, dict] = Field(..., description='The activities of the authenticated athlete.')
+
+class ListAthleteActivities(StravaListAction):
+    """
+    List activities of the authenticated athlete. With `after` set, Strava
+    returns them oldest first, which is what incremental sync relies on.
+    """
+    items_field = 'activities'
+
+    @property
+    def display_name(self) -> str:
+        return 'List Athlete Activities'
+    
+    @property
+    def request_schema(self) -> Type[BaseModel]:
+        return ListAthleteActivitiesRequest
+    
+    @property
+    def response_schema(self) -> Type[BaseModel]:
+        return ListAthleteActivitiesResponse
+    
+    def prepare(self, request: ListAthleteActivitiesRequest, authorisation_data: dict) -> HttpRequest:
+        headers = authorisation_data["headers"]
+        params = {
+            'before': request.before,
+            'after': request.after,
+            'page': request.page,
+            'per_page': request.per_page
+        }
+
+        return HttpRequest('GET', 'https://www.strava.com/api/v3/athlete/activities', headers=headers, params=params)
+
+    def parse(self, response) -> ListAthleteActivitiesResponse:
+        response_json = response.json()
+        if response.status_code != 200:
+            return ListAthleteActivitiesResponse(success=False, activities=response_json)
+        
+        return ListAthleteActivitiesResponse(success=True, activities=response_json)
+
+
+# GetActivityAnalytics action
+class GetActivityAnalyticsRequest(ActionRequest):
+    activity_ids: List[int] = Field(..., description='The ids of the activities to analyse.')
+    durations: Optional[List[int]] = Field(default=None, description='Power curve durations in seconds. Defaults to 5 seconds up to an hour.')
+    distances: Optional[List[float]] = Field(default=None, description='Best effort distances in metres. Defaults to 400 m up to the marathon.')
+    rolling_window: Optional[int] = Field(default=30, description='Window in seconds of the rolling averages.')
+    processes: Optional[int] = Field(default=None, description='Analyse on this many worker processes; worthwhile for large batches.')
+
+class GetActivityAnalyticsResponse(ActionResponse):
+    success: bool = Field(..., description='Whether every activity was analysed.')
+    analytics: dict = Field(..., description='Power curve, best efforts, rolling averages, time in zones and elevation per activity id, or the error message.')
+    errors: dict = Field(default_factory=dict, description='The error of each activity whose streams could not be fetched.')
+
+class GetActivityAnalytics(HttpAction):
+    """
+    Summarise the streams of one or more activities instead of returning
+    them: mean-max power curve, best efforts over standard distances,
+    rolling averages, time in the athlete's zones and smoothed elevation.
+    Streams are fetched concurrently and analysed with NumPy.
+
+    Set `archive_root` to read streams from a local `StreamArchive` in that
+    directory and add fetched ones to it; the directory is deployment
+    configuration, never taken from the request.
+    """
+    max_concurrency = 8
+    archive_root: Optional[str] = None
+
+    @property
+    def display_name(self) -> str:
+        return 'Get Activity Analytics'
+    
+    @property
+    def request_schema(self) -> Type[BaseModel]:
+        return GetActivityAnalyticsRequest
+    
+    @property
+    def response_schema(self) -> Type[BaseModel]:
+        return GetActivityAnalyticsResponse
+
+    def archive(self) -> Optional[StreamArchive]:
+        return shared_archive(self.archive_root) if self.archive_root else None
+
+    def _calls(self, request: GetActivityAnalyticsRequest, archive: Optional[StreamArchive]) -> tuple:
+        archived, calls = {}, []
+        for activity_id in request.activity_ids:
+            streams = archive.get(activity_id, ANALYTICS_STREAMS.split(',')) if archive else None
+            if streams is not None:
+                archived[str(activity_id)] = streams
+            else:
+                calls.append((GetStreams, GetStreamsRequest(activity_id=activity_id, stream_types=ANALYTICS_STREAMS, compact=True)))
+        return archived, calls
+
+    def _summarise(
+        self,
+        request: GetActivityAnalyticsRequest,
+        zones: GetAthleteZonesResponse,
+        archive: Optional[StreamArchive],
+        archived: dict,
+        results: List[BatchResult],
+    ) -> GetActivityAnalyticsResponse:
+        options = AnalyticsOptions(rolling_window=request.rolling_window or 30)
+        if request.durations:
+            options.durations = request.durations
+        if request.distances:
+            options.distances = request.distances
+        fetched = {activity_id: {stream_type: stream.samples for stream_type, stream in streams.items()} for activity_id, streams in archived.items()}
+        errors = {}
+        for result in results:
+            activity_id = str(result.request.activity_id)
+            if result.error is not None:
+                errors[activity_id] = str(result.error)
+            elif not result.response.success:
+                errors[activity_id] = result.response.streams
+            else:
+                if archive is not None:
+                    archive.put(activity_id, result.response.streams, ANALYTICS_STREAMS.split(','))
+                fetched[activity_id] = {stream_type: stream.samples for stream_type, stream in result.response.streams.items()}
+        summaries = analyse_many(list(fetched.values()), zones.zones if zones.success else None, options, request.processes)
+        projection = self.projection(request)
+        if projection is not None:
+            summaries = [projection.apply(summary) for summary in summaries]
+        return GetActivityAnalyticsResponse(success=not errors, analytics=dict(zip(fetched, summaries)), errors=errors)
+
+    def _unavailable(self) -> Optional[GetActivityAnalyticsResponse]:
+        try:
+            require_numpy()
+        except ImportError as error:
+            return GetActivityAnalyticsResponse(success=False, analytics={'message': str(error)})
+        return None
+
+    def execute(self, request: GetActivityAnalyticsRequest, authorisation_data: dict) -> GetActivityAnalyticsResponse:
+        unavailable = self._unavailable()
+        if unavailable is not None:
+            return unavailable
+        zones = self.sibling(GetAthleteZones).execute(GetAthleteZonesRequest(), authorisation_data)
+        streams = self.sibling(GetStreams)
+        archive = self.archive()
+        archived, calls = self._calls(request, archive)
+        results = run_batch(
+            calls,
+            lambda action, streams_request: streams.execute(streams_request, authorisation_data),
+            self.max_concurrency,
+        )
+        return self._summarise(request, zones, archive, archived, results)
+
+    async def aexecute(self, request: GetActivityAnalyticsRequest, authorisation_data: dict) -> GetActivityAnalyticsResponse:
+        unavailable = self._unavailable()
+        if unavailable is not None:
+            return unavailable
+        zones = await self.sibling(GetAthleteZones).aexecute(GetAthleteZonesRequest(), authorisation_data)
+        streams = self.sibling(GetStreams)
+        archive = self.archive()
+        archived, calls = self._calls(request, archive)
+        results = await arun_batch(
+            calls,
+            lambda action, streams_request: streams.aexecute(streams_request, authorisation_data),
+            self.max_concurrency,
+        )
+        # The analysis is CPU-bound; keep it off the event loop.
+        return await asyncio.get_running_loop().run_in_executor(None, self._summarise, request, zones, archive, archived, results)
+
+
+# BuildHeatmap action
+class BuildHeatmapRequest(ActionRequest):
+    name: Optional[str] = Field(default='default', description='Name of the heatmap to extend; created if missing.')
+    activity_ids: Optional[List[int]] = Field(default=None, description='Activities to fetch and add.')
+    polylines: Optional[Dict[str, str]] = Field(default=None, description='Encoded polylines to add directly, keyed by activity id, e.g. from a listing.')
+    source: Optional[str] = Field(default='polyline', description='Track fetched for `activity_ids`: polyline (from the activity) or streams (full-resolution latlng).')
+    zoom: Optional[int] = Field(default=heatmap.DEFAULT_ZOOM, description='Web-mercator zoom level of the tiles.')
+    tile_format: Optional[str] = Field(default='png', description='Tile files to write: png or npy.')
+
+class BuildHeatmapResponse(ActionResponse):
+    success: bool = Field(..., description='Whether every activity was added.')
+    heatmap: dict = Field(..., description='Directory, zoom and counts of activities added and tiles written, or the error message.')
+    errors: dict = Field(default_factory=dict, description='The error of each activity whose track could not be fetched.')
+
+class BuildHeatmap(HttpAction):
+    """
+    Rasterize activity tracks into web-mercator heatmap tiles on local disk.
+    Activities already in the heatmap are skipped without being fetched, and
+    only the tiles a new track crosses are rewritten.
+
+    Heatmaps are kept in named directories under `heatmap_root`, which the
+    deployment configures; without it the action fails without fetching.
+    """
+    max_concurrency = 8
+    heatmap_root: Optional[str] = None
+
+    @property
+    def display_name(self) -> str:
+        return 'Build Heatmap'
+    
+    @property
+    def request_schema(self) -> Type[BaseModel]:
+        return BuildHeatmapRequest
+    
+    @property
+    def response_schema(self) -> Type[BaseModel]:
+        return BuildHeatmapResponse
+
+    def _directory(self, request: BuildHeatmapRequest) -> str:
+        if not self.heatmap_root:
+            raise ValueError('no heatmap directory is configured')
+        heatmap.require_numpy()
+        return heatmap.named_directory(self.heatmap_root, request.name or 'default')
+
+    def _failed(self, error: Exception, errors: Optional[dict] = None) -> BuildHeatmapResponse:
+        return BuildHeatmapResponse(success=False, heatmap={'message': str(error)}, errors=errors or {})
+
+    def _calls(self, request: BuildHeatmapRequest, directory: str) -> list:
+        known = heatmap.known_activities(directory)
+        activity_ids = [activity_id for activity_id in request.activity_ids or [] if str(activity_id) not in known]
+        if request.source == 'streams':
+            return [(GetStreams, GetStreamsRequest(activity_id=activity_id, stream_types='latlng', compact=True)) for activity_id in activity_ids]
+        return [(GetActivity, GetActivityRequest(activity_id=activity_id, fields='id,map')) for activity_id in activity_ids]
+
+    def _build(self, request: BuildHeatmapRequest, directory: str, results: List[BatchResult]) -> BuildHeatmapResponse:
+        tracks = {activity_id: decode(polyline) for activity_id, polyline in (request.polylines or {}).items()}
+        errors = {}
+        for result in results:
+            activity_id = str(result.request.activity_id)
+            if result.error is not None:
+                errors[activity_id] = str(result.error)
+            elif isinstance(result.response, GetStreamsResponse):
+                if not result.response.success:
+                    errors[activity_id] = result.response.streams
+                    continue
+                latlng = result.response.streams.get('latlng')
+                tracks[activity_id] = [] if latlng is None else latlng.samples
+            elif not result.response.success:
+                errors[activity_id] = result.response.activity
+            else:
+                tracks[activity_id] = decode(polyline_of(result.response.activity))
+        try:
+            summary = heatmap.build(directory, tracks, request.zoom, (request.tile_format,))
+        except ValueError as error:
+            # e.g. the heatmap already holds tiles of another zoom level.
+            return self._failed(error, errors)
+        projection = self.projection(request)
+        if projection is not None:
+            summary = projection.apply(summary)
+        return BuildHeatmapResponse(success=not errors, heatmap=summary, errors=errors)
+
+    def execute(self, request: BuildHeatmapRequest, authorisation_data: dict) -> BuildHeatmapResponse:
+        try:
+            directory = self._directory(request)
+        except (ValueError, ImportError) as error:
+            return self._failed(error)
+        results = run_batch(
+            self._calls(request, directory),
+            lambda action, call_request: self.sibling(action).execute(call_request, authorisation_data),
+            self.max_concurrency,
+        )
+        return self._build(request, directory, results)
+
+    async def aexecute(self, request: BuildHeatmapRequest, authorisation_data: dict) -> BuildHeatmapResponse:
+        try:
+            directory = self._directory(request)
+        except (ValueError, ImportError) as error:
+            return self._failed(error)
+        results = await arun_batch(
+            self._calls(request, directory),
+            lambda action, call_request: self.sibling(action).aexecute(call_request, authorisation_data),
+            self.max_concurrency,
+        )
+        # Rasterizing and writing tiles is CPU and disk work; keep it off the event loop.
+        return await asyncio.get_running_loop().run_in_executor(None, self._build, request, directory, results)
+
+
+# GetActivityBundle action
+BundlePart = Literal['activity', 'laps', 'zones', 'streams', 'comments', 'kudoers']
+BUNDLE_PARTS = list(get_args(BundlePart))
+BUNDLE_STREAMS = 'time,distance,latlng,altitude,velocity_smooth,heartrate,cadence,watts'
+
+class GetActivityBundleRequest(ActionRequest):
+    activity_id: int = Field(..., description='The id of the activity.')
+    parts: Optional[List[BundlePart]] = Field(default=None, description='Parts to include: activity, laps, zones, streams, comments, kudoers. Defaults to all.')
+    stream_types: Optional[str] = Field(default=BUNDLE_STREAMS, description='Stream types of the streams part.')
+    max_points: Optional[int] = Field(default=None, ge=2, description='Downsample the streams part to at most this many points per stream (at least 2).')
+
+class GetActivityBundleResponse(ActionResponse):
+    success: bool = Field(..., description='Whether every requested part was fetched.')
+    bundle: dict = Field(..., description='Each requested part keyed by name.')
+    errors: dict = Field(default_factory=dict, description='The error of each part that could not be fetched.')
+
+class GetActivityBundle(HttpAction):
+    """
+    Fetch an activity together with its laps, zones, streams, comments and
+    kudoers in one call. The parts are requested concurrently through the
+    shared transport, so the call takes about as long as the slowest part
+    and still respects the rate limiter.
+    """
+
+    @property
+    def display_name(self) -> str:
+        return 'Get Activity Bundle'
+    
+    @property
+    def request_schema(self) -> Type[BaseModel]:
+        return GetActivityBundleRequest
+    
+    @property
+    def response_schema(self) -> Type[BaseModel]:
+        return GetActivityBundleResponse
+
+    def _calls(self, request: GetActivityBundleRequest) -> list:
+        activity_id = request.activity_id
+        calls = {
+            'activity': (GetActivity, GetActivityRequest(activity_id=activity_id)),
+            'laps': (ListActivityLaps, ListActivityLapsRequest(activity_id=activity_id)),
+            'zones': (GetActivityZones, GetActivityZonesRequest(activity_id=activity_id)),
+            'streams': (GetStreams, GetStreamsRequest(activity_id=activity_id, stream_types=request.stream_types or BUNDLE_STREAMS, max_points=request.max_points)),
+            'comments': (ListActivityComments, ListActivityCommentsRequest(activity_id=activity_id, auto_paginate=True)),
+            'kudoers': (ListActivityKudoers, ListActivityKudoersRequest(activity_id=activity_id, auto_paginate=True)),
+        }
+        return [(part, calls[part]) for part in request.parts or BUNDLE_PARTS]
+
+    def _merge(self, request: GetActivityBundleRequest, parts: List[str], results: List[BatchResult]) -> GetActivityBundleResponse:
+        bundle, errors = {}, {}
+        for part, result in zip(parts, results):
+            if result.error is not None:
+                errors[part] = str(result.error)
+                continue
+            # Every part's response has `success` plus exactly one payload field.
+            payload = next(value for name, value in result.response if name != 'success')
+            if result.response.success:
+                bundle[part] = payload
+            else:
+                errors[part] = payload
+        projection = self.projection(request)
+        if projection is not None:
+            bundle = projection.apply(bundle)
+        return GetActivityBundleResponse(success=not errors, bundle=bundle, errors=errors)
+
+    def execute(self, request: GetActivityBundleRequest, authorisation_data: dict) -> GetActivityBundleResponse:
+        parts, calls = zip(*self._calls(request))
+        results = run_batch(
+            calls,
+            lambda action, part_request: self.sibling(action).execute(part_request, authorisation_data),
+            len(calls),
+        )
+        return self._merge(request, parts, results)
+
+    async def aexecute(self, request: GetActivityBundleRequest, authorisation_data: dict) -> GetActivityBundleResponse:
+        parts, calls = zip(*self._calls(request))
+        results = await arun_batch(
+            calls,
+            lambda action, part_request: self.sibling(action).aexecute(part_request, authorisation_data),
+            len(calls),
+        )
+        return self._merge(request, parts, results)
+
+
+class Strava(HttpTool):
+    host_pool_sizes = {'www.strava.com': 32}
+    max_concurrency = 8
+
+    @classmethod
+    def create_token_manager(cls) -> Optional[StravaTokenManager]:
+        return StravaTokenManager.from_environment(cls.transport, cls.async_transport)
+
     def actions(self) -> list:
-        return [
+        return self.bind([
             GetActivity,
             GetAthlete,
             GetAthleteStats,
@@ -849,7 +1450,11 @@ class Strava(Tool):
             ListClubMembers,
             UpdateAthlete,
             ListAthleteRoutes,
-        ]
+            ListAthleteActivities,
+            GetActivityAnalytics,
+            BuildHeatmap,
+            GetActivityBundle,
+        ])
     
     def triggers(self) -> list:
         return []
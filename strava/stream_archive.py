@@ -0,0 +1,222 @@
+"""
+On-disk archive of activity streams, read back through `mmap`.
+"""
+import json
+import mmap
+import os
+import shutil
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Union
+
+from strava.streams import Stream, StreamSet
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+META = 'meta.json'
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def _write(path: str, data: bytes) -> None:
+    with open(path + '.tmp', 'wb') as handle:
+        handle.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def _directory_size(directory: str) -> int:
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+    except FileNotFoundError:
+        return 0
+
+
+_shared: Dict[str, 'StreamArchive'] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_archive(root: str) -> 'StreamArchive':
+    """
+    One `StreamArchive` per root for the whole process, so its in-memory
+    index is built once rather than on every use.
+    """
+    with _shared_lock:
+        archive = _shared.get(root)
+        if archive is None:
+            archive = _shared[root] = StreamArchive(root)
+        return archive
+
+
+def _read_column(path: str, typecode: str, stream_type: str):
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            column = array(typecode)
+        else:
+            column = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    if numpy is None:
+        if not isinstance(column, mmap.mmap):
+            return column
+        try:
+            return array(typecode, column.read())
+        finally:
+            column.close()
+    # Zero-copy: the array is a read-only view of the page cache, shared by
+    # every process that maps the same file.
+    samples = numpy.frombuffer(column, dtype=typecode)
+    return samples.reshape(-1, 2) if stream_type == 'latlng' else samples
+
+
+class StreamArchive:
+    """
+    Activity streams stored as one raw typed column per stream under
+    `root/<activity_id>/<stream_type>.bin` (plus `.indices.bin` for
+    downsampled streams), with the metadata in `meta.json`.
+
+    `get` maps the columns read-only, so worker processes reading the same
+    activity share one copy in the page cache instead of each parsing JSON.
+    Files are replaced atomically, which keeps existing mappings valid.
+    Once the archive grows past `max_bytes`, `put` evicts the least recently
+    read activities.
+
+    The size of each activity is kept in memory, in least recently used
+    order, so `put` and `get` never walk the whole archive. The index is
+    built from a full scan on first use and rebuilt before evicting, which
+    picks up changes made by other processes.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._index: Optional[OrderedDict] = None
+        self._total = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _directory(self, activity_id) -> str:
+        return os.path.join(self.root, str(activity_id))
+
+    def _meta(self, activity_id) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._directory(activity_id), META)) as handle:
+                return json.load(handle)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, activity_id, streams: Union[StreamSet, dict, list], requested: Iterable[str] = ()) -> None:
+        """
+        Store an activity's streams. `requested` names stream types that
+        were asked for, so that types the activity lacks also count as hits.
+        """
+        if not isinstance(streams, StreamSet):
+            streams = StreamSet.from_json(streams)
+        directory = self._directory(activity_id)
+        os.makedirs(directory, exist_ok=True)
+        meta = self._meta(activity_id) or {'requested': [], 'streams': {}}
+        for stream_type, stream in streams.items():
+            samples = stream.samples
+            typecode = samples.typecode if isinstance(samples, array) else samples.dtype.char
+            _write(os.path.join(directory, f'{stream_type}.bin'), samples.tobytes())
+            meta['streams'][stream_type] = {
+                'typecode': typecode,
+                'series_type': stream.series_type,
+                'original_size': stream.original_size,
+                'resolution': stream.resolution,
+                'indices': stream.indices is not None,
+            }
+            if stream.indices is not None:
+                _write(os.path.join(directory, f'{stream_type}.indices.bin'), array('I', stream.indices.tolist()).tobytes())
+        meta['requested'] = sorted(set(meta['requested']) | set(requested) | set(streams))
+        _write(os.path.join(directory, META), json.dumps(meta).encode())
+        size = _directory_size(directory)
+        with self._lock:
+            index = self._loaded()
+            self._total += size - index.pop(str(activity_id), 0)
+            index[str(activity_id)] = size
+            full = self._total > self.max_bytes
+        if full:
+            self.evict()
+
+    def get(self, activity_id, stream_types: Optional[Iterable[str]] = None) -> Optional[StreamSet]:
+        """
+        The archived streams of an activity, or None unless every one of
+        `stream_types` was archived.
+        """
+        meta = self._meta(activity_id)
+        if meta is None:
+            return None
+        stream_types = list(meta['streams']) if stream_types is None else list(stream_types)
+        if not set(stream_types) <= set(meta['requested']):
+            return None
+        directory = self._directory(activity_id)
+        streams = {}
+        try:
+            for stream_type in stream_types:
+                column = meta['streams'].get(stream_type)
+                if column is None:
+                    continue
+                samples = _read_column(os.path.join(directory, f'{stream_type}.bin'), column['typecode'], stream_type)
+                indices = None
+                if column.get('indices'):
+                    indices = _read_column(os.path.join(directory, f'{stream_type}.indices.bin'), 'I', 'indices')
+                streams[stream_type] = Stream(stream_type, samples, column['series_type'], column['original_size'], column['resolution'], indices)
+            os.utime(os.path.join(directory, META))
+        except FileNotFoundError:
+            # Evicted by another process while we were reading.
+            return None
+        with self._lock:
+            if self._index is not None and str(activity_id) in self._index:
+                self._index.move_to_end(str(activity_id))
+        return StreamSet(streams)
+
+    def delete(self, activity_id) -> None:
+        shutil.rmtree(self._directory(activity_id), ignore_errors=True)
+        with self._lock:
+            if self._index is not None:
+                self._total -= self._index.pop(str(activity_id), 0)
+
+    def activities(self) -> List[str]:
+        return [entry.name for entry in os.scandir(self.root) if entry.is_dir()]
+
+    def _usage(self) -> list:
+        usage = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            try:
+                files = list(os.scandir(entry.path))
+                used = max(file.stat().st_mtime for file in files if file.name == META)
+                size = sum(file.stat().st_size for file in files)
+            except (FileNotFoundError, ValueError):
+                continue
+            usage.append((used, size, entry.name))
+        return usage
+
+    def _rescan(self) -> OrderedDict:
+        usage = sorted(self._usage())
+        self._index = OrderedDict((activity_id, size) for _, size, activity_id in usage)
+        self._total = sum(self._index.values())
+        return self._index
+
+    def _loaded(self) -> OrderedDict:
+        return self._rescan() if self._index is None else self._index
+
+    def size(self) -> int:
+        with self._lock:
+            self._loaded()
+            return self._total
+
+    def evict(self) -> int:
+        """
+        Delete least recently read activities until the archive fits in
+        `max_bytes`; returns how many were removed.
+        """
+        with self._lock:
+            index = self._rescan()
+            removed = 0
+            while self._total > self.max_bytes and index:
+                self.delete(next(iter(index)))
+                removed += 1
+            return removed
@@ -0,0 +1,172 @@
+"""
+Compact, array-backed Strava activity streams.
+"""
+from array import array
+from typing import Any, Dict, Iterator, Mapping, Optional, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Narrowest array type that holds each stream without loss. `latlng` is
+# stored flat as lat, lng, lat, lng, ...
+STREAM_TYPECODES = {
+    'time': 'I',
+    'distance': 'd',
+    'latlng': 'd',
+    'altitude': 'd',
+    'velocity_smooth': 'd',
+    'heartrate': 'H',
+    'cadence': 'H',
+    'watts': 'H',
+    'temp': 'h',
+    'moving': 'B',
+    'grade_smooth': 'd',
+}
+FALLBACK_TYPECODE = 'd'
+
+Samples = Union[array, 'numpy.ndarray']
+
+
+def _flatten(data: list) -> list:
+    return [coordinate for point in data for coordinate in point]
+
+
+def to_samples(stream_type: str, data: list, use_numpy: bool) -> Samples:
+    """
+    Pack one stream's JSON samples into a typed array. Streams with gaps or
+    values that do not fit the expected type fall back to doubles, with
+    gaps as NaN.
+    """
+    typecode = STREAM_TYPECODES.get(stream_type, FALLBACK_TYPECODE)
+    values = _flatten(data) if stream_type == 'latlng' else data
+    try:
+        samples = array(typecode, values)
+    except (TypeError, OverflowError):
+        samples = array(FALLBACK_TYPECODE, [float('nan') if value is None else value for value in values])
+    if not use_numpy:
+        return samples
+    samples = numpy.frombuffer(samples, dtype=samples.typecode)
+    return samples.reshape(-1, 2) if stream_type == 'latlng' else samples
+
+
+class Stream:
+    """
+    One stream's samples in a typed array plus Strava's stream metadata.
+
+    `samples` is a NumPy array when NumPy is used (`latlng` shaped `(n, 2)`)
+    and an `array.array` otherwise (`latlng` flattened). Downsampled streams
+    keep the original position of each sample in `indices`.
+    """
+    __slots__ = ('type', 'samples', 'series_type', 'original_size', 'resolution', 'indices')
+
+    def __init__(
+        self,
+        type: str,
+        samples: Samples,
+        series_type: Optional[str] = None,
+        original_size: Optional[int] = None,
+        resolution: Optional[str] = None,
+        indices: Optional[Samples] = None,
+    ):
+        self.type = type
+        self.samples = samples
+        self.series_type = series_type
+        self.original_size = original_size
+        self.resolution = resolution
+        self.indices = indices
+
+    def __len__(self) -> int:
+        if self.type == 'latlng' and isinstance(self.samples, array):
+            return len(self.samples) // 2
+        return len(self.samples)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            samples.itemsize * len(samples) if isinstance(samples, array) else samples.nbytes
+            for samples in (self.samples, self.indices)
+            if samples is not None
+        )
+
+    def tolist(self) -> list:
+        values = self.samples.tolist()
+        if self.type != 'latlng':
+            return values
+        if isinstance(self.samples, array):
+            return [values[index:index + 2] for index in range(0, len(values), 2)]
+        return values
+
+    def to_json(self) -> dict:
+        stream = {'data': self.tolist()}
+        for key in ('series_type', 'original_size', 'resolution'):
+            value = getattr(self, key)
+            if value is not None:
+                stream[key] = value
+        if self.indices is not None:
+            stream['indices'] = self.indices.tolist()
+        return stream
+
+
+class StreamSet(Mapping[str, Stream]):
+    """
+    An activity's streams keyed by type, each held as a typed array instead
+    of a list of boxed numbers, typically 5-10x smaller in memory.
+
+    `to_json()` materialises Strava's `key_by_type` shape on demand; nothing
+    is cached, so the compact form stays the only resident copy.
+    """
+
+    def __init__(self, streams: Dict[str, Stream]):
+        self._streams = streams
+
+    @classmethod
+    def from_json(cls, payload: Union[list, dict], use_numpy: Optional[bool] = None) -> 'StreamSet':
+        """
+        Build from a `GetStreams` payload, keyed by type or not. NumPy is
+        used when installed unless `use_numpy` says otherwise.
+        """
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        items = payload.items() if isinstance(payload, dict) else ((stream['type'], stream) for stream in payload)
+        streams = {}
+        for stream_type, stream in items:
+            indices = stream.get('indices')
+            streams[stream_type] = Stream(
+                stream_type,
+                to_samples(stream_type, stream.get('data') or [], use_numpy),
+                stream.get('series_type'),
+                stream.get('original_size'),
+                stream.get('resolution'),
+                None if indices is None else to_samples('time', indices, use_numpy),
+            )
+        return cls(streams)
+
+    def __getitem__(self, stream_type: str) -> Stream:
+        return self._streams[stream_type]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._streams)
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def __repr__(self) -> str:
+        sizes = ', '.join(f'{stream_type}[{len(stream)}]' for stream_type, stream in self._streams.items())
+        return f'StreamSet({sizes})'
+
+    @property
+    def nbytes(self) -> int:
+        return sum(stream.nbytes for stream in self._streams.values())
+
+    def to_json(self) -> Dict[str, Any]:
+        return {stream_type: stream.to_json() for stream_type, stream in self._streams.items()}
+
+
+def streams_to_json(streams: Union[StreamSet, dict]) -> dict:
+    """
+    JSON view of a `GetStreamsResponse.streams` value in either mode.
+    """
+    return streams.to_json() if isinstance(streams, StreamSet) else streams
+
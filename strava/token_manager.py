@@ -0,0 +1,191 @@
+"""
+Proactive OAuth token refresh for Strava connections.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from common import AsyncHttpTransport, HttpRequest, HttpTransport, SingleFlight, TokenManager, UpstreamError
+
+STRAVA_TOKEN_URL = 'https://www.strava.com/api/v3/oauth/token'
+# Refresh this many seconds before `expires_at`; Strava access tokens live six hours.
+DEFAULT_REFRESH_MARGIN = 300
+# Connections whose latest token is remembered; the least recently used are forgotten.
+DEFAULT_MAX_CONNECTIONS = 10000
+
+
+@dataclass
+class StravaToken:
+    access_token: str
+    refresh_token: str
+    expires_at: float
+
+
+class StravaTokenManager(TokenManager):
+    """
+    Hands actions a bearer token that is valid for at least `refresh_margin`
+    more seconds.
+
+    Reads `access_token`, `refresh_token` and `expires_at` (the integration's
+    `token_response_metadata`) from the authorisation data and refreshes the
+    token shortly before it expires, so no call pays a 401 round trip first.
+    Concurrent callers on the same connection share one refresh. Strava
+    rotates refresh tokens; `on_refresh(connection_id, token)` lets the host
+    persist the new pair. Authorisation data without the metadata is passed
+    through untouched, and if a refresh fails the call goes ahead with the
+    supplied token. Tokens of at most `max_connections` recently used
+    connections are kept; a forgotten one is picked up again from the next
+    authorisation data that carries it.
+
+    Needs the app's OAuth client credentials; `from_environment` builds a
+    manager only when `STRAVA_CLIENT_ID` and `STRAVA_CLIENT_SECRET` are set.
+    """
+
+    def __init__(
+        self,
+        transport: HttpTransport,
+        async_transport: AsyncHttpTransport,
+        client_id: str,
+        client_secret: str,
+        refresh_margin: float = DEFAULT_REFRESH_MARGIN,
+        on_refresh: Optional[Callable[[str, StravaToken], None]] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    ):
+        if not (client_id and client_secret):
+            raise ValueError('refreshing Strava tokens needs a client id and secret')
+        self.transport = transport
+        self.async_transport = async_transport
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.on_refresh = on_refresh
+        self.max_connections = max_connections
+        self._tokens: 'OrderedDict[str, StravaToken]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshes = SingleFlight()
+
+    @classmethod
+    def from_environment(cls, transport: HttpTransport, async_transport: AsyncHttpTransport, **kwargs) -> Optional['StravaTokenManager']:
+        """
+        A manager using the client credentials in the environment, or None
+        when they are not configured.
+        """
+        client_id, client_secret = os.environ.get('STRAVA_CLIENT_ID'), os.environ.get('STRAVA_CLIENT_SECRET')
+        if not (client_id and client_secret):
+            return None
+        return cls(transport, async_transport, client_id, client_secret, **kwargs)
+
+    @staticmethod
+    def connection_id(authorisation_data: dict) -> str:
+        connection_id = authorisation_data.get('connection_id')
+        if connection_id:
+            return str(connection_id)
+        # The first refresh token seen identifies the connection even after Strava rotates it.
+        return hashlib.sha256(authorisation_data['refresh_token'].encode()).hexdigest()
+
+    def _current(self, connection_id: str, authorisation_data: dict) -> StravaToken:
+        supplied = StravaToken(
+            authorisation_data['access_token'],
+            authorisation_data['refresh_token'],
+            float(authorisation_data['expires_at']),
+        )
+        with self._lock:
+            known = self._tokens.get(connection_id)
+            if known is None or supplied.expires_at > known.expires_at:
+                known = supplied
+            self._remember(connection_id, known)
+            return known
+
+    def _remember(self, connection_id: str, token: StravaToken) -> None:
+        # Callers hold `_lock`.
+        self._tokens[connection_id] = token
+        self._tokens.move_to_end(connection_id)
+        while len(self._tokens) > self.max_connections:
+            self._tokens.popitem(last=False)
+
+    def _due(self, token: StravaToken) -> bool:
+        return token.expires_at - time.time() <= self.refresh_margin
+
+    def _refresh_request(self, token: StravaToken) -> HttpRequest:
+        return HttpRequest('POST', STRAVA_TOKEN_URL, json={
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'grant_type': 'refresh_token',
+            'refresh_token': token.refresh_token,
+        })
+
+    def _store(self, connection_id: str, response) -> StravaToken:
+        response_json = response.json()
+        if response.status_code != 200:
+            raise UpstreamError(response.status_code, response_json)
+        token = StravaToken(
+            response_json['access_token'],
+            response_json['refresh_token'],
+            float(response_json['expires_at']),
+        )
+        with self._lock:
+            self._remember(connection_id, token)
+        if self.on_refresh is not None:
+            self.on_refresh(connection_id, token)
+        return token
+
+    @staticmethod
+    def _with_token(authorisation_data: dict, token: StravaToken) -> dict:
+        headers = {**authorisation_data.get('headers', {}), 'Authorization': f'Bearer {token.access_token}'}
+        return {
+            **authorisation_data,
+            'headers': headers,
+            'access_token': token.access_token,
+            'refresh_token': token.refresh_token,
+            'expires_at': token.expires_at,
+        }
+
+    def _has_metadata(self, authorisation_data: dict) -> bool:
+        return all(authorisation_data.get(key) for key in ('access_token', 'refresh_token', 'expires_at'))
+
+    def authorise(self, authorisation_data: dict) -> dict:
+        """
+        Authorisation data carrying a token that will not expire mid-call.
+        """
+        if not self._has_metadata(authorisation_data):
+            return authorisation_data
+        connection_id = self.connection_id(authorisation_data)
+        token = self._current(connection_id, authorisation_data)
+        if self._due(token):
+            def refresh() -> StravaToken:
+                current = self._current(connection_id, authorisation_data)
+                if not self._due(current):
+                    return current
+                return self._store(connection_id, self.transport.send(self._refresh_request(current)))
+
+            try:
+                token = self._refreshes.do(connection_id, refresh)
+            except Exception:
+                # A failed refresh must not fail the call; the supplied token may still be good.
+                pass
+        return self._with_token(authorisation_data, token)
+
+    async def aauthorise(self, authorisation_data: dict) -> dict:
+        """
+        asyncio counterpart of `authorise`.
+        """
+        if not self._has_metadata(authorisation_data):
+            return authorisation_data
+        connection_id = self.connection_id(authorisation_data)
+        token = self._current(connection_id, authorisation_data)
+        if self._due(token):
+            async def refresh() -> StravaToken:
+                current = self._current(connection_id, authorisation_data)
+                if not self._due(current):
+                    return current
+                return self._store(connection_id, await self.async_transport.send(self._refresh_request(current)))
+
+            try:
+                token = await self._refreshes.ado(connection_id, refresh)
+            except Exception:
+                pass
+        return self._with_token(authorisation_data, token)
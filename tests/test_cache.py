@@ -0,0 +1,168 @@
+import json
+
+from common.cache import CachedHeaders, ResponseCache
+from common.http import HttpRequest
+from common.transport import HttpTransport
+
+APPS = "https://api.heroku.com/apps"
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.content = b"" if body is None else json.dumps(body).encode()
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeTransport(HttpTransport):
+    """
+    Transport answering from a queue of canned responses and recording
+    every request that reached the "provider".
+    """
+
+    def __init__(self, *responses, **kwargs):
+        super().__init__(**kwargs)
+        self.responses = list(responses)
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append((method, url, kwargs))
+        return self.responses.pop(0)
+
+
+def get(url=APPS, token="a", ttl=60.0, **kwargs):
+    return HttpRequest("GET", url, headers={"Authorization": f"Bearer {token}"}, cache_ttl=ttl, **kwargs)
+
+
+def expire(cache):
+    for entry in cache._entries.values():
+        entry.expires_at = 0.0
+
+
+def test_fresh_entry_is_served_without_a_call():
+    cache = ResponseCache()
+    transport = FakeTransport(FakeResponse(body=[{"name": "web"}]), cache=cache)
+    assert transport.send(get()).json() == [{"name": "web"}]
+    assert transport.send(get()).json() == [{"name": "web"}]
+    assert len(transport.sent) == 1
+
+
+def test_entries_are_per_credential_query_and_range():
+    cache = ResponseCache()
+    transport = FakeTransport(*[FakeResponse(body=[n]) for n in range(4)], cache=cache)
+    transport.send(get())
+    transport.send(get(token="b"))
+    transport.send(get(params={"page": 2}))
+    transport.send(HttpRequest("GET", APPS, headers={"Authorization": "Bearer a", "Range": "id ..; max=10"}, cache_ttl=60))
+    transport.send(get())
+    assert len(transport.sent) == 4
+
+
+def test_requests_without_ttl_and_errors_are_not_cached():
+    cache = ResponseCache()
+    transport = FakeTransport(FakeResponse(body=[]), FakeResponse(404, {"id": "not_found"}), FakeResponse(body=[]), cache=cache)
+    transport.send(get(ttl=None))
+    transport.send(get())
+    transport.send(get())
+    assert len(transport.sent) == 3
+
+
+def test_stale_entry_is_revalidated_and_renewed_by_304():
+    cache = ResponseCache()
+    transport = FakeTransport(
+        FakeResponse(body=[1], headers={"ETag": '"v1"', "Last-Modified": "Fri, 01 Mar 2024 12:00:00 GMT"}),
+        FakeResponse(304),
+        cache=cache,
+    )
+    transport.send(get())
+    expire(cache)
+    assert transport.send(get()).json() == [1]
+    headers = transport.sent[1][2]["headers"]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "Fri, 01 Mar 2024 12:00:00 GMT"
+    # Renewed: the next call is a plain hit.
+    assert transport.send(get()).json() == [1]
+    assert len(transport.sent) == 2
+
+
+def test_stale_entry_is_replaced_by_a_changed_answer():
+    cache = ResponseCache()
+    transport = FakeTransport(FakeResponse(body=[1], headers={"ETag": '"v1"'}), FakeResponse(body=[2], headers={"ETag": '"v2"'}), cache=cache)
+    transport.send(get())
+    expire(cache)
+    assert transport.send(get()).json() == [2]
+    assert transport.send(get()).json() == [2]
+    assert len(transport.sent) == 2
+
+
+def test_stale_entry_without_validators_is_fetched_unconditionally():
+    cache = ResponseCache()
+    transport = FakeTransport(FakeResponse(body=[1]), FakeResponse(body=[2]), cache=cache)
+    transport.send(get())
+    expire(cache)
+    transport.send(get())
+    assert "If-None-Match" not in transport.sent[1][2]["headers"]
+
+
+def test_successful_write_invalidates_related_entries_of_the_same_credential():
+    cache = ResponseCache()
+    transport = FakeTransport(*[FakeResponse(body=[n]) for n in range(4)], FakeResponse(body={}), cache=cache)
+    transport.send(get(APPS))
+    transport.send(get(APPS + "/web"))
+    transport.send(get(APPS + "/web/releases"))
+    transport.send(get(APPS + "/web", token="b"))
+    transport.send(HttpRequest("PATCH", APPS + "/web", headers={"Authorization": "Bearer a"}, json={"maintenance": True}))
+    # Only the other credential's entry survives.
+    (kept,) = cache._entries
+    assert kept == ResponseCache.key(get(APPS + "/web", token="b"))
+
+
+def test_failed_write_keeps_the_cache():
+    cache = ResponseCache()
+    transport = FakeTransport(FakeResponse(body=[1]), FakeResponse(422, {"id": "invalid_params"}), cache=cache)
+    transport.send(get())
+    transport.send(HttpRequest("POST", APPS, headers={"Authorization": "Bearer a"}, json={}))
+    assert len(cache._entries) == 1
+
+
+def test_invalidate_does_not_match_sibling_prefixes():
+    cache = ResponseCache()
+    transport = FakeTransport(FakeResponse(body=[1]), cache=cache)
+    transport.send(get(APPS + "/web-2"))
+    assert cache.invalidate(HttpRequest("DELETE", APPS + "/web", headers={"Authorization": "Bearer a"})) == 0
+
+
+def test_lru_eviction_bounded_by_bytes():
+    one = len(json.dumps(["x" * 10]).encode())
+    cache = ResponseCache(max_bytes=2 * one)
+    transport = FakeTransport(*[FakeResponse(body=["x" * 10]) for _ in range(4)], cache=cache)
+    transport.send(get(APPS + "/1"))
+    transport.send(get(APPS + "/2"))
+    transport.send(get(APPS + "/1"))
+    transport.send(get(APPS + "/3"))
+    assert sorted(key[1] for key in cache._entries) == [APPS + "/1", APPS + "/3"]
+    assert cache.size == 2 * one
+
+
+def test_oversized_response_is_not_cached():
+    cache = ResponseCache(max_bytes=4)
+    transport = FakeTransport(FakeResponse(body=["too large"]), cache=cache)
+    transport.send(get())
+    assert cache.size == 0
+
+
+def test_streamed_requests_bypass_the_cache():
+    cache = ResponseCache()
+    transport = FakeTransport(FakeResponse(body=[1]), FakeResponse(body=[1]), cache=cache)
+    transport.send(get(stream=True))
+    transport.send(get(stream=True))
+    assert len(transport.sent) == 2 and cache.size == 0
+
+
+def test_cached_headers_are_case_insensitive():
+    headers = CachedHeaders({"ETag": '"v1"', "Content-Type": "application/json"})
+    assert headers["etag"] == headers.get("ETAG") == '"v1"'
+    assert "content-type" in headers
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from common.hedging import HedgeBudget, Hedger, LatencyTracker
+from common.http import HttpRequest
+from common.resilience import deadline, time_left
+
+DELAY = 0.05
+
+
+class FakeResponse:
+    def __init__(self, attempt):
+        self.attempt = attempt
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+def request():
+    return HttpRequest("GET", "https://api.heroku.com/apps", endpoint="ListApps", hedge=True)
+
+
+def hedger(**kwargs):
+    """
+    A hedger that has learned a DELAY threshold and can afford hedges.
+    """
+    hedger = Hedger(min_samples=1, window=1, min_delay=DELAY, budget_fraction=1.0, **kwargs)
+    hedger._tracker(request()).record(DELAY)
+    hedger.budget.tokens = hedger.budget.max_tokens
+    return hedger
+
+
+class Upstream:
+    """
+    Fake blocking send: attempt ``n`` sleeps ``latencies[n]`` seconds and
+    then answers, or raises if the latency is an exception.
+    """
+
+    def __init__(self, *latencies):
+        self.latencies = latencies
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        with self._lock:
+            attempt = len(self.responses)
+            response = FakeResponse(attempt)
+            self.responses.append(response)
+        latency = self.latencies[attempt]
+        if isinstance(latency, BaseException):
+            raise latency
+        time.sleep(latency)
+        return response
+
+
+def test_tracker_needs_min_samples():
+    tracker = LatencyTracker(window=10)
+    tracker.record(1.0)
+    assert tracker.percentile(0.5, min_samples=2) is None
+    tracker.record(3.0)
+    assert tracker.percentile(0.5, min_samples=2) == 3.0
+
+
+def test_budget_caps_hedges_at_the_fraction():
+    budget = HedgeBudget(fraction=0.5)
+    budget.deposit()
+    assert not budget.spend()
+    budget.deposit()
+    assert budget.spend()
+    assert not budget.spend()
+
+
+def test_no_hedge_until_latencies_are_known():
+    fresh = Hedger(min_samples=5)
+    upstream = Upstream(0.0)
+    assert fresh.call(request(), upstream).attempt == 0
+    assert fresh.hedges_sent == 0
+
+
+def test_fast_first_attempt_sends_no_hedge():
+    hedging = hedger()
+    upstream = Upstream(0.0, 0.0)
+    assert hedging.call(request(), upstream).attempt == 0
+    assert hedging.hedges_sent == 0
+    assert len(upstream.responses) == 1
+
+
+def test_slow_first_attempt_is_overtaken_by_the_hedge():
+    hedging = hedger()
+    upstream = Upstream(1.0, 0.0)
+    started = time.monotonic()
+    response = hedging.call(request(), upstream)
+    assert response.attempt == 1
+    assert time.monotonic() - started < 0.5
+    assert hedging.hedges_sent == 1
+    # The losing first attempt is closed once it finishes.
+    time.sleep(1.0)
+    assert upstream.responses[0].closed
+    assert not response.closed
+
+
+def test_fast_failure_is_not_hedged():
+    hedging = hedger()
+    upstream = Upstream(ConnectionError("reset"), 0.0)
+    with pytest.raises(ConnectionError):
+        hedging.call(request(), upstream)
+    assert hedging.hedges_sent == 0
+
+
+def test_slow_failure_falls_back_on_the_hedge():
+    hedging = hedger()
+    attempts = []
+
+    def send(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            time.sleep(2 * DELAY)
+            raise ConnectionError("reset")
+        time.sleep(4 * DELAY)
+        return FakeResponse(len(attempts) - 1)
+
+    assert hedging.call(request(), send).attempt == 1
+
+
+def test_both_attempts_failing_raises():
+    hedging = hedger()
+
+    def send(request):
+        time.sleep(2 * DELAY)
+        raise TimeoutError("slow and broken")
+
+    with pytest.raises(TimeoutError):
+        hedging.call(request(), send)
+    assert hedging.hedges_sent == 1
+
+
+def test_hedge_delay_excludes_time_queued_for_a_worker():
+    hedging = hedger(max_workers=1)
+    blocker = threading.Event()
+    hedging._pool.submit(blocker.wait)
+    threading.Timer(3 * DELAY, blocker.set).start()
+    upstream = Upstream(0.0, 0.0)
+    # The first attempt waits 3 * DELAY for the only worker but answers at once.
+    assert hedging.call(request(), upstream).attempt == 0
+    assert hedging.hedges_sent == 0
+
+
+def test_attempts_keep_the_callers_deadline():
+    hedging = hedger()
+    seen = []
+
+    def send(request):
+        seen.append(time_left())
+        return FakeResponse(len(seen))
+
+    with deadline(5):
+        hedging.call(request(), send)
+    assert seen and seen[0] is not None
+
+
+def test_hedges_sent_counts_every_hedge_across_threads():
+    hedging = hedger()
+    hedging.budget.max_tokens = hedging.budget.tokens = 1000
+    threads = [threading.Thread(target=hedging.call, args=(request(), Upstream(0.2, 0.0))) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert hedging.hedges_sent == 20
+
+
+def test_async_slow_first_attempt_is_cancelled():
+    hedging = hedger()
+    attempts = []
+
+    async def send(request):
+        attempt = len(attempts)
+        attempts.append(asyncio.current_task())
+        await asyncio.sleep(1.0 if attempt == 0 else 0.0)
+        return FakeResponse(attempt)
+
+    async def main():
+        response = await hedging.acall(request(), send)
+        await asyncio.sleep(0)
+        return response
+
+    assert asyncio.run(main()).attempt == 1
+    assert attempts[0].cancelled()
+
+
+def test_async_skips_cancelled_attempts():
+    hedging = hedger()
+    attempts = []
+
+    async def send(request):
+        attempt = len(attempts)
+        attempts.append(asyncio.current_task())
+        if attempt == 0:
+            await asyncio.sleep(2 * DELAY)
+            # Cancelled by someone else, e.g. its connection pool shutting down.
+            raise asyncio.CancelledError()
+        await asyncio.sleep(4 * DELAY)
+        return FakeResponse(attempt)
+
+    assert asyncio.run(hedging.acall(request(), send)).attempt == 1
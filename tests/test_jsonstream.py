@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import pytest
+
+from common.codec import JsonCodec
+from common.jsonstream import ListParser, ResponseTooLarge, StreamedList
+
+ITEMS = [
+    {"id": 1, "name": "Morning Run", "distance": 10234.5, "tags": ["easy", "z2"]},
+    {"id": 2, "name": "Café ☕ ride", "distance": -4.25e3, "private": True, "gear": None},
+    {"id": 3, "name": "quote \" and brace } in a string", "laps": [[1, 2], {"nested": {}}]},
+    17,
+    -0.5,
+    "plain",
+    None,
+]
+
+
+def feed_in_chunks(parser, data: bytes, size: int) -> list:
+    items = []
+    for start in range(0, len(data), size):
+        items += parser.feed(data[start:start + size])
+    return items + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_array_split_at_every_chunk_size(size):
+    data = json.dumps(ITEMS, ensure_ascii=False).encode()
+    assert feed_in_chunks(ListParser(), data, size) == ITEMS
+
+
+@pytest.mark.parametrize("size", [1, 5, 100000])
+def test_envelope_keeps_the_other_keys(size):
+    document = {"paging": {"next": "https://acme.workable.com/spi/v3/members?since_id=3"}, "members": ITEMS, "total": 7}
+    parser = ListParser("members")
+    assert feed_in_chunks(parser, json.dumps(document).encode(), size) == ITEMS
+    assert parser.fields == {"paging": document["paging"], "total": 7}
+
+
+def test_numbers_cut_by_a_chunk_are_not_truncated():
+    parser = ListParser()
+    assert parser.feed(b"[12") == []
+    assert parser.feed(b"34, -4.") == [1234]
+    assert parser.feed(b"5e") == []
+    assert parser.feed(b"2]") == [-450.0]
+    assert parser.close() == []
+
+
+def test_multibyte_character_split_across_chunks():
+    data = json.dumps(["é☕"], ensure_ascii=False).encode()
+    assert feed_in_chunks(ListParser(), data, 1) == ["é☕"]
+
+
+def test_whitespace_and_empty_lists():
+    assert feed_in_chunks(ListParser(), b" \n[ ]\n ", 1) == []
+    parser = ListParser("members")
+    assert feed_in_chunks(parser, b'{"members": [], "paging": null}', 3) == []
+    assert parser.fields == {"paging": None}
+
+
+def test_envelope_null_yields_nothing():
+    parser = ListParser("members")
+    assert feed_in_chunks(parser, b'{"members": null}', 4) == []
+
+
+def test_truncated_document_raises():
+    parser = ListParser()
+    parser.feed(b'[{"id": 1}, {"id"')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+@pytest.mark.parametrize("data", [b'{"id": 1}', b"[1 2]", b"[1], [2]"])
+def test_malformed_documents_raise(data):
+    with pytest.raises(ValueError):
+        feed_in_chunks(ListParser(), data, 1)
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, status_code=200, headers=None, chunk=3):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.chunk = chunk
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), self.chunk):
+            self.read += self.chunk
+            yield self.body[start:start + self.chunk]
+
+    async def aiter_bytes(self, size):
+        for chunk in self.iter_content(size):
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_streamed_list_iterates_and_closes():
+    response = FakeResponse(json.dumps({"members": ITEMS, "paging": {}}).encode())
+    streamed = StreamedList(response, "members")
+    assert list(streamed) == ITEMS
+    assert streamed.fields == {"paging": {}}
+    assert response.closed
+
+
+def test_streamed_list_async():
+    response = FakeResponse(json.dumps(ITEMS).encode())
+
+    async def collect():
+        return [item async for item in StreamedList(response)]
+
+    assert asyncio.run(collect()) == ITEMS
+    assert response.closed
+
+
+def test_streamed_list_stops_reading_past_the_cap():
+    body = json.dumps(list(range(1000))).encode()
+    response = FakeResponse(body, chunk=10)
+    with pytest.raises(ResponseTooLarge):
+        list(StreamedList(response, max_bytes=100))
+    assert response.read <= 110
+    assert response.closed
+
+
+def test_streamed_list_rejects_a_declared_length_over_the_cap():
+    response = FakeResponse(b"[]", headers={"Content-Length": "1000"})
+    with pytest.raises(ResponseTooLarge):
+        list(StreamedList(response, max_bytes=100))
+    assert response.read == 0
+
+
+def test_streamed_list_error_payload_uses_the_given_codec():
+    codec = JsonCodec("tagged", lambda data: ("tagged", json.loads(data)), lambda value: b"")
+    response = FakeResponse(b'{"message": "Not Found"}', status_code=404)
+    assert StreamedList(response, codec=codec).json() == ("tagged", {"message": "Not Found"})
+    assert response.closed
@@ -0,0 +1,165 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from common.http import HttpRequest
+from common.ratelimit import HEROKU_REFILL_RATE, Budget, RateLimiter, TokenBucket, parse_budget
+from common.resilience import DeadlineExceeded, deadline
+
+NOW = datetime(2024, 3, 1, 12, 7, 30, tzinfo=timezone.utc)
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def request(token="a"):
+    return HttpRequest("GET", "https://www.strava.com/api/v3/athlete", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_parse_budget_without_quota_headers():
+    assert parse_budget({}, NOW) is None
+
+
+def test_parse_budget_strava_picks_the_tighter_window():
+    # 5 calls for the 450 s until the quarter hour are scarcer than 900 for the rest of the day.
+    budget = parse_budget({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "95,100"}, NOW)
+    assert (budget.remaining, budget.reset_in) == (5, 450)
+    assert budget.rate == pytest.approx(5 / 450)
+    # 60 calls for 450 s are not: the daily window binds.
+    budget = parse_budget({"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "40,100"}, NOW)
+    assert (budget.remaining, budget.reset_in) == (900, 42750)
+
+
+def test_parse_budget_strava_read_limit_and_overuse():
+    budget = parse_budget({
+        "X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "10,10",
+        "X-ReadRateLimit-Limit": "100,1000", "X-ReadRateLimit-Usage": "105,200",
+    }, NOW)
+    assert budget.remaining == 0
+    assert budget.rate == 0
+
+
+def test_parse_budget_ignores_malformed_strava_headers():
+    assert parse_budget({"X-RateLimit-Limit": "lots", "X-RateLimit-Usage": "1,2"}, NOW) is None
+
+
+def test_parse_budget_heroku():
+    budget = parse_budget({"RateLimit-Remaining": "4321"}, NOW)
+    assert (budget.remaining, budget.rate, budget.reset_in) == (4321, HEROKU_REFILL_RATE, None)
+
+
+def test_parse_budget_workable():
+    reset = str(int(NOW.timestamp()) + 10)
+    budget = parse_budget({"X-Rate-Limit-Remaining": "5", "X-Rate-Limit-Reset": reset}, NOW)
+    assert (budget.remaining, budget.reset_in) == (5, 10)
+    assert budget.rate == pytest.approx(0.5)
+
+
+def test_bucket_does_not_pace_before_learning():
+    bucket = TokenBucket(burst=2)
+    assert [bucket.reserve(0.0) for _ in range(5)] == [0.0] * 5
+    assert bucket.in_flight == 5
+
+
+def test_bucket_first_budget_fills_to_capacity_minus_in_flight():
+    bucket = TokenBucket(burst=10)
+    bucket.reserve(0.0)
+    bucket.learn(Budget(remaining=4, rate=1.0), 0.0)
+    assert bucket.capacity == 4
+    assert bucket.tokens == 3
+
+
+def test_bucket_stale_header_never_hands_back_reserved_tokens():
+    bucket = TokenBucket(burst=10)
+    bucket.learn(Budget(remaining=100, rate=1.0), 0.0)
+    for _ in range(10):
+        assert bucket.reserve(0.0) == 0.0
+    assert bucket.tokens == 0
+    # The first response of the burst still reports the quota from before it.
+    bucket.release()
+    bucket.learn(Budget(remaining=100, rate=1.0), 0.0)
+    assert bucket.tokens == 0
+    assert bucket.reserve(0.0) == pytest.approx(1.0)
+
+
+def test_bucket_header_lowers_the_count_by_calls_in_flight():
+    bucket = TokenBucket(burst=10)
+    bucket.learn(Budget(remaining=100, rate=1.0), 0.0)
+    for _ in range(3):
+        bucket.reserve(0.0)
+    bucket.release()
+    bucket.learn(Budget(remaining=4, rate=1.0), 0.0)
+    # Two calls are still in flight and will spend two of the four.
+    assert bucket.tokens == 2
+
+
+def test_bucket_refills_at_the_learned_rate():
+    bucket = TokenBucket(burst=10)
+    bucket.learn(Budget(remaining=100, rate=2.0), 0.0)
+    for _ in range(10):
+        bucket.reserve(0.0)
+    assert bucket.reserve(0.0) == pytest.approx(0.5)
+    assert bucket.reserve(0.5) == 0.0
+
+
+def test_bucket_exhausted_budget_blocks_until_reset():
+    bucket = TokenBucket()
+    bucket.learn(Budget(remaining=0, rate=0.0, reset_in=30), 100.0)
+    assert bucket.reserve(100.0) == pytest.approx(30)
+    assert bucket.reserve(125.0) == pytest.approx(5)
+
+
+def test_limiter_keeps_one_bucket_per_credential():
+    limiter = RateLimiter(burst=1)
+    limiter.acquire(request("a"))
+    limiter.observe(request("a"), FakeResponse(headers={"RateLimit-Remaining": "0"}))
+    stats = limiter.snapshot()
+    assert len(stats) == 1
+    (only,) = stats.values()
+    assert only["tokens"] == pytest.approx(0, abs=0.01)
+    assert only["in_flight"] == 0
+    # Another credential has its own, still unpaced, bucket.
+    limiter.acquire(request("b"))
+    assert len(limiter.snapshot()) == 2
+
+
+def test_limiter_release_undoes_a_failed_call():
+    limiter = RateLimiter()
+    limiter.acquire(request())
+    limiter.release(request())
+    (stats,) = limiter.snapshot().values()
+    assert stats["in_flight"] == 0
+
+
+def test_limiter_429_blocks_for_retry_after():
+    limiter = RateLimiter()
+    limiter.acquire(request())
+    limiter.observe(request(), FakeResponse(429, {"Retry-After": "120"}))
+    (stats,) = limiter.snapshot().values()
+    assert stats["blocked_for"] == pytest.approx(120, abs=1)
+
+
+def test_limiter_refuses_to_wait_past_the_deadline():
+    limiter = RateLimiter()
+    limiter.acquire(request())
+    limiter.observe(request(), FakeResponse(429, {"Retry-After": "120"}))
+    with deadline(1):
+        with pytest.raises(DeadlineExceeded):
+            limiter.acquire(request())
+
+
+def test_transport_releases_the_reservation_of_a_failed_send():
+    from common.transport import HttpTransport
+
+    class Failing(HttpTransport):
+        def request(self, method, url, **kwargs):
+            raise ConnectionError("reset")
+
+    limiter = RateLimiter()
+    with pytest.raises(ConnectionError):
+        Failing(rate_limiter=limiter).send(request())
+    (stats,) = limiter.snapshot().values()
+    assert stats["in_flight"] == 0
@@ -1,19 +1,134 @@
-import requests
 from pydantic import BaseModel, Field
-from shared.composio_tools.lib import Action, Tool
-from typing import Optional, Type
+from common import (
+    ActionRequest,
+    ActionResponse,
+    HttpAction,
+    HttpRequest,
+    HttpTool,
+    UpstreamError,
+)
+from common.pagination import aiter_cursor_pages, iter_cursor_pages
+from typing import AsyncIterator, Iterator, Optional, Tuple, Type
+from urllib.parse import urlsplit
 
-class SpecificAccountRequest(BaseModel):
+# Largest `limit` Workable accepts on its list endpoints.
+WORKABLE_MAX_PAGE_SIZE = 100
+
+
+class ForeignNextPage(UpstreamError):
+    """
+    `paging.next` pointed away from the scheme and host of the listing; it
+    is not followed, since the request carries the account's token.
+    """
+
+    def __init__(self, next_url: str):
+        super().__init__(200, {"error": "paging.next points to another host", "next": next_url})
+        self.args = (f"refusing to follow paging.next to {next_url}",)
+
+
+class WorkableListAction(HttpAction):
+    """
+    Base for Workable list endpoints that link to the next page via `paging.next`.
+
+    `iter_items`/`aiter_items` follow those links until the listing is exhausted,
+    holding a single page in memory at a time. A link to another scheme or
+    host stops the listing with `ForeignNextPage`. With `auto_paginate` set on the
+    request, `execute` returns the whole listing. With `stream_decode` set,
+    not even a whole page is held: items are decoded as the body arrives.
+    """
+    items_field = "items"
+    items_key = "items"
+
+    def _first_request(self, request: BaseModel, authorisation_data: dict) -> HttpRequest:
+        return self.build(request, authorisation_data)
+
+    def _next_request(self, page_request: HttpRequest, page: dict) -> Optional[HttpRequest]:
+        next_url = (page.get("paging") or {}).get("next")
+        if not next_url:
+            return None
+        current, following = urlsplit(page_request.url), urlsplit(next_url)
+        if (following.scheme, following.netloc) != (current.scheme, current.netloc):
+            raise ForeignNextPage(next_url)
+        return HttpRequest("GET", next_url, headers=page_request.headers)
+
+    def _page(self, page_request: HttpRequest, response) -> Tuple[list, Optional[HttpRequest]]:
+        if response.status_code != 200:
+            raise UpstreamError(response.status_code, response.json())
+        page = response.json()
+        return page.get(self.items_key) or [], self._next_request(page_request, page)
+
+    def _stream_pages(self, page_request: Optional[HttpRequest], follow: bool = True) -> Iterator:
+        while page_request is not None:
+            page = self.send_streamed(page_request, self.items_key)
+            yield from page
+            # `paging` follows the items, so the next link is only known now.
+            page_request = self._next_request(page_request, page.fields) if follow else None
+
+    async def _astream_pages(self, page_request: Optional[HttpRequest], follow: bool = True) -> AsyncIterator:
+        while page_request is not None:
+            page = await self.asend_streamed(page_request, self.items_key)
+            async for item in page:
+                yield item
+            page_request = self._next_request(page_request, page.fields) if follow else None
+
+    def iter_items(self, request: BaseModel, authorisation_data: dict) -> Iterator:
+        if self.stream_decode:
+            return self._stream_pages(self._first_request(request, authorisation_data))
+
+        def fetch(page_request: HttpRequest) -> Tuple[list, Optional[HttpRequest]]:
+            return self._page(page_request, self.decoded(self.http.send(page_request)))
+
+        return iter_cursor_pages(fetch, self._first_request(request, authorisation_data))
+
+    def aiter_items(self, request: BaseModel, authorisation_data: dict) -> AsyncIterator:
+        if self.stream_decode:
+            return self._astream_pages(self._first_request(request, authorisation_data))
+
+        async def fetch(page_request: HttpRequest) -> Tuple[list, Optional[HttpRequest]]:
+            return self._page(page_request, self.decoded(await self.async_http.send(page_request)))
+
+        return aiter_cursor_pages(fetch, self._first_request(request, authorisation_data))
+
+    def execute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        if request.auto_paginate:
+            items = self.iter_items(request, authorisation_data)
+        elif self.stream_decode:
+            items = self._stream_pages(self.build(request, self.authorise(authorisation_data)), follow=False)
+        else:
+            return super().execute(request, authorisation_data)
+        try:
+            items = self.collect(request, items, self.items_key)
+        except UpstreamError:
+            return self.response_schema(success=False, **{self.items_field: None})
+        return self.response_schema(success=True, **{self.items_field: items})
+
+    async def aexecute(self, request: BaseModel, authorisation_data: dict) -> BaseModel:
+        if request.auto_paginate:
+            items = self.aiter_items(request, authorisation_data)
+        elif self.stream_decode:
+            items = self._astream_pages(self.build(request, await self.aauthorise(authorisation_data)), follow=False)
+        else:
+            return await super().aexecute(request, authorisation_data)
+        try:
+            items = await self.acollect(request, items, self.items_key)
+        except UpstreamError:
+            return self.response_schema(success=False, **{self.items_field: None})
+        return self.response_schema(success=True, **{self.items_field: items})
+
+
+class SpecificAccountRequest(ActionRequest):
     subdomain: str = Field(..., description="The subdomain of the account")
 
-class SpecificAccountResponse(BaseModel):
+class SpecificAccountResponse(ActionResponse):
     success: bool = Field(..., description="Indicates if the request was successful")
     account_info: Optional[dict] = Field(..., description="The account information")
 
-class GetSpecificAccountAction(Action):
+class GetSpecificAccountAction(HttpAction):
     """
     Get Specific Account Action
     """
+    hedge = True
+
     @property
     def display_name(self) -> str:
         return "Get Specific Account"
@@ -26,13 +141,15 @@ class GetSpecificAccountAction(Action):
     def response_schema(self) -> Type[BaseModel]:
         return SpecificAccountResponse
 
-    def execute(self, request: SpecificAccountRequest, authorisation_data: dict) -> SpecificAccountResponse:
+    def prepare(self, request: SpecificAccountRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         subdomain = request.subdomain
         url = f"https://www.workable.com/spi/v3/accounts/{subdomain}"
-        account_response = requests.get(url, headers=headers)
-        account = account_response.json()
-        if account_response.status_code != 200:
+        return HttpRequest("GET", url, headers=headers)
+
+    def parse(self, response) -> SpecificAccountResponse:
+        account = response.json()
+        if response.status_code != 200:
             return SpecificAccountResponse (
                 success=False,
                 account_info=account
@@ -43,22 +160,26 @@ class GetSpecificAccountAction(Action):
             account_info=account
         )
     
-class MembersListRequest(BaseModel):
+class MembersListRequest(ActionRequest):
     subdomain: str = Field(..., description="The subdomain of the account")
     limit: Optional[int] = Field(None, description="The number of members to return")
     since_id: Optional[int] = Field(None, description="Returns results with an ID greater than or equal to the specified ID.")
     max_id: Optional[int] = Field(None, description="Returns results with an ID less than or equal to the specified ID.")
     role: str = Field(None, description="Filters for members of the specified role. Can be simple, admin or reviewer.") 
     shortcode: str = Field(None, description="Filters for a specific job, only collaborators will be returned") 
+    auto_paginate: Optional[bool] = Field(False, description="Follow paging.next and return every member instead of a single page")
 
-class MembersListResponse(BaseModel):
+class MembersListResponse(ActionResponse):
     success: bool = Field(..., description="Indicates if the request was successful")
     members: Optional[list] = Field(..., description="The members of the account")
 
-class GetMembersListAction(Action):
+class GetMembersListAction(WorkableListAction):
     """
     Members List Action
     """
+    items_field = "members"
+    items_key = "members"
+
     @property
     def display_name(self) -> str:
         return "Members List"
@@ -71,7 +192,7 @@ class GetMembersListAction(Action):
     def response_schema(self) -> Type[BaseModel]:
         return MembersListResponse
 
-    def execute(self, request: MembersListRequest, authorisation_data: dict) -> MembersListResponse:
+    def prepare(self, request: MembersListRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         subdomain = request.subdomain
         limit = request.limit
@@ -87,31 +208,40 @@ class GetMembersListAction(Action):
             "role": role,
             "shortcode": shortcode
         }
-        members_response = requests.get(url, headers=headers, params=params)
-        if members_response.status_code != 200:
+        return HttpRequest("GET", url, headers=headers, params=params)
+
+    def _first_request(self, request: MembersListRequest, authorisation_data: dict) -> HttpRequest:
+        return self.build(request.copy(update={"limit": request.limit or WORKABLE_MAX_PAGE_SIZE}), authorisation_data)
+
+    def parse(self, response) -> MembersListResponse:
+        if response.status_code != 200:
             return MembersListResponse (
                 success=False,
                 members=None
             )
         
-        members = members_response.json()
+        members = response.json().get("members")
         return MembersListResponse (
             success=True,
             members=members
         )
     
-class ExternalRecruiterListRequest(BaseModel):
+class ExternalRecruiterListRequest(ActionRequest):
     subdomain: str = Field(..., description="The subdomain of the account")
     shortcode: str = Field(None, description="Filters for a specific job, only collaborators will be returned")
+    auto_paginate: Optional[bool] = Field(False, description="Follow paging.next and return every external recruiter instead of a single page")
 
-class ExternalRecruiterListResponse(BaseModel):
+class ExternalRecruiterListResponse(ActionResponse):
     success: bool = Field(..., description="Indicates if the request was successful")
     external_recruiters: Optional[list] = Field(..., description="The external recruiters of the account")
 
-class GetExternalRecruiterListAction(Action):
+class GetExternalRecruiterListAction(WorkableListAction):
     """
     External Recruiter List Action
     """
+    items_field = "external_recruiters"
+    items_key = "recruiters"
+
     @property
     def display_name(self) -> str:
         return "External Recruiter List"
@@ -124,7 +254,7 @@ class GetExternalRecruiterListAction(Action):
     def response_schema(self) -> Type[BaseModel]:
         return ExternalRecruiterListResponse
 
-    def execute(self, request: ExternalRecruiterListRequest, authorisation_data: dict) -> ExternalRecruiterListResponse:
+    def prepare(self, request: ExternalRecruiterListRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         subdomain = request.subdomain
         shortcode = request.shortcode
@@ -132,30 +262,34 @@ class GetExternalRecruiterListAction(Action):
         params = {
             "shortcode": shortcode
         }
-        external_recruiters_response = requests.get(url, headers=headers, params=params)
-        if external_recruiters_response.status_code != 200:
+        return HttpRequest("GET", url, headers=headers, params=params)
+
+    def parse(self, response) -> ExternalRecruiterListResponse:
+        if response.status_code != 200:
             return ExternalRecruiterListResponse (
                 success=False,
                 external_recruiters=None
             )
         
-        external_recruiters = external_recruiters_response.json()
+        external_recruiters = response.json().get("recruiters")
         return ExternalRecruiterListResponse (
             success=True,
             external_recruiters=external_recruiters
         )
     
-class RequirementPipelineStageRequest(BaseModel):
+class RequirementPipelineStageRequest(ActionRequest):
     subdomain: str = Field(..., description="The subdomain of the account")
     
-class RequirementPipelineStageResponse(BaseModel):
+class RequirementPipelineStageResponse(ActionResponse):
     success: bool = Field(..., description="Indicates if the request was successful")
     pipeline_stages: dict = Field(..., description="The pipeline stages of the account")
 
-class GetRequirementPipelineStageAction(Action):
+class GetRequirementPipelineStageAction(HttpAction):
     """
     Requirement Pipeline Stage Action
     """
+    cache_ttl = 600
+
     @property
     def display_name(self) -> str:
         return "Requirement Pipeline Stage"
@@ -168,13 +302,15 @@ class GetRequirementPipelineStageAction(Action):
     def response_schema(self) -> Type[BaseModel]:
         return RequirementPipelineStageResponse
 
-    def execute(self, request: RequirementPipelineStageRequest, authorisation_data: dict) -> RequirementPipelineStageResponse:
+    def prepare(self, request: RequirementPipelineStageRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         subdomain = request.subdomain
         url = f"https://{subdomain}.workable.com/spi/v3/stages"
-        pipeline_stages_response = requests.get(url, headers=headers)
-        pipeline_stages = pipeline_stages_response.json()
-        if pipeline_stages_response.status_code != 200:
+        return HttpRequest("GET", url, headers=headers)
+
+    def parse(self, response) -> RequirementPipelineStageResponse:
+        pipeline_stages = response.json()
+        if response.status_code != 200:
             return RequirementPipelineStageResponse (
                 success=False,
                 pipeline_stages=pipeline_stages
@@ -185,17 +321,19 @@ class GetRequirementPipelineStageAction(Action):
             pipeline_stages=pipeline_stages
         )
     
-class AccountDepartmentRequest(BaseModel):
+class AccountDepartmentRequest(ActionRequest):
     subdomain: str = Field(..., description="The subdomain of the account")
 
-class AccountDepartmentResponse(BaseModel):
+class AccountDepartmentResponse(ActionResponse):
     success: bool = Field(..., description="Indicates if the request was successful")
     departments: Optional[list] = Field(..., description="The departments of the account")
 
-class GetAccountDepartmentAction(Action):
+class GetAccountDepartmentAction(HttpAction):
     """
     Collection of your account departments
     """
+    cache_ttl = 600
+
     @property
     def display_name(self) -> str:
         return "Collection of your account departments"
@@ -208,31 +346,33 @@ class GetAccountDepartmentAction(Action):
     def response_schema(self) -> Type[BaseModel]:
         return AccountDepartmentResponse
 
-    def execute(self, request: AccountDepartmentRequest, authorisation_data: dict) -> AccountDepartmentResponse:
+    def prepare(self, request: AccountDepartmentRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         subdomain = request.subdomain
         url = f"https://{subdomain}.workable.com/spi/v3/departments"
-        departments_response = requests.get(url, headers=headers)
-        if departments_response.status_code != 200:
+        return HttpRequest("GET", url, headers=headers)
+
+    def parse(self, response) -> AccountDepartmentResponse:
+        if response.status_code != 200:
             return AccountDepartmentResponse (
                 success=False,
                 departments=None
             )
         
-        departments = departments_response.json()
+        departments = response.json()
         return AccountDepartmentResponse (
             success=True,
             departments=departments
         )
     
-class LegalEntitiesRequest(BaseModel):
+class LegalEntitiesRequest(ActionRequest):
     subdomain: str = Field(..., description="The subdomain of the account")
 
-class LegalEntitiesResponse(BaseModel):
+class LegalEntitiesResponse(ActionResponse):
     success: bool = Field(..., description="Indicates if the request was successful")
     legal_entities: Optional[list] = Field(..., description="The legal entities of the account")
 
-class GetLegalEntitiesAction(Action):
+class GetLegalEntitiesAction(HttpAction):
     """
     Collection of your account legal entities
     """
@@ -248,18 +388,20 @@ class GetLegalEntitiesAction(Action):
     def response_schema(self) -> Type[BaseModel]:
         return LegalEntitiesResponse
 
-    def execute(self, request: LegalEntitiesRequest, authorisation_data: dict) -> LegalEntitiesResponse:
+    def prepare(self, request: LegalEntitiesRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         subdomain = request.subdomain
         url = f"https://{subdomain}.workable.com/spi/v3/legal_entities"
-        legal_entities_response = requests.get(url, headers=headers)
-        if legal_entities_response.status_code != 200:
+        return HttpRequest("GET", url, headers=headers)
+
+    def parse(self, response) -> LegalEntitiesResponse:
+        if response.status_code != 200:
             return LegalEntitiesResponse (
                 success=False,
                 legal_entities=None
             )
         
-        legal_entities = legal_entities_response.json()
+        legal_entities = response.json()
         return LegalEntitiesResponse (
             success=True,
             legal_entities=legal_entities
@@ -267,14 +409,14 @@ class GetLegalEntitiesAction(Action):
     
 
 
-class WorkableAccountAccessRequest(BaseModel):
+class WorkableAccountAccessRequest(ActionRequest):
     pass
 
-class WorkableAccountAccessResponse(BaseModel):
+class WorkableAccountAccessResponse(ActionResponse):
     success: bool = Field(..., description="Indicates if the request was successful")
     account_data: Optional[dict] = Field(..., description="The account data")
 
-class WorkableAccountAccessAction(Action):
+class WorkableAccountAccessAction(HttpAction):
     """
     Workable Account Access Action
     """
@@ -290,26 +432,32 @@ class WorkableAccountAccessAction(Action):
     def response_schema(self) -> Type[BaseModel]:
         return WorkableAccountAccessResponse
 
-    def execute(self, request: WorkableAccountAccessRequest, authorisation_data: dict) -> WorkableAccountAccessResponse:
+    def prepare(self, request: WorkableAccountAccessRequest, authorisation_data: dict) -> HttpRequest:
         headers = authorisation_data["headers"]
         url = "https://www.workable.com/spi/v3/accounts"
-        account_response = requests.get(url, headers=headers)
-        if account_response.status_code != 200:
+        return HttpRequest("GET", url, headers=headers)
+
+    def parse(self, response) -> WorkableAccountAccessResponse:
+        if response.status_code != 200:
             return WorkableAccountAccessResponse (
                 success=False,
                 account_data=None
             )
         
-        account = account_response.json()
+        account = response.json()
         return WorkableAccountAccessResponse (
             success=True,
             account_data=account
         )
         
 
-class Workable(Tool):
+class Workable(HttpTool):
+    # Account subdomains each get their own pool from the transport's fallback adapter.
+    host_pool_sizes = {"www.workable.com": 16}
+    max_concurrency = 10
+
     def actions(self) -> list:
-        return [
+        return self.bind([
             WorkableAccountAccessAction,
             GetSpecificAccountAction,
             GetMembersListAction,
@@ -317,7 +465,7 @@ class Workable(Tool):
             GetRequirementPipelineStageAction,
             GetAccountDepartmentAction,
             GetLegalEntitiesAction
-        ]
+        ])
     
     def triggers(self) -> list:
         return []